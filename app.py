@@ -1,22 +1,51 @@
 import os
+import hmac
 import json
+import time
+import math
+import gzip
+import zlib
+import hashlib
+import ipaddress
+import itertools
+import zipfile
 import tempfile
 import traceback
+import threading
 import subprocess
 from datetime import timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from flask import Flask, request, jsonify
+# Started before the third-party imports so that they are part of the timings.
+from src.startup import StartupTimer
+startup = StartupTimer()
+
+from flask import Flask, Response, request, jsonify, stream_with_context, g
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import (
     JWTManager, create_access_token,
-    jwt_required, get_jwt_identity
+    jwt_required, current_user
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 
 # Import dotenv to load environment variables from .env file
 from dotenv import load_dotenv
 
+from src.workers import create_pool, WorkerError, WorkerCrashed, JobTimeout, PoolError, STREAMED_JOBS
+from src.cache import ResultCache, result_key, result_hasher
+from src.auth import Identity, IdentityCache, PasswordHasher, HasherBusy
+from src.jobs import JobQueue, JobFailed, FINISHED as JOB_FINISHED
+from src.render import Renderer, RenderError, RenderBusy, RenderTimeout, RENDER_VERSION, FORMATS as RENDER_FORMATS
+from src.metrics import REGISTRY, BYTES, Collection, stage, record
+# The converters (src.decode, src.compile, src.writeback, ...) are imported
+# in the functions that use them, so importing the app does not load them
+# (or numpy); warm_converters() loads them ahead of time.
+
+startup.mark('imports')
+
 # Load environment variables from .env file at the very beginning
 # This should be called before any config.update that uses these vars.
 load_dotenv()
@@ -33,18 +62,205 @@ app.config.update({
     'SQLALCHEMY_TRACK_MODIFICATIONS': False, # Recommended to set to False for performance
     'JWT_SECRET_KEY':          os.environ.get('JWT_SECRET'),   # No default; it must be set
     'JWT_ACCESS_TOKEN_EXPIRES': timedelta(hours=2),
+    # 'pool' runs converters in pre-warmed worker processes, 'subprocess'
+    # spawns src/decode.py / src/compile.py per request (also the fallback).
+    'CONVERTER_MODE':          os.environ.get('CONVERTER_MODE', 'pool'),
+    'CONVERTER_WORKERS':       int(os.environ.get('CONVERTER_WORKERS', os.cpu_count() or 1)),
+    'CONVERTER_TIMEOUT':       float(os.environ.get('CONVERTER_TIMEOUT', 30)),
+    'CONVERTER_MEMORY_MB':     int(os.environ.get('CONVERTER_MEMORY_MB', 1024)),
+    # Converter results cache: in-memory LRU byte budget plus an optional
+    # directory shared by all workers on the host (unset = memory only) and
+    # its own byte budget, enforced by evicting the least recently used files.
+    'RESULT_CACHE_BYTES':      int(os.environ.get('RESULT_CACHE_BYTES', 64 * 1024 * 1024)),
+    'RESULT_CACHE_DIR':        os.environ.get('RESULT_CACHE_DIR') or None,
+    'RESULT_CACHE_DISK_BYTES': int(os.environ.get('RESULT_CACHE_DISK_BYTES', 1024 * 1024 * 1024)),
+    # Editor sessions kept per worker for incremental /api/compile, and the
+    # largest DSL compiled incrementally on the request thread (about 0.1 s
+    # of work); larger documents go to the converter pool, under
+    # CONVERTER_TIMEOUT, like a plain compile.
+    'COMPILE_SESSIONS':        int(os.environ.get('COMPILE_SESSIONS', 256)),
+    'INCREMENTAL_MAX_BYTES':   int(os.environ.get('INCREMENTAL_MAX_BYTES', 256 * 1024)),
+    # /api/decode/batch limits: number of XML files and their total
+    # (uncompressed) size per request.
+    'BATCH_MAX_FILES':         int(os.environ.get('BATCH_MAX_FILES', 500)),
+    'BATCH_MAX_BYTES':         int(os.environ.get('BATCH_MAX_BYTES', 256 * 1024 * 1024)),
+    # Async jobs (?async=1): SQLite queue file shared by all workers on the
+    # host, job threads per process and how long results are kept.
+    'JOB_DB':                  os.environ.get('JOB_DB') or os.path.join(app.instance_path, 'jobs.sqlite3'),
+    'JOB_WORKERS':             int(os.environ.get('JOB_WORKERS', os.cpu_count() or 1)),
+    'JOB_TTL':                 int(os.environ.get('JOB_TTL', 3600)),
+    # /api/render: concurrent Graphviz processes per server process and
+    # how long one may run.
+    'RENDER_WORKERS':          int(os.environ.get('RENDER_WORKERS', 2)),
+    'RENDER_TIMEOUT':          float(os.environ.get('RENDER_TIMEOUT', 20)),
+    'GRAPHVIZ_DOT':            os.environ.get('GRAPHVIZ_DOT', 'dot'),
+    # Largest XML accepted by /api/decode; bigger uploads get a 413 as soon
+    # as the size is known (Content-Length) or exceeded while streaming.
+    'MAX_UPLOAD_BYTES':        int(os.environ.get('MAX_UPLOAD_BYTES', 100 * 1024 * 1024)),
+    # gzip/deflate responses for clients that accept them: zlib level and
+    # the smallest body worth compressing.
+    'RESPONSE_COMPRESS_LEVEL': int(os.environ.get('RESPONSE_COMPRESS_LEVEL', 6)),
+    'RESPONSE_COMPRESS_MIN':   int(os.environ.get('RESPONSE_COMPRESS_MIN', 1024)),
+    # /api/writeback: byte-offset indexes of recently uploaded originals kept
+    # per worker, so repeated write-backs to the same lab skip the scan.
+    'WRITEBACK_INDEXES':       int(os.environ.get('WRITEBACK_INDEXES', 4)),
+    # Viewport queries: spatial indexes of recently viewed flows kept per
+    # worker, and the most elements one response may carry.
+    'VIEWPORT_INDEXES':        int(os.environ.get('VIEWPORT_INDEXES', 16)),
+    'VIEWPORT_MAX_ELEMENTS':   int(os.environ.get('VIEWPORT_MAX_ELEMENTS', 20000)),
+    # Token subject -> user lookups kept per worker for this many seconds
+    # (0 disables the cache). Also how long other workers may still accept
+    # a deleted user's tokens: deletion only evicts in the worker doing it.
+    'IDENTITY_CACHE_TTL':      float(os.environ.get('IDENTITY_CACHE_TTL', 60)),
+    'IDENTITY_CACHE_SIZE':     int(os.environ.get('IDENTITY_CACHE_SIZE', 10000)),
+    # Password hashes running at once per worker (on the request threads),
+    # how many more may wait, and how long one waits before getting a 503.
+    # Running plus waiting hashes are capped at half of REQUEST_THREADS, the
+    # threads each worker serves requests on (gunicorn.conf.py's `threads`).
+    'PASSWORD_HASH_WORKERS':   int(os.environ.get('PASSWORD_HASH_WORKERS', 1)),
+    'PASSWORD_HASH_QUEUE':     int(os.environ.get('PASSWORD_HASH_QUEUE', 1)),
+    'PASSWORD_HASH_WAIT':      float(os.environ.get('PASSWORD_HASH_WAIT', 0.05)),
+    'REQUEST_THREADS':         int(os.environ.get('GUNICORN_THREADS', 4)),
+    # 'startup' checks and migrates the schema whenever the app is imported;
+    # 'deferred' leaves it to a one-time `flask --app app init-db` per deploy.
+    'DB_INIT':                 os.environ.get('DB_INIT', 'startup'),
+    # Send per-stage timings back in a Server-Timing header (1 = on), and the
+    # bearer token GET /metrics requires (unset = served to localhost only).
+    'SERVER_TIMING':           os.environ.get('SERVER_TIMING') == '1',
+    'METRICS_TOKEN':           os.environ.get('METRICS_TOKEN') or None,
+    # Directory the processes of one server share their metrics through, so
+    # /metrics reports all gunicorn workers and not just the one answering
+    # (unset = per process). Emptied by gunicorn.conf.py at startup; each
+    # process writes its file at most every METRICS_SYNC_INTERVAL seconds.
+    'METRICS_MULTIPROC_DIR':   os.environ.get('METRICS_MULTIPROC_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR') or None,
+    'METRICS_SYNC_INTERVAL':   float(os.environ.get('METRICS_SYNC_INTERVAL', 1)),
 })
 
 # Get CORS origins from env, split by comma, or default to localhost
 cors_origins_str = os.environ.get('CORS_ORIGINS', 'http://localhost:3000')
 cors_origins_list = [origin.strip() for origin in cors_origins_str.split(',')]
 
-CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": cors_origins_list}})
+CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": cors_origins_list}},
+     expose_headers=["ETag", "X-Cache", "X-Flow-Key", "X-Next-Cursor", "Location", "X-Writeback-Warnings", "Server-Timing"])
 
 # Initialize extensions
 db  = SQLAlchemy(app)
 jwt = JWTManager(app)
 
+# Started per server process: gunicorn.conf.py does it in post_fork, before
+# any request thread exists; other servers fork the workers on first use.
+converter_pool = create_pool(
+    size=app.config['CONVERTER_WORKERS'],
+    timeout=app.config['CONVERTER_TIMEOUT'],
+    memory_limit_mb=app.config['CONVERTER_MEMORY_MB'],
+)
+
+result_cache = ResultCache(
+    max_bytes=app.config['RESULT_CACHE_BYTES'],
+    disk_dir=app.config['RESULT_CACHE_DIR'],
+    disk_max_bytes=app.config['RESULT_CACHE_DISK_BYTES'],
+)
+
+renderer = Renderer(
+    max_workers=app.config['RENDER_WORKERS'],
+    timeout=app.config['RENDER_TIMEOUT'],
+    dot_binary=app.config['GRAPHVIZ_DOT'],
+)
+
+identity_cache = IdentityCache(
+    ttl=app.config['IDENTITY_CACHE_TTL'],
+    max_entries=app.config['IDENTITY_CACHE_SIZE'],
+)
+
+# Hashes block the request thread they run on, and so do waiting ones: keep
+# at least half of a worker's threads free for every other endpoint.
+hash_threads = max(1, app.config['REQUEST_THREADS'] // 2)
+hash_workers = max(1, min(app.config['PASSWORD_HASH_WORKERS'], hash_threads))
+password_hasher = PasswordHasher(
+    max_workers=hash_workers,
+    max_pending=max(0, min(app.config['PASSWORD_HASH_QUEUE'], hash_threads - hash_workers)),
+    queue_timeout=app.config['PASSWORD_HASH_WAIT'],
+)
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+# Converter stages (parse_xml, emit_dsl, build_flow, parse_dsl, assemble,
+# layout) are timed in src/decode.py and src/compile.py, also when they run
+# in a converter pool worker; the request path adds read_upload, converter,
+# serialize and db. The hooks here are registered before compress_response,
+# so they run after it and see the bytes actually sent.
+
+if app.config['METRICS_MULTIPROC_DIR']:
+    REGISTRY.share(app.config['METRICS_MULTIPROC_DIR'], interval=app.config['METRICS_SYNC_INTERVAL'])
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'Time to handle a request, by route', ['endpoint', 'method', 'status'])
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics = Collection().activate()
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def finish_request_metrics(resp):
+    started = g.pop('request_started', None)
+    if started is None:
+        return resp
+    elapsed = time.perf_counter() - started
+    # The URL rule, not the path, so /api/snippets/<int:id> is one series.
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=resp.status_code)
+    if not resp.is_streamed and resp.content_length:
+        BYTES.inc(resp.content_length, stage='response')
+    if app.config['SERVER_TIMING']:
+        resp.headers['Server-Timing'] = g.metrics.server_timing(total=elapsed)
+    return resp
+
+
+@app.teardown_request
+def stop_request_metrics(_exc):
+    collection = g.pop('metrics', None)
+    if collection is not None:
+        collection.deactivate()
+    REGISTRY.sync()
+
+
+@db.event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@db.event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # An exception here would fail the query: skip queries whose start was
+    # not seen (e.g. a connection checked out before the listener existed).
+    started = conn.info.get('query_started')
+    if started:
+        record('db', time.perf_counter() - started.pop())
+
+
+def is_loopback(address):
+    try:
+        return ipaddress.ip_address(address or '').is_loopback
+    except ValueError:
+        return False
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        given = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(given.encode('utf-8'), token.encode('utf-8')):
+            return jsonify(error='Invalid metrics token'), 401
+    elif not is_loopback(request.remote_addr):
+        # Behind a proxy on the same host this is the proxy's address: set
+        # METRICS_TOKEN rather than relying on it.
+        return jsonify(error='Metrics require METRICS_TOKEN outside localhost'), 403
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 
 # ─── Models ───────────────────────────────────────────────────────────────────
 
@@ -59,45 +275,244 @@ class User(db.Model):
     snippets = db.relationship('Snippet', backref='owner', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, raw):
-        self.password = generate_password_hash(raw)
+        self.password = password_hasher.hash(raw)
 
     def check_password(self, raw):
-        return check_password_hash(self.password, raw)
+        return password_hasher.check(self.password, raw)
 
     def __repr__(self):
         return f'<User {self.email}>'
 
+@db.event.listens_for(User, 'after_delete')
+def evict_deleted_user(mapper, connection, user):
+    identity_cache.evict(str(user.id))
+
+class SnippetContent(db.Model):
+    """
+    Snippet text, stored once per distinct content: zlib-compressed and keyed
+    by its SHA-256, so identical snippets (across users too) share one row.
+    """
+    __tablename__ = 'snippet_contents'
+    hash = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)    # uncompressed length in characters
+    # Precompiled /api/compile body for this content (zlib-compressed JSON)
+    # and the compiler version that produced it; a version mismatch means stale.
+    flow         = db.Column(db.LargeBinary, nullable=True)
+    flow_version = db.Column(db.String(20), nullable=True)
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def intern(cls, text):
+        """
+        Return the row for `text`, inserting it if no snippet has this content
+        yet. The row is upserted even when it exists: the write locks it (the
+        whole database on SQLite) until the caller commits the snippet that
+        refers to it, so a concurrent prune_snippet_contents() either ran
+        first, and the row is inserted again, or waits and sees the snippet.
+        """
+        key = cls.digest(text)
+        values = {'hash': key, 'data': zlib.compress(text.encode('utf-8'), 6), 'size': len(text)}
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            # Two requests saving the same new content must not collide on the key.
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(cls).values(**values)
+            db.session.execute(stmt.on_conflict_do_update(index_elements=['hash'],
+                                                          set_={'size': stmt.excluded.size}))
+            return db.session.get(cls, key)
+        blob = db.session.get(cls, key)
+        if blob is None:
+            blob = cls(**values)
+            db.session.add(blob)
+        return blob
+
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    def __repr__(self):
+        return f'<SnippetContent {self.hash[:12]}>'
+
+def prune_snippet_contents(hashes):
+    """
+    Delete content rows no snippet refers to any more (call after flushing
+    the change, in the same transaction). A row that a concurrent save
+    references by the time the delete runs fails its foreign key where
+    the database enforces it; that row is kept.
+    """
+    for h in set(hashes):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.delete(SnippetContent).where(
+                    SnippetContent.hash == h,
+                    ~db.exists().where(Snippet.content_hash == h),
+                ))
+        except IntegrityError:
+            pass
+
+
+class MissingSnippetContent(LookupError):
+    """A snippet refers to a content row that does not exist."""
+
 class Snippet(db.Model):
     __tablename__ = 'snippets'
-    id         = db.Column(db.Integer, primary_key=True)
-    title      = db.Column(db.String(100), nullable=False)
-    content    = db.Column(db.Text, nullable=False)
+    id           = db.Column(db.Integer, primary_key=True)
+    title        = db.Column(db.String(100), nullable=False)
+    content_hash = db.Column(db.String(64), db.ForeignKey('snippet_contents.hash'), index=True)
+    # Legacy inline text. Rows are moved into snippet_contents at startup and
+    # new rows leave it empty; it stays mapped for databases that still have it NOT NULL.
+    _content     = db.Column('content', db.Text, nullable=False, default='')
     # For PostgreSQL, func.now() translates correctly to the appropriate timestamp function.
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
-    user_id    = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at   = db.Column(db.DateTime, server_default=db.func.now())
+    user_id      = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    blob = db.relationship('SnippetContent')
+
+    # Serves the per-user listing in (created_at, id) order straight from the index.
+    __table_args__ = (
+        db.Index('ix_snippets_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+    @property
+    def content_row(self):
+        """The SnippetContent this snippet refers to; MissingSnippetContent if it is gone."""
+        if self.blob is None:
+            raise MissingSnippetContent(
+                f"Snippet {self.id} refers to content {self.content_hash} that no longer exists")
+        return self.blob
+
+    @property
+    def content(self):
+        if self.content_hash is not None:
+            return self.content_row.text()
+        return self._content
+
+    @content.setter
+    def content(self, text):
+        self.blob = SnippetContent.intern(text)
+        self.content_hash = self.blob.hash
+        self._content = ''
+
+    @property
+    def size(self):
+        return self.content_row.size if self.content_hash is not None else len(self._content)
 
     def __repr__(self):
         return f'<Snippet {self.title}>'
 
+@app.errorhandler(MissingSnippetContent)
+def missing_snippet_content(e):
+    print(f"Snippet content missing: {e}")
+    return jsonify(msg="This snippet's content is missing", details=str(e)), 500
+
+def add_missing_columns(model):
+    """ALTER TABLE ... ADD COLUMN for mapped nullable columns the existing table lacks."""
+    table = model.__table__
+    existing = {c['name'] for c in db.inspect(db.engine).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=db.engine.dialect)}'
+        for fk in column.foreign_keys:
+            ddl += f' REFERENCES {fk.column.table.name} ({fk.column.name})'
+        db.session.execute(db.text(ddl))
+    db.session.commit()
+
+def migrate_snippet_storage(batch_size=500):
+    """
+    Bring existing snippet tables up to the current layout: add missing
+    columns and move inline content into snippet_contents in batches.
+    Safe to run repeatedly and concurrently.
+    """
+    add_missing_columns(SnippetContent)
+    add_missing_columns(Snippet)
+
+    moved = 0
+    while True:
+        batch = Snippet.query.filter(Snippet.content_hash.is_(None)).limit(batch_size).all()
+        if not batch:
+            break
+        for snippet in batch:
+            snippet.content = snippet._content
+        db.session.commit()
+        moved += len(batch)
+    if moved:
+        print(f"Moved {moved} snippets into compressed content storage.")
+
 # ─── Database Initialization ──────────────────────────────────────────────────
 
+def init_db():
+    """Create missing tables, columns and indexes and move legacy snippet rows. Idempotent."""
+    # This will attempt to connect and create tables if they don't exist.
+    # In production, use Flask-Migrate/Alembic for schema management.
+    db.create_all()
+    migrate_snippet_storage()
+    # create_all() skips indexes on tables that already exist.
+    for index in Snippet.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the database schema (run once per deploy with DB_INIT=deferred)."""
+    init_db()
+    print("Database tables checked/created successfully.")
+
+
+startup.mark('extensions')
+
 # It's crucial to ensure your database connection is valid before calling create_all().
 # If DATABASE_URL is not set, this will fail.
-with app.app_context():
-    try:
-        # This will attempt to connect and create tables if they don't exist.
-        # In production, use Flask-Migrate/Alembic for schema management.
-        db.create_all()
-        print("Database tables checked/created successfully.")
-    except Exception as e:
-        print(f"Error connecting to or creating database tables: {e}")
-        print("Please ensure your DATABASE_URL environment variable is correctly set and the database is accessible.")
-        # Depending on your deployment strategy, you might want to exit here
-        # or log the error more robustly for a production setup.
+if app.config['DB_INIT'] != 'deferred':
+    with app.app_context():
+        try:
+            init_db()
+            print("Database tables checked/created successfully.")
+        except Exception as e:
+            print(f"Error connecting to or creating database tables: {e}")
+            print("Please ensure your DATABASE_URL environment variable is correctly set and the database is accessible.")
+            # Depending on your deployment strategy, you might want to exit here
+            # or log the error more robustly for a production setup.
+    startup.mark('schema')
 
 
 # ─── Auth Routes (/api/auth) ─────────────────────────────────────────────────
 
+@jwt.user_lookup_loader
+def load_identity(_jwt_header, jwt_data):
+    """current_user for @jwt_required() routes; None (a 401) once the user is gone."""
+    uid = jwt_data['sub']
+    identity = identity_cache.get(uid)
+    if identity is None:
+        try:
+            u = db.session.get(User, int(uid))
+        except ValueError:
+            return None
+        if u is None:
+            return None
+        identity = Identity(u.id, u.email)
+        identity_cache.put(uid, identity)
+    return identity
+
+
+@jwt.user_lookup_error_loader
+def identity_not_found(_jwt_header, _jwt_data):
+    return jsonify(msg="User not found"), 401
+
+
+def busy_response(details):
+    resp = jsonify(msg="Too many sign-ins right now, try again shortly", details=details)
+    resp.status_code = 503
+    resp.headers['Retry-After'] = '1'
+    return resp
+
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.get_json() or {}
@@ -116,6 +531,9 @@ def register():
         db.session.add(u)
         db.session.commit()
         return jsonify(msg="User registered"), 201
+    except HasherBusy as e:
+        db.session.rollback()
+        return busy_response(str(e))
     except Exception as e:
         db.session.rollback() # Rollback in case of an error during commit
         print(f"Error during registration: {e}")
@@ -130,8 +548,11 @@ def login():
     password = data.get('password','') # Default to empty string to avoid error on check_password_hash
 
     u = User.query.filter_by(email=email).first()
-    if not u or not u.check_password(password):
-        return jsonify(msg="Bad credentials"), 401
+    try:
+        if not u or not u.check_password(password):
+            return jsonify(msg="Bad credentials"), 401
+    except HasherBusy as e:
+        return busy_response(str(e))
 
     token = create_access_token(identity=str(u.id))
     return jsonify(access_token=token), 200
@@ -139,30 +560,76 @@ def login():
 @app.route('/api/auth/me', methods=['GET'])
 @jwt_required()
 def me():
-    uid = get_jwt_identity() # This returns a string
-    u   = User.query.get(int(uid)) # Convert back to int for querying primary key
-    if not u: # Handle case where user might be deleted but token is still valid
-        return jsonify(msg="User not found"), 404
-    return jsonify(id=u.id, email=u.email), 200
+    # Deleted users never get here: load_identity() answers 401 for them.
+    return jsonify(id=current_user.id, email=current_user.email), 200
 
 
 # ─── Snippet Routes (/api/snippets) ───────────────────────────────────────────
 
+SNIPPET_PAGE_DEFAULT = 50
+SNIPPET_PAGE_MAX = 200
+
+
 @app.route('/api/snippets', methods=['GET'])
 @jwt_required()
 def list_snippets():
-    uid = get_jwt_identity()
-    # Ensure uid is an integer for query as user_id in Snippet is Integer
+    """
+    One page of the user's snippets in (created_at, id) order, as summaries
+    without content. Pass the X-Next-Cursor header of a response as ?cursor=
+    to get the next page; the header is absent on the last page.
+    """
+    user_id_int = current_user.id
+
     try:
-        user_id_int = int(uid)
+        limit = min(max(int(request.args.get('limit', SNIPPET_PAGE_DEFAULT)), 1), SNIPPET_PAGE_MAX)
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
     except ValueError:
-        return jsonify(msg="Invalid user ID in token"), 400
+        return jsonify(msg="limit and cursor must be integers"), 400
+
+    query = db.session.query(
+        Snippet.id, Snippet.title, Snippet.created_at,
+        db.func.coalesce(SnippetContent.size, db.func.length(Snippet._content)).label('size'),
+    ).outerjoin(SnippetContent, Snippet.content_hash == SnippetContent.hash
+    ).filter(Snippet.user_id == user_id_int)
+
+    if cursor is not None:
+        # The cursor is the last id of the previous page; its created_at is
+        # read back in SQL so the comparison uses the stored value exactly.
+        cursor_created = (db.session.query(Snippet.created_at)
+                          .filter(Snippet.id == cursor, Snippet.user_id == user_id_int)
+                          .scalar_subquery())
+        if db.session.query(Snippet.id).filter_by(id=cursor, user_id=user_id_int).first() is None:
+            return jsonify(msg="Invalid cursor"), 400
+        query = query.filter(db.or_(
+            Snippet.created_at > cursor_created,
+            db.and_(Snippet.created_at == cursor_created, Snippet.id > cursor),
+        ))
+
+    rows = query.order_by(Snippet.created_at, Snippet.id).limit(limit + 1).all()
+    page = rows[:limit]
+    resp = jsonify([
+        {'id': r.id, 'title': r.title, 'size': r.size,
+         'created_at': r.created_at.isoformat() if r.created_at else None}
+        for r in page
+    ])
+    if len(rows) > limit:
+        resp.headers['X-Next-Cursor'] = str(page[-1].id)
+    return resp, 200
+
+
+@app.route('/api/snippets/<int:id>', methods=['GET'])
+@jwt_required()
+def get_snippet(id):
+    user_id_int = current_user.id
 
-    snips = Snippet.query.filter_by(user_id=user_id_int).all()
-    return jsonify([
-        {'id': s.id, 'title': s.title, 'content': s.content, 'created_at': s.created_at.isoformat()}
-        for s in snips
-    ]), 200
+    s = Snippet.query.get(id)
+    if not s:
+        return jsonify(msg="Snippet not found"), 404
+    if s.user_id != user_id_int:
+        return jsonify(msg="Forbidden"), 403
+
+    return jsonify(id=s.id, title=s.title, content=s.content, size=s.size,
+                   created_at=s.created_at.isoformat() if s.created_at else None), 200
 
 @app.route('/api/snippets', methods=['POST'])
 @jwt_required()
@@ -174,15 +641,12 @@ def create_snippet():
     if not title or not content:
         return jsonify(msg="Title and content required"), 400
 
-    uid = get_jwt_identity()
-    try:
-        user_id_int = int(uid)
-    except ValueError:
-        return jsonify(msg="Invalid user ID in token"), 400
+    user_id_int = current_user.id
 
     try:
         s = Snippet(title=title, content=content, user_id=user_id_int)
         db.session.add(s)
+        precompile_snippet(s)
         db.session.commit()
         return jsonify(id=s.id), 201
     except Exception as e:
@@ -192,14 +656,107 @@ def create_snippet():
         return jsonify(msg="An error occurred creating the snippet"), 500
 
 
+@app.route('/api/snippets/<int:id>', methods=['PUT'])
+@jwt_required()
+def update_snippet(id):
+    data = request.get_json() or {}
+    title = data.get('title')
+    content = data.get('content')
+
+    if not title and not content:
+        return jsonify(msg="Title or content required"), 400
+
+    user_id_int = current_user.id
+
+    s = Snippet.query.get(id)
+    if not s:
+        return jsonify(msg="Snippet not found"), 404
+    if s.user_id != user_id_int:
+        return jsonify(msg="Forbidden"), 403
+
+    try:
+        if title:
+            s.title = title
+        if content:
+            old_hash = s.content_hash
+            s.content = content
+            precompile_snippet(s)
+            db.session.flush()
+            if old_hash and old_hash != s.content_hash:
+                prune_snippet_contents([old_hash])
+        db.session.commit()
+        return jsonify(id=s.id), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating snippet: {e}")
+        traceback.print_exc()
+        return jsonify(msg="An error occurred updating the snippet"), 500
+
+
+def snippet_flow_body(blob):
+    """
+    The /api/compile body for a content row: the stored one if it was built
+    by the current compiler, otherwise compiled now and stored on the row
+    (the caller commits).
+    """
+    from src.compile import CONVERTER_VERSION as COMPILER_VERSION
+    if blob.flow is not None and blob.flow_version == COMPILER_VERSION:
+        return zlib.decompress(blob.flow)
+    body, _ = compile_to_body(blob.text())
+    blob.flow = zlib.compress(body, 6)
+    blob.flow_version = COMPILER_VERSION
+    return body
+
+
+def precompile_snippet(s):
+    """Compile a new or edited snippet up front; failures are left to /flow to retry."""
+    try:
+        snippet_flow_body(s.content_row)
+    except (ConversionFailed, JobTimeout) as e:
+        print(f"Could not precompile snippet: {e}")
+
+
+@app.route('/api/snippets/<int:id>/flow', methods=['GET'])
+@jwt_required()
+def get_snippet_flow(id):
+    """React Flow JSON of a saved snippet, as {"react_flow": ...} like /api/compile."""
+    from src.compile import CONVERTER_VERSION as COMPILER_VERSION
+    user_id_int = current_user.id
+
+    s = Snippet.query.get(id)
+    if not s:
+        return jsonify(msg="Snippet not found"), 404
+    if s.user_id != user_id_int:
+        return jsonify(msg="Forbidden"), 403
+
+    # Content and compiler version fully determine the flow.
+    etag = f'{s.content_hash}-{COMPILER_VERSION}'
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    else:
+        try:
+            stale = s.content_row.flow_version != COMPILER_VERSION or s.content_row.flow is None
+            body = snippet_flow_body(s.content_row)
+            if stale:
+                db.session.commit()
+        except ConversionFailed as e:
+            db.session.rollback()
+            return jsonify(error="Recompilation failed", stderr=e.stderr), 500
+        except JobTimeout as e:
+            db.session.rollback()
+            return jsonify(error='Recompilation timed out', details=str(e)), 504
+        resp = Response(body, status=200, mimetype='application/json')
+        resp.headers['X-Flow-Cache'] = 'MISS' if stale else 'HIT'
+
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
 @app.route('/api/snippets/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_snippet(id): # Renamed for clarity
-    uid = get_jwt_identity()
-    try:
-        user_id_int = int(uid)
-    except ValueError:
-        return jsonify(msg="Invalid user ID in token"), 400
+    user_id_int = current_user.id
 
     s = Snippet.query.get(id) # Use get() instead of get_or_404 to handle not found explicitly
 
@@ -211,7 +768,10 @@ def delete_snippet(id): # Renamed for clarity
         return jsonify(msg="Forbidden"), 403
 
     try:
+        content_hash = s.content_hash
         db.session.delete(s)
+        db.session.flush()
+        prune_snippet_contents([content_hash] if content_hash else [])
         db.session.commit()
         # It's common for DELETE to return 204 No Content if no response body is needed
         return jsonify(msg="Snippet deleted"), 200 # Or 204 No Content with no body
@@ -234,40 +794,368 @@ def cleanup(path):
         traceback.print_exc()
 
 
-@app.route('/api/decode', methods=['POST'])
-@jwt_required()
-def decode():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No XML file uploaded'}), 400
+class ConversionFailed(Exception):
+    """The converter rejected the input; `stderr` carries its message."""
+    def __init__(self, stderr):
+        super().__init__(stderr)
+        self.stderr = stderr
+
+
+def run_converter(kind, payload, subprocess_fallback, finish=None):
+    """
+    Run a converter job in the worker pool, falling back to the per-request
+    subprocess only when the pool is disabled or cannot start workers. An
+    input that crashed its worker (e.g. past the memory limit) fails; it is
+    not retried without the pool's limits. For a streamed job (STREAMED_JOBS)
+    the payload is an iterable of byte chunks, and once they are all sent
+    finish() may return False to drop the job, which then returns None.
+    """
+    streamed = kind in STREAMED_JOBS
+    with stage('converter'):
+        if app.config['CONVERTER_MODE'] == 'pool':
+            try:
+                if streamed:
+                    return converter_pool.run_stream(kind, payload, finish=finish)
+                return converter_pool.run(kind, payload)
+            except WorkerError as e:
+                raise ConversionFailed(str(e))
+            except WorkerCrashed as e:
+                app.logger.warning("Converter worker crashed on a %s job: %s", kind, e)
+                raise ConversionFailed(f"The converter crashed on this input: {e}")
+            except JobTimeout:
+                raise
+            except PoolError as e:
+                app.logger.warning("Converter pool unavailable, falling back to subprocess: %s", e)
+        if streamed:
+            return subprocess_fallback(payload, finish)
+        return subprocess_fallback(payload)
+
+
+def run_subprocess(args, **kwargs):
+    """subprocess.run() bounded by CONVERTER_TIMEOUT like pooled jobs; raises JobTimeout."""
+    timeout = app.config['CONVERTER_TIMEOUT']
+    try:
+        return subprocess.run(args, timeout=timeout, **kwargs)
+    except subprocess.TimeoutExpired:
+        raise JobTimeout(f"Conversion exceeded {timeout}s")
+
+
+def decode_with_subprocess(xml_bytes, pkt=False):
+    # XML (or a .pkt with pkt=True) in on stdin, {"dsl", "react_flow"} out on stdout.
+    # Consider using an absolute path for subprocess calls in production
+    args = ['python3', 'src/decode.py'] + (['--pkt'] if pkt else []) + ['-'] # Use python3 explicitly
+    result = run_subprocess(args, input=xml_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    return decode_output(result.returncode, result.stdout, result.stderr)
+
+
+def decode_stream_with_subprocess(chunks, finish=None):
+    # The XML chunks are piped to the decoder's stdin as they arrive; like
+    # the pooled job, finish() returning False drops it (returns None).
+    timeout = app.config['CONVERTER_TIMEOUT']
+    deadline = time.monotonic() + timeout
+    proc = subprocess.Popen(['python3', 'src/decode.py', '-'], # Use python3 explicitly
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        try:
+            for chunk in chunks:
+                if time.monotonic() > deadline:
+                    raise JobTimeout(f"Conversion exceeded {timeout}s")
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass # The decoder gave up early; its stderr says why.
+        if finish is not None and not finish():
+            return None
+        stdout, stderr = proc.communicate(timeout=max(0.0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        raise JobTimeout(f"Conversion exceeded {timeout}s")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            proc.communicate()
+    return decode_output(proc.returncode, stdout, stderr)
 
-    xml_file = request.files['file']
-    if not xml_file.filename.lower().endswith('.xml'):
-        return jsonify({'error': 'Only XML files are allowed'}), 400
 
-    xml_bytes = xml_file.read()
-    temp_xml, temp_dsl = None, None
+def decode_output(returncode, stdout, stderr):
+    if returncode != 0:
+        stderr = stderr.decode('utf-8', 'replace')
+        print(f"Decode script failed: {stderr}")
+        raise ConversionFailed(stderr.strip())
+
+    return json.loads(stdout)
+
+
+# Decoder job kind -> subprocess fallback; .pkt/.pka files are decrypted
+# first, 'decode_stream' takes the upload as an iterable of chunks.
+DECODE_FALLBACKS = {
+    'decode': decode_with_subprocess,
+    'decode_pkt': lambda data: decode_with_subprocess(data, pkt=True),
+    'decode_stream': decode_stream_with_subprocess,
+}
+PKT_EXTENSIONS = ('.pkt', '.pka')
+
+
+def decode_kind(filename):
+    """The decoder job kind for an uploaded file name, or None if unsupported."""
+    name = (filename or '').lower()
+    if name.endswith('.xml'):
+        return 'decode'
+    if name.endswith(PKT_EXTENSIONS):
+        return 'decode_pkt'
+    return None
+
+
+def compile_with_subprocess(dsl_text):
+    dsl_path = None
     try:
-        # Use tempfile.NamedTemporaryFile to create temporary files securely
-        with tempfile.NamedTemporaryFile(suffix='.xml', delete=False) as tx:
-            tx.write(xml_bytes)
-            temp_xml = tx.name
-        with tempfile.NamedTemporaryFile(suffix='.dsl', delete=False) as td:
-            temp_dsl = td.name
-
-        # Ensure decode.py is in the PATH or specify its full path if not in the same directory
+        with tempfile.NamedTemporaryFile(suffix='.dsl', delete=False, mode='w', encoding='utf-8') as tf:
+            tf.write(dsl_text)
+            dsl_path = tf.name
+
+        # Ensure compile.py is in the PATH or specify its full path if not in the same directory
         # Consider using an absolute path for subprocess calls in production
-        result = subprocess.run(
-            ['python3', 'src/decode.py', temp_xml, temp_dsl], # Use python3 explicitly
+        result = run_subprocess(
+            ['python3', 'src/compile.py', dsl_path], # Use python3 explicitly
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False
         )
+
         if result.returncode != 0:
-            print(f"Decode script failed: {result.stderr}")
-            return jsonify(error='Conversion failed', stderr=result.stderr.strip()), 500
+            print(f"Compile script failed: {result.stderr}")
+            raise ConversionFailed(result.stderr.strip())
+
+        return json.loads(result.stdout)
+    finally:
+        # Ensure temporary file is cleaned up
+        if dsl_path:
+            cleanup(dsl_path)
 
-        dsl_code = open(temp_dsl, 'r', encoding='utf-8').read()
-        rf_json  = json.loads(result.stdout)
-        return jsonify(dsl=dsl_code, react_flow=rf_json), 200
 
+def cached_conversion(key, produce, mimetype='application/json', flow=False):
+    """
+    Serve a conversion result by content key. A matching If-None-Match gets a
+    304 without touching the cache or the converter; otherwise the cached body
+    is returned, or produce() is called and its result cached. produce()
+    returns the JSON result, or the body bytes for any other mimetype.
+    flow=True marks a decode/compile result: its X-Flow-Key header gives the
+    current user the /api/flow/<flow key>/... lookups on it (see flow_key).
+    """
+    # Weak comparison (RFC 9110): compressed variants carry W/ ETags.
+    if request.if_none_match.contains_weak(key):
+        resp = Response(status=304)
+        resp.headers['X-Cache'] = 'HIT'
+        if flow:
+            resp.headers['X-Flow-Key'] = flow_key(key)
+    else:
+        body = result_cache.get(key)
+        cache_status = 'HIT'
+        if body is None:
+            body = produce()
+            if mimetype == 'application/json':
+                with stage('serialize'):
+                    body = app.json.dumps(body).encode('utf-8')
+            result_cache.put(key, body)
+            cache_status = 'MISS'
+        resp = Response(body, status=200, mimetype=mimetype)
+        resp.headers['X-Cache'] = cache_status
+        if flow:
+            resp.headers['X-Flow-Key'] = flow_key(key)
+
+    resp.set_etag(key)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+def flow_signature(user_id, key):
+    message = f'flow:{user_id}:{key}'.encode('utf-8')
+    return hmac.new(app.config['SECRET_KEY'].encode('utf-8'), message, hashlib.sha256).hexdigest()[:32]
+
+
+def flow_key(key):
+    """
+    The current user's handle on flow result `key` for /api/flow/<flow key>/...:
+    the key plus an HMAC binding it to the user. ETags are content hashes
+    shared by every user who converts the same input, so those routes only
+    serve keys the caller was actually sent, and never other cached bodies
+    (renders, reports). Being signed, a flow key is checked by any worker
+    without storing grants anywhere.
+    """
+    return f'{key}.{flow_signature(current_user.id, key)}'
+
+
+def flow_result_key(handle):
+    """The result key a flow key issued to the current user stands for, or None."""
+    key, _, signature = handle.removeprefix('W/').strip('"').rpartition('.')
+    if not key or not hmac.compare_digest(signature, flow_signature(current_user.id, key)):
+        return None
+    return key
+
+
+def react_flow_of(body):
+    """The react_flow of a cached decode/compile body, or None if it has none."""
+    try:
+        flow = json.loads(body)['react_flow']
+    except (ValueError, KeyError, TypeError):
+        return None
+    return flow if isinstance(flow, dict) else None
+
+
+# Request bodies that /api/decode treats as the raw XML document
+RAW_XML_MIMETYPES = ('application/xml', 'text/xml', 'application/octet-stream')
+UPLOAD_CHUNK = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class BadRequestBody(Exception):
+    """Unsupported Content-Encoding or a corrupt compressed body."""
+
+
+def iter_upload(stream):
+    """Read a request body in chunks, enforcing MAX_UPLOAD_BYTES as it goes."""
+    limit = app.config['MAX_UPLOAD_BYTES']
+    received = 0
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK)
+        if not chunk:
+            return
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(f'Upload exceeds {limit} bytes')
+        yield chunk
+
+
+def iter_request_body(stream):
+    """
+    The request body in chunks, decompressed on the fly when it was sent
+    with Content-Encoding gzip or deflate. MAX_UPLOAD_BYTES applies to the
+    decompressed size, and no step inflates more than a bounded amount, so
+    a compression bomb is cut off early.
+    """
+    encoding = (request.headers.get('Content-Encoding') or 'identity').strip().lower()
+    if encoding == 'identity':
+        yield from iter_upload(stream)
+        return
+    if encoding not in ('gzip', 'x-gzip', 'deflate'):
+        raise BadRequestBody(f'Unsupported Content-Encoding {encoding!r}')
+
+    limit = app.config['MAX_UPLOAD_BYTES']
+    produced = 0
+    # wbits=47 accepts both gzip and zlib ("deflate") framing.
+    inflater = zlib.decompressobj(wbits=47)
+    try:
+        for chunk in iter_upload(stream):
+            while chunk:
+                data = inflater.decompress(chunk, UPLOAD_CHUNK)
+                chunk = inflater.unconsumed_tail
+                produced += len(data)
+                if produced > limit:
+                    raise UploadTooLarge(f'Upload exceeds {limit} bytes once decompressed')
+                if data:
+                    yield data
+        data = inflater.flush()
+    except zlib.error as e:
+        raise BadRequestBody(f'Invalid {encoding} body: {e}')
+    if not inflater.eof:
+        raise BadRequestBody(f'Truncated {encoding} body')
+    if produced + len(data) > limit:
+        raise UploadTooLarge(f'Upload exceeds {limit} bytes once decompressed')
+    if data:
+        yield data
+
+
+def request_json():
+    """request.json, also for bodies sent with Content-Encoding gzip/deflate."""
+    if (request.headers.get('Content-Encoding') or 'identity').strip().lower() == 'identity':
+        return request.json
+    try:
+        return json.loads(b''.join(iter_request_body(request.stream)))
+    except ValueError as e:
+        raise BadRequestBody(f'Invalid JSON body: {e}')
+
+
+def decode_streamed_upload(chunks):
+    """
+    Decode an XML request body (the chunks of iter_request_body) while it
+    is received: each chunk is hashed and fed straight to a pool worker's
+    parser, so the document is never held in memory or written to disk.
+    Once the body has ended, a cached result for its hash (or a matching
+    If-None-Match) is served and the worker drops the job before building
+    any output.
+    """
+    from src.decode import CONVERTER_VERSION as DECODER_VERSION
+    hasher = result_hasher('decode', DECODER_VERSION)
+    received = 0
+    cached = None
+
+    def hashed():
+        nonlocal received
+        for chunk in chunks:
+            received += len(chunk)
+            hasher.update(chunk)
+            yield chunk
+
+    def finish():
+        nonlocal cached
+        BYTES.inc(received, stage='upload')
+        key = hasher.hexdigest()
+        if request.if_none_match.contains_weak(key):
+            return False
+        cached = result_cache.get(key)
+        return cached is None
+
+    result = run_converter('decode_stream', hashed(), DECODE_FALLBACKS['decode_stream'], finish)
+
+    def produce():
+        # Only reached on a miss, or if the cached body was evicted since finish().
+        if result is not None:
+            return {'dsl': result['dsl'], 'react_flow': result['react_flow']}
+        return json.loads(cached)
+
+    return cached_conversion(hasher.hexdigest(), produce, flow=True)
+
+
+@app.route('/api/decode', methods=['POST'])
+@jwt_required()
+def decode():
+    """
+    Decode Packet Tracer XML, uploaded either as multipart `file` or as the
+    raw request body (Content-Type application/xml, text/xml or
+    application/octet-stream), which is streamed to a converter pool worker
+    as it arrives and served from the cache when its hash matches. Saved
+    .pkt/.pka files are accepted as they are and decrypted server-side.
+    """
+    from src.decode import CONVERTER_VERSION as DECODER_VERSION
+    limit = app.config['MAX_UPLOAD_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify(error=f'Upload exceeds {limit} bytes'), 413
+
+    if request.mimetype in RAW_XML_MIMETYPES:
+        return decode_raw_body()
+    if request.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+        return jsonify(error='Compressed uploads must be sent as the raw request body'), 415
+
+    if 'file' not in request.files:
+        return jsonify({'error': 'No XML file uploaded'}), 400
+
+    xml_file = request.files['file']
+    kind = decode_kind(xml_file.filename)
+    if kind is None:
+        return jsonify({'error': 'Only XML or Packet Tracer (.pkt/.pka) files are allowed'}), 400
+
+    with stage('read_upload'):
+        xml_bytes = xml_file.read()
+    BYTES.inc(len(xml_bytes), stage='upload')
+    if wants_async():
+        return submit_job(kind, xml_bytes)
+    try:
+        return cached_conversion(result_key(kind, DECODER_VERSION, xml_bytes),
+                                 lambda: decode_result(xml_bytes, kind), flow=True)
+
+    except ConversionFailed as e:
+        return jsonify(error='Conversion failed', stderr=e.stderr), 500
+    except JobTimeout as e:
+        return jsonify(error='Conversion timed out', details=str(e)), 504
     except json.JSONDecodeError as e:
         print(f"JSON decoding error in decode endpoint: {e}")
         traceback.print_exc()
@@ -276,38 +1164,281 @@ def decode():
         traceback.print_exc()
         return jsonify(error='Internal error during decode', details=str(e)), 500
 
-    finally:
-        # Ensure temporary files are cleaned up
-        for f in (temp_xml, temp_dsl):
-            cleanup(f)
+
+def sniff_pkt(chunks):
+    """
+    Tell a .pkt body from XML by its first bytes: XML opens with '<' (after
+    an optional BOM and whitespace), an encrypted file practically never
+    does. Returns (is_pkt, chunks) with the peeked bytes put back in front.
+    """
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        start = head.lstrip(b'\xef\xbb\xbf').lstrip()
+        if start or len(head) >= UPLOAD_CHUNK:
+            break
+    start = head.lstrip(b'\xef\xbb\xbf').lstrip()
+    return (bool(start) and not start.startswith(b'<')), itertools.chain([head], chunks)
+
+
+def decode_raw_body():
+    from src.decode import CONVERTER_VERSION as DECODER_VERSION
+    try:
+        chunks = iter_request_body(request.stream)
+        fmt = request.args.get('format')
+        if fmt is None:
+            is_pkt, chunks = sniff_pkt(chunks)
+        elif fmt in ('pkt', 'xml'):
+            is_pkt = fmt == 'pkt'
+        else:
+            return jsonify(error="format must be 'xml' or 'pkt'"), 400
+
+        if is_pkt:
+            # The file is decrypted as a whole, so it has to be read first;
+            # iter_request_body already bounds it by MAX_UPLOAD_BYTES.
+            with stage('read_upload'):
+                data = b''.join(chunks)
+            BYTES.inc(len(data), stage='upload')
+            if wants_async():
+                return submit_job('decode_pkt', data)
+            return cached_conversion(result_key('decode_pkt', DECODER_VERSION, data),
+                                     lambda: decode_result(data, 'decode_pkt'), flow=True)
+        if wants_async():
+            # Stored chunk by chunk: the job row needs the whole body anyway.
+            return submit_job('decode', chunks)
+        return decode_streamed_upload(chunks)
+
+    except UploadTooLarge as e:
+        return jsonify(error=str(e)), 413
+    except BadRequestBody as e:
+        return jsonify(error=str(e)), 400
+    except ConversionFailed as e:
+        return jsonify(error='Conversion failed', stderr=e.stderr), 500
+    except JobTimeout as e:
+        return jsonify(error='Conversion timed out', details=str(e)), 504
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify(error='Internal error during decode', details=str(e)), 500
+
+
+class BatchRejected(Exception):
+    """The batch upload is unusable as a whole (no files, too many, bad zip)."""
+
+
+def collect_batch_inputs(uploads):
+    """
+    Flatten the uploaded files into [(filename, kind, data)], kind being the
+    decoder job kind. A .zip upload contributes every .xml, .pkt and .pka
+    member; other uploads must be one of those themselves.
+    """
+    max_files, max_bytes = app.config['BATCH_MAX_FILES'], app.config['BATCH_MAX_BYTES']
+    inputs, total = [], 0
+
+    def add(name, size, read):
+        nonlocal total
+        if len(inputs) >= max_files:
+            raise BatchRejected(f'Too many files (limit {max_files})')
+        total += size
+        if total > max_bytes:
+            raise BatchRejected(f'Batch exceeds {max_bytes} bytes')
+        inputs.append((name, decode_kind(name), read()))
+
+    for upload in uploads:
+        name = upload.filename or ''
+        if name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(upload.stream) as archive:
+                    for info in archive.infolist():
+                        member = info.filename
+                        if info.is_dir() or not decode_kind(member) or member.startswith('__MACOSX/'):
+                            continue
+                        add(member, info.file_size, lambda: archive.read(info))
+            except zipfile.BadZipFile as e:
+                raise BatchRejected(f'{name}: not a valid zip archive ({e})')
+        elif decode_kind(name):
+            data = upload.read()
+            add(name, len(data), lambda: data)
+        else:
+            raise BatchRejected(f'{name}: only XML, .pkt/.pka or zip files are allowed')
+
+    if not inputs:
+        raise BatchRejected('No XML or .pkt files uploaded')
+    return inputs
+
+
+def decode_result(data, kind='decode'):
+    """Run decoder job `kind` on the uploaded bytes."""
+    result = run_converter(kind, data, DECODE_FALLBACKS[kind])
+    return {'dsl': result['dsl'], 'react_flow': result['react_flow']}
+
+
+def decode_to_body(data, kind='decode'):
+    """Decode through the result cache; returns (JSON body bytes, cache status)."""
+    from src.decode import CONVERTER_VERSION as DECODER_VERSION
+    key = result_key(kind, DECODER_VERSION, data)
+    body = result_cache.get(key)
+    if body is not None:
+        return body, 'HIT'
+    result = decode_result(data, kind)
+    with stage('serialize'):
+        body = app.json.dumps(result).encode('utf-8')
+    result_cache.put(key, body)
+    return body, 'MISS'
+
+
+def compile_to_body(dsl_text):
+    """Compile through the result cache; returns (JSON body bytes, cache status)."""
+    from src.compile import CONVERTER_VERSION as COMPILER_VERSION
+    key = result_key('compile', COMPILER_VERSION, dsl_text.encode('utf-8'))
+    body = result_cache.get(key)
+    if body is not None:
+        return body, 'HIT'
+    result = {'react_flow': run_converter('compile', dsl_text, compile_with_subprocess)}
+    with stage('serialize'):
+        body = app.json.dumps(result).encode('utf-8')
+    result_cache.put(key, body)
+    return body, 'MISS'
+
+
+@app.route('/api/decode/batch', methods=['POST'])
+@jwt_required()
+def decode_batch():
+    """
+    Decode many XML or .pkt/.pka files (multipart `files`, and/or zip
+    archives of them) in parallel and stream one NDJSON line per file as
+    soon as it finishes:
+    {"index", "filename", "cache", "result": {"dsl", "react_flow"}} or
+    {"index", "filename", "error", ...}. Lines arrive in completion order.
+    """
+    try:
+        inputs = collect_batch_inputs(request.files.getlist('files') + request.files.getlist('file'))
+    except BatchRejected as e:
+        return jsonify(error=str(e)), 400
+
+    def line(obj, result=None):
+        head = app.json.dumps(obj).encode('utf-8')
+        if result is None:
+            return head + b'\n'
+        # Splice the cached body in as-is instead of re-encoding it.
+        return head[:-1] + b', "result": ' + result + b'}\n'
+
+    def generate():
+        # The converter pool is thread-safe and each call occupies one worker
+        # process, so one thread per worker keeps every core busy.
+        executor = ThreadPoolExecutor(max_workers=min(converter_pool.size, len(inputs)))
+        try:
+            futures = {executor.submit(decode_to_body, data, kind): i for i, (_, kind, data) in enumerate(inputs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                item = {'index': i, 'filename': inputs[i][0]}
+                try:
+                    body, cache_status = future.result()
+                    item['cache'] = cache_status
+                    yield line(item, body)
+                except ConversionFailed as e:
+                    yield line(dict(item, error='Conversion failed', stderr=e.stderr))
+                except JobTimeout as e:
+                    yield line(dict(item, error='Conversion timed out', details=str(e)))
+                except Exception as e:
+                    traceback.print_exc()
+                    yield line(dict(item, error='Internal error during decode', details=str(e)))
+        finally:
+            # Client went away: drop whatever has not started yet.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    resp = Response(stream_with_context(generate()), status=200, mimetype='application/x-ndjson')
+    resp.headers['X-Batch-Files'] = str(len(inputs))
+    resp.headers['X-Accel-Buffering'] = 'no'    # let nginx pass lines through as they come
+    return resp
+
+
+# (user id, editor session) -> incremental compiler state, least recently used first
+compile_sessions = OrderedDict()
+compile_sessions_lock = threading.Lock()
+
+
+def get_compile_session(user_id, session_id):
+    from src.compile import IncrementalCompiler
+    key = (user_id, session_id)
+    with compile_sessions_lock:
+        entry = compile_sessions.pop(key, None)
+        if entry is None:
+            entry = {'compiler': IncrementalCompiler(), 'revision': None, 'lock': threading.Lock()}
+        compile_sessions[key] = entry
+        while len(compile_sessions) > app.config['COMPILE_SESSIONS']:
+            compile_sessions.popitem(last=False)
+    return entry
+
+
+def compile_incremental(dsl_text, data):
+    """
+    Recompile only the blocks that changed since this editor session's last
+    request. With "patch": true and "base" equal to the previous revision,
+    only the node/edge changes are returned; otherwise the full graph.
+    """
+    from src.compile import CONVERTER_VERSION as COMPILER_VERSION
+    from src.compile import IncrementalCompiler, diff_react_flow
+    entry = get_compile_session(current_user.id, str(data.get('session') or 'default'))
+    dsl_bytes = dsl_text.encode('utf-8')
+    if len(dsl_bytes) > app.config['INCREMENTAL_MAX_BYTES']:
+        # Too big for the request thread: a full, time-limited compile in the
+        # pool. The session starts over, so a later patch request against
+        # this revision gets the full graph too.
+        revision = result_key('compile', COMPILER_VERSION, dsl_bytes)
+        with entry['lock']:
+            entry['compiler'], entry['revision'] = IncrementalCompiler(), None
+        react_flow = run_converter('compile', dsl_text, compile_with_subprocess)
+        return jsonify(revision=revision, incremental=False, react_flow=react_flow), 200
+
+    compiler = entry['compiler']
+    with entry['lock']:
+        previous, previous_revision = compiler.last_result, entry['revision']
+        react_flow = compiler.compile(dsl_text)
+        revision = result_key('compile', COMPILER_VERSION, dsl_bytes)
+        entry['revision'] = revision
+        body = {'revision': revision, 'incremental': True,
+                'compiled_blocks': compiler.compiled, 'reused_blocks': compiler.reused}
+
+    if data.get('patch') and previous is not None and data.get('base') == previous_revision:
+        body['base'] = previous_revision
+        body['react_flow_patch'] = diff_react_flow(previous, react_flow)
+    else:
+        body['react_flow'] = react_flow
+    return jsonify(body), 200
 
 
 @app.route('/api/compile', methods=['POST'])
 @jwt_required()
 def compile_dsl(): # Renamed 'compile' to avoid conflict with built-in compile
+    from src.compile import CONVERTER_VERSION as COMPILER_VERSION
     try:
-        dsl_text = request.json.get("dsl")
+        data = request_json()
+        dsl_text = data.get("dsl")
         if not dsl_text:
             return jsonify(error="No DSL code provided"), 400
 
-        with tempfile.NamedTemporaryFile(suffix='.dsl', delete=False, mode='w', encoding='utf-8') as tf:
-            tf.write(dsl_text)
-            dsl_path = tf.name
+        # Incremental edits are cheap enough to run on the request thread,
+        # where the per-session block cache lives, up to INCREMENTAL_MAX_BYTES.
+        if data.get("incremental"):
+            return compile_incremental(dsl_text, data)
 
-        # Ensure compile.py is in the PATH or specify its full path if not in the same directory
-        # Consider using an absolute path for subprocess calls in production
-        result = subprocess.run(
-            ['python3', 'src/compile.py', dsl_path], # Use python3 explicitly
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False
-        )
+        if wants_async():
+            return submit_job('compile', dsl_text.encode('utf-8'))
 
-        if result.returncode != 0:
-            print(f"Compile script failed: {result.stderr}")
-            return jsonify(error="Recompilation failed", stderr=result.stderr.strip()), 500
+        def produce():
+            return {'react_flow': run_converter('compile', dsl_text, compile_with_subprocess)}
 
-        rf_json = json.loads(result.stdout)
-        return jsonify(react_flow=rf_json), 200
+        key = result_key('compile', COMPILER_VERSION, dsl_text.encode('utf-8'))
+        return cached_conversion(key, produce, flow=True)
 
+    except UploadTooLarge as e:
+        return jsonify(error=str(e)), 413
+    except BadRequestBody as e:
+        return jsonify(error=str(e)), 400
+    except ConversionFailed as e:
+        return jsonify(error="Recompilation failed", stderr=e.stderr), 500
+    except JobTimeout as e:
+        return jsonify(error='Recompilation timed out', details=str(e)), 504
     except json.JSONDecodeError as e:
         print(f"JSON decoding error in compile endpoint: {e}")
         traceback.print_exc()
@@ -315,10 +1446,457 @@ def compile_dsl(): # Renamed 'compile' to avoid conflict with built-in compile
     except Exception as e:
         traceback.print_exc()
         return jsonify(error="Internal error during compile", details=str(e)), 500
-    finally:
-        # Ensure temporary file is cleaned up
-        if 'dsl_path' in locals() and dsl_path:
-            cleanup(dsl_path)
+
+
+def dot_in_process(xml_bytes):
+    from pka2xml.graph import load_topology, to_dot
+    return to_dot(load_topology(xml_bytes))
+
+
+def topology_dot(xml_bytes):
+    """DOT source for an uploaded lab, cached by the XML's content hash."""
+    key = result_key('dot', RENDER_VERSION, xml_bytes)
+    dot_source = result_cache.get(key)
+    if dot_source is None:
+        dot_source = run_converter('dot', xml_bytes, dot_in_process).encode('utf-8')
+        result_cache.put(key, dot_source)
+    return dot_source.decode('utf-8')
+
+
+@app.route('/api/render', methods=['POST'])
+@jwt_required()
+def render_topology():
+    """
+    Render the topology of an uploaded Packet Tracer XML file as SVG, or PNG
+    with ?format=png. Images are cached by topology (the DOT source) and
+    format, so labs that differ only outside NETWORK share one image.
+    """
+    fmt = (request.args.get('format') or request.form.get('format') or 'svg').lower()
+    if fmt not in RENDER_FORMATS:
+        return jsonify(error=f"Unsupported format, use one of: {', '.join(RENDER_FORMATS)}"), 400
+
+    if 'file' not in request.files:
+        return jsonify({'error': 'No XML file uploaded'}), 400
+
+    xml_file = request.files['file']
+    if not xml_file.filename.lower().endswith('.xml'):
+        return jsonify({'error': 'Only XML files are allowed'}), 400
+
+    xml_bytes = xml_file.read()
+    try:
+        dot_source = topology_dot(xml_bytes)
+        key = result_key('render', f'{RENDER_VERSION}/{fmt}', dot_source.encode('utf-8'))
+        return cached_conversion(key, lambda: renderer.render(dot_source, fmt), mimetype=RENDER_FORMATS[fmt])
+
+    except ConversionFailed as e:
+        return jsonify(error='Conversion failed', stderr=e.stderr), 500
+    except JobTimeout as e:
+        return jsonify(error='Conversion timed out', details=str(e)), 504
+    except RenderBusy as e:
+        return jsonify(error='Renderer busy, try again', details=str(e)), 503
+    except RenderTimeout as e:
+        return jsonify(error='Rendering timed out', details=str(e)), 504
+    except RenderError as e:
+        print(f"Render failed: {e}")
+        return jsonify(error='Rendering failed', details=str(e)), 500
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify(error='Internal error during render', details=str(e)), 500
+
+
+# content key of an original XML -> its write-back index, least recently used first
+writeback_indexes = OrderedDict()
+writeback_indexes_lock = threading.Lock()
+
+
+def get_writeback_index(xml_bytes):
+    from src.writeback import build_index, WRITEBACK_VERSION
+    key = result_key('writeback-index', WRITEBACK_VERSION, xml_bytes)
+    with writeback_indexes_lock:
+        index = writeback_indexes.pop(key, None)
+    if index is None:
+        index = build_index(xml_bytes)
+    with writeback_indexes_lock:
+        writeback_indexes[key] = index
+        while len(writeback_indexes) > app.config['WRITEBACK_INDEXES']:
+            writeback_indexes.popitem(last=False)
+    return index
+
+
+@app.route('/api/writeback', methods=['POST'])
+@jwt_required()
+def writeback():
+    """
+    Apply an edited DSL (form field or file `dsl`) to the Packet Tracer XML
+    it was decoded from (multipart `file`) and stream back the updated XML.
+    Only changed DEVICE/LINK elements are rewritten; edits that cannot be
+    expressed are listed in the X-Writeback-Warnings header (JSON array).
+    """
+    from src.decode import DecodeError
+    from src.lalr import DSLSyntaxError
+    from src.writeback import plan_edits, iter_splice, WritebackError
+    if 'file' not in request.files:
+        return jsonify({'error': 'No XML file uploaded'}), 400
+    xml_file = request.files['file']
+    if not xml_file.filename.lower().endswith('.xml'):
+        return jsonify({'error': 'Only XML files are allowed'}), 400
+
+    dsl_text = request.form.get('dsl')
+    if dsl_text is None and 'dsl' in request.files:
+        dsl_text = request.files['dsl'].read().decode('utf-8', 'replace')
+    if not dsl_text:
+        return jsonify(error="No DSL code provided"), 400
+
+    xml_bytes = xml_file.read()
+    try:
+        edits, warnings = plan_edits(xml_bytes, get_writeback_index(xml_bytes), dsl_text)
+    except DSLSyntaxError as e:
+        return jsonify(error='Invalid DSL', details=str(e), line=e.line, column=e.column), 400
+    except (DecodeError, WritebackError) as e:
+        return jsonify(error='Write-back failed', details=str(e)), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify(error='Internal error during write-back', details=str(e)), 500
+
+    resp = Response(iter_splice(xml_bytes, edits), status=200, mimetype='application/xml')
+    resp.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(xml_file.filename)}"'
+    resp.headers['X-Writeback-Warnings'] = json.dumps(warnings)
+    return resp
+
+
+# ETag of a flow -> its spatial index, least recently used first
+viewport_indexes = OrderedDict()
+viewport_indexes_lock = threading.Lock()
+
+
+def get_viewport_index(key, load_body):
+    """The ViewportIndex for flow `key`; load_body() returns the JSON body bytes."""
+    from src.spatial import ViewportIndex
+    with viewport_indexes_lock:
+        index = viewport_indexes.pop(key, None)
+    if index is None:
+        body = load_body()
+        flow = react_flow_of(body) if body is not None else None
+        if flow is None:
+            return None
+        index = ViewportIndex(flow)
+    with viewport_indexes_lock:
+        viewport_indexes[key] = index
+        while len(viewport_indexes) > app.config['VIEWPORT_INDEXES']:
+            viewport_indexes.popitem(last=False)
+    return index
+
+
+class BadViewport(Exception):
+    pass
+
+
+def viewport_args():
+    """(x0, y0, x1, y1, zoom) from ?bbox=x0,y0,x1,y1&zoom=z."""
+    try:
+        bbox = [float(v) for v in request.args.get('bbox', '').split(',')]
+        zoom = float(request.args.get('zoom', 1))
+    except ValueError:
+        raise BadViewport('bbox must be x0,y0,x1,y1 and zoom a number')
+    if len(bbox) != 4 or not all(map(math.isfinite, bbox + [zoom])) or zoom <= 0:
+        raise BadViewport('bbox must be four finite numbers x0,y0,x1,y1 and zoom positive')
+    return (*bbox, zoom)
+
+
+def viewport_response(key, load_body):
+    try:
+        x0, y0, x1, y1, zoom = viewport_args()
+    except BadViewport as e:
+        return jsonify(error='Invalid viewport', details=str(e)), 400
+    index = get_viewport_index(key, load_body)
+    if index is None:
+        return jsonify(error='Unknown or expired flow; run the conversion again'), 404
+    view = index.query(x0, y0, x1, y1, zoom, limit=app.config['VIEWPORT_MAX_ELEMENTS'])
+    view['bbox'] = [x0, y0, x1, y1]
+    resp = jsonify(view)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+@app.route('/api/flow/<handle>/viewport', methods=['GET'])
+@jwt_required()
+def flow_viewport(handle):
+    """
+    The part of a decode/compile result (by its X-Flow-Key) inside
+    ?bbox=x0,y0,x1,y1 at ?zoom=, clustered when zoomed out (see src/spatial.py).
+    Only results this user was sent are served.
+    """
+    # Checked before the index cache, which is shared by every user.
+    key = flow_result_key(handle)
+    if key is None:
+        return jsonify(error='Unknown or expired flow; run the conversion again'), 404
+    return viewport_response(key, lambda: result_cache.get(key))
+
+
+@app.route('/api/snippets/<int:id>/flow/viewport', methods=['GET'])
+@jwt_required()
+def get_snippet_flow_viewport(id):
+    """Viewport query over a saved snippet's flow, like /api/flow/<flow key>/viewport."""
+    from src.compile import CONVERTER_VERSION as COMPILER_VERSION
+    user_id_int = current_user.id
+
+    s = Snippet.query.get(id)
+    if not s:
+        return jsonify(msg="Snippet not found"), 404
+    if s.user_id != user_id_int:
+        return jsonify(msg="Forbidden"), 403
+
+    def load_body():
+        stale = s.content_row.flow_version != COMPILER_VERSION or s.content_row.flow is None
+        body = snippet_flow_body(s.content_row)
+        if stale:
+            db.session.commit()
+        return body
+
+    try:
+        return viewport_response(f'{s.content_hash}-{COMPILER_VERSION}', load_body)
+    except ConversionFailed as e:
+        db.session.rollback()
+        return jsonify(error="Recompilation failed", stderr=e.stderr), 500
+    except JobTimeout as e:
+        db.session.rollback()
+        return jsonify(error='Recompilation timed out', details=str(e)), 504
+
+
+@app.route('/api/flow/<handle>/addressing', methods=['GET'])
+@jwt_required()
+def flow_addressing(handle):
+    """
+    IP addressing report (duplicates, links across subnets, hosts without a
+    usable gateway; see src/addressing.py) of a decode/compile result by its
+    X-Flow-Key, for users who were sent that result. ?prefix= gives interfaces
+    without a mask, as in compiled DSL, that prefix length.
+    """
+    from src.addressing import check_addressing, ADDRESSING_VERSION
+    key = flow_result_key(handle)
+    prefix = request.args.get('prefix')
+    if prefix is not None:
+        try:
+            prefix = int(prefix)
+        except ValueError:
+            prefix = -1
+        if not 1 <= prefix <= 32:
+            return jsonify(error='prefix must be an integer from 1 to 32'), 400
+
+    body = result_cache.get(key) if key is not None else None
+    flow = react_flow_of(body) if body is not None else None
+    if flow is None:
+        return jsonify(error='Unknown or expired flow; run the conversion again'), 404
+    report_key = result_key('addressing', ADDRESSING_VERSION, f'{key}/{prefix}'.encode('utf-8'))
+    try:
+        return cached_conversion(report_key, lambda: check_addressing(flow, prefix))
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify(error='Addressing check failed', details=str(e)), 500
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+
+# ─── Async Jobs (/api/jobs) ───────────────────────────────────────────────────
+
+def run_job(to_body):
+    """Adapt a *_to_body converter to a job handler, mapping converter errors."""
+    def handler(payload, progress):
+        progress(0.1, 'converting')
+        try:
+            body, _ = to_body(payload)
+        except ConversionFailed as e:
+            raise JobFailed('Conversion failed', stderr=e.stderr)
+        except JobTimeout as e:
+            raise JobFailed('Conversion timed out', details=str(e))
+        return body
+    return handler
+
+
+job_queue = JobQueue(
+    app.config['JOB_DB'],
+    handlers={
+        'decode': run_job(decode_to_body),
+        'decode_pkt': run_job(lambda payload: decode_to_body(payload, 'decode_pkt')),
+        'compile': run_job(lambda payload: compile_to_body(payload.decode('utf-8'))),
+    },
+    workers=app.config['JOB_WORKERS'],
+    ttl=app.config['JOB_TTL'],
+    # Running jobs renew their lease; it only decides how soon a job whose
+    # process died is picked up again, so it need not cover a slow conversion.
+    lease=2 * app.config['CONVERTER_TIMEOUT'] + 30,
+)
+
+
+@app.before_request
+def start_job_workers():
+    # Per-process and lazy, like the converter pool; also resumes jobs left
+    # unfinished by a previous run as soon as the first request comes in.
+    job_queue.start()
+
+
+def wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def job_view(job):
+    """Client-facing job dict: the owner is dropped and the result decoded."""
+    view = {k: v for k, v in job.items() if k not in ('owner', 'result')}
+    if job['result'] is not None:
+        view['result'] = json.loads(job['result'])
+    return view
+
+
+def submit_job(kind, payload):
+    try:
+        job_id = job_queue.submit(kind, payload, owner=str(current_user.id))
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify(error='Could not queue job', details=str(e)), 500
+    resp = jsonify(job_view(job_queue.get(job_id)))
+    resp.status_code = 202
+    resp.headers['Location'] = f'/api/jobs/{job_id}'
+    return resp
+
+
+def get_own_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job['owner'] != str(current_user.id):
+        return None
+    return job
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    job = get_own_job(job_id)
+    if not job:
+        return jsonify(msg="Job not found"), 404
+    return jsonify(job_view(job)), 200
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+@jwt_required()
+def job_events(job_id):
+    """
+    Server-sent events for one job: a `progress` event on every change and a
+    final `done` or `failed` event carrying the result or error, after which
+    the stream ends.
+    """
+    job = get_own_job(job_id)
+    if not job:
+        return jsonify(msg="Job not found"), 404
+
+    def event(name, data):
+        return f'event: {name}\ndata: {app.json.dumps(data)}\n\n'
+
+    def generate(job):
+        while True:
+            if job is None:
+                yield event('failed', {'error': 'Job expired'})
+                return
+            if job['status'] in JOB_FINISHED:
+                yield event(job['status'], job_view(job))
+                return
+            yield event('progress', job_view(job))
+            since = job['updated_at']
+            while True:
+                job = job_queue.wait(job_id, since, timeout=15)
+                if job is None or job['updated_at'] > since:
+                    break
+                yield ': keep-alive\n\n'
+
+    resp = Response(generate(job), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+@app.route('/api/jobs/stats', methods=['GET'])
+@jwt_required()
+def job_stats():
+    return jsonify(job_queue.stats()), 200
+
+
+# ─── Response Compression ─────────────────────────────────────────────────────
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'image/svg+xml', 'application/xml', 'text/xml', 'text/plain', 'text/html',
+}
+
+
+@app.after_request
+def compress_response(resp):
+    """
+    gzip (or deflate) buffered responses for clients that send a matching
+    Accept-Encoding. Streamed responses (NDJSON, SSE) pass through so lines
+    still arrive as they are produced.
+    """
+    if (resp.status_code != 200 or resp.is_streamed or resp.direct_passthrough
+            or 'Content-Encoding' in resp.headers
+            or resp.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return resp
+    resp.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(['gzip', 'deflate'])
+    body = resp.get_data()
+    if not encoding or len(body) < app.config['RESPONSE_COMPRESS_MIN']:
+        return resp
+
+    level = app.config['RESPONSE_COMPRESS_LEVEL']
+    if encoding == 'gzip':
+        compressed = gzip.compress(body, compresslevel=level, mtime=0)
+    else:
+        compressed = zlib.compress(body, level)
+    resp.set_data(compressed)
+    resp.headers['Content-Encoding'] = encoding
+    # Same content, different bytes: the validator becomes weak.
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+# ─── Startup ──────────────────────────────────────────────────────────────────
+
+# Two devices and a link, enough to run every converter code path once
+WARMUP_XML = (b'<PACKETTRACER5><NETWORK><DEVICES>'
+              + b''.join(b'<DEVICE><ENGINE><TYPE model="PC-PT">Pc</TYPE><NAME>PC%d</NAME>'
+                         b'<SAVE_REF_ID>warmup-%d</SAVE_REF_ID><PORT><IP>10.0.0.%d</IP>'
+                         b'<SUBNET>255.255.255.0</SUBNET></PORT></ENGINE><WORKSPACE><LOGICAL>'
+                         b'<X>%d</X><Y>0</Y></LOGICAL></WORKSPACE></DEVICE>' % (n, n, n + 1, n * 100)
+                         for n in range(2))
+              + b'</DEVICES><LINKS><LINK><CABLE><FROM>warmup-0</FROM><TO>warmup-1</TO>'
+                b'<PORT>FastEthernet0</PORT><PORT>FastEthernet0</PORT></CABLE></LINK></LINKS>'
+                b'</NETWORK></PACKETTRACER5>')
+
+
+def warm_converters():
+    """
+    Import the converters and run them once on WARMUP_XML. gunicorn.conf.py
+    calls this in the master before it forks, so the workers, and the
+    converter processes they fork in turn, start with everything loaded
+    and share those pages copy-on-write.
+    """
+    from src.decode import decode_chunks
+    from src.compile import parse_dsl_to_react_flow
+    from src.spatial import ViewportIndex
+    from src.addressing import check_addressing
+    import src.writeback        # noqa: F401
+    import pka2xml.graph        # noqa: F401  (the converter pool's DOT jobs)
+
+    dsl, react_flow = decode_chunks([WARMUP_XML])
+    parse_dsl_to_react_flow(dsl)
+    ViewportIndex(react_flow).query(0, 0, 1000, 1000, zoom=0.1)
+    check_addressing(react_flow)
+
+
+startup.mark('routes')
+print(startup.report())
 
 
 # ─── Run ──────────────────────────────────────────────────────────────────────
@@ -329,4 +1907,9 @@ if __name__ == '__main__':
     # Gunicorn will typically run your app on 0.0.0.0 and listen on a specific port (e.g., 8000).
     # Then Nginx reverse proxies requests from 80/443 to Gunicorn.
     # The 'debug=True' should NEVER be used in production.
-    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    # Fork the converter workers before the server starts its threads (in
+    # the reloader's child only, which is the process that serves).
+    if app.config['CONVERTER_MODE'] == 'pool' and (not debug or os.environ.get('WERKZEUG_RUN_MAIN')):
+        converter_pool.start()
+    app.run(debug=debug, host='0.0.0.0', port=5000)
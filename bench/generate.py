@@ -0,0 +1,180 @@
+"""
+Synthetic topology generator for the benchmarks.
+
+Builds Packet Tracer XML in the shape src/decode.py and pka2xml/graph.py
+read (NETWORK/DEVICES/DEVICE with ENGINE + WORKSPACE, NETWORK/LINKS/LINK with
+CABLE), and DSL that the pyparsing grammar in src/parser.py accepts
+(integer coordinates, plain interface names), and React Flow graphs
+without coordinates for the layout in src/layout.py.
+
+    python3 bench/generate.py xml 1000 --links dense > lab.xml
+    python3 bench/generate.py dsl 1000 > lab.dsl
+"""
+import io
+import sys
+import random
+import argparse
+from xml.sax.saxutils import escape
+
+# (PT type, model, DSL type) cycled by device index
+DEVICE_KINDS = [
+    ("Router", "ISR4331", "router"),
+    ("Switch", "2960-24TT", "switch"),
+    ("Switch", "2960-24TT", "switch"),
+    ("Pc", "PC-PT", "pc"),
+    ("Pc", "PC-PT", "pc"),
+    ("Pc", "PC-PT", "pc"),
+    ("Laptop", "Laptop-PT", "laptop"),
+    ("Laptop", "Laptop-PT", "laptop"),
+    ("Server", "Server-PT", "server"),
+    ("Pc", "PC-PT", "pc"),
+]
+
+# Extra links per device on top of the spanning tree
+LINK_DENSITY = {"sparse": 0, "dense": 3}
+
+
+def build_topology(n_devices, links="sparse", seed=0):
+    """
+    Return (devices, links): devices as dicts, links as
+    (from_index, from_port_no, to_index, to_port_no) tuples. Every device is
+    reachable (random spanning tree); "dense" adds 3 random links per device.
+    """
+    rng = random.Random(seed)
+    edges = [(rng.randrange(i), i) for i in range(1, n_devices)]
+    if n_devices > 1:
+        for _ in range(LINK_DENSITY[links] * n_devices):
+            a, b = rng.sample(range(n_devices), 2)
+            edges.append((a, b))
+
+    port_count = [0] * n_devices
+    link_list = []
+    for a, b in edges:
+        link_list.append((a, port_count[a], b, port_count[b]))
+        port_count[a] += 1
+        port_count[b] += 1
+
+    devices = []
+    for i in range(n_devices):
+        pt_type, model, dsl_type = DEVICE_KINDS[i % len(DEVICE_KINDS)]
+        devices.append({
+            "index": i,
+            "name": f"{dsl_type.capitalize()}{i}",
+            "pt_type": pt_type,
+            "model": model,
+            "dsl_type": dsl_type,
+            "x": rng.randrange(0, 40 * (int(n_devices ** 0.5) + 1)),
+            "y": rng.randrange(0, 40 * (int(n_devices ** 0.5) + 1)),
+            "ports": max(port_count[i], 1),
+            "ip": f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+        })
+    return devices, link_list
+
+
+def port_name(device, port_no):
+    """Port name as pka2xml/graph.py derives it for eCopperFastEthernet ports."""
+    if device["pt_type"] in ("Router", "Switch"):
+        return f"FastEthernet0/{port_no}"
+    return f"FastEthernet{port_no}"
+
+
+def _save_ref(device):
+    return f"save-ref-id:{1000000000 + device['index']}"
+
+
+def write_xml(out, n_devices, links="sparse", seed=0, filler=0):
+    """Write a Packet Tracer XML document to the text stream `out`."""
+    devices, link_list = build_topology(n_devices, links, seed)
+    w = out.write
+    w('<?xml version="1.0" encoding="UTF-8"?>\n<PACKETTRACER5>\n <VERSION>8.2.2.0400</VERSION>\n')
+    w(' <NETWORK>\n  <DEVICES>\n')
+    for d in devices:
+        w('   <DEVICE>\n    <ENGINE>\n')
+        w(f'     <TYPE model="{d["model"]}" customModel="">{d["pt_type"]}</TYPE>\n')
+        w(f'     <NAME translate="true">{escape(d["name"])}</NAME>\n     <POWER>true</POWER>\n')
+        w('     <MODULE>\n      <SLOT>\n       <MODULE>\n')
+        for p in range(d["ports"]):
+            ip = d["ip"] if p == 0 else ""
+            mask = "255.255.0.0" if ip else ""
+            w('        <PORT>\n         <TYPE>eCopperFastEthernet</TYPE>\n')
+            w(f'         <IP>{ip}</IP>\n         <SUBNET>{mask}</SUBNET>\n')
+            w('         <BANDWIDTH>100000</BANDWIDTH>\n')
+            w(f'         <MACADDRESS>0001.{d["index"] & 0xffff:04X}.{p & 0xffff:04X}</MACADDRESS>\n')
+            w('        </PORT>\n')
+        w('       </MODULE>\n      </SLOT>\n     </MODULE>\n')
+        w(f'     <SAVE_REF_ID>{_save_ref(d)}</SAVE_REF_ID>\n    </ENGINE>\n')
+        w(f'    <WORKSPACE>\n     <LOGICAL>\n      <X>{d["x"]}</X>\n      <Y>{d["y"]}</Y>\n'
+          '     </LOGICAL>\n    </WORKSPACE>\n   </DEVICE>\n')
+    w('  </DEVICES>\n  <LINKS>\n')
+    for a, pa, b, pb in link_list:
+        w('   <LINK>\n    <TYPE>eCopper</TYPE>\n    <CABLE>\n')
+        w(f'     <FROM>{_save_ref(devices[a])}</FROM>\n     <PORT>{port_name(devices[a], pa)}</PORT>\n')
+        w(f'     <TO>{_save_ref(devices[b])}</TO>\n     <PORT>{port_name(devices[b], pb)}</PORT>\n')
+        w('     <TYPE>eStraightThrough</TYPE>\n    </CABLE>\n   </LINK>\n')
+    w('  </LINKS>\n </NETWORK>\n')
+    # Bulk that real labs carry but the converters should skip
+    w(' <PHYSICALWORKSPACE>\n  <ENVIRONMENT_OPTIONS>\n')
+    for i in range(filler):
+        w('   <ENVIRONMENT_OPTION>\n    <CATEGORY_ID>Radiation</CATEGORY_ID>\n'
+          f'    <ID>Option{i}</ID>\n    <NAME>Option{i}</NAME>\n    <VALUE>0</VALUE>\n'
+          '    <MIN>0</MIN>\n    <MAX>100</MAX>\n   </ENVIRONMENT_OPTION>\n')
+    w('  </ENVIRONMENT_OPTIONS>\n </PHYSICALWORKSPACE>\n</PACKETTRACER5>\n')
+
+
+def write_dsl(out, n_devices, links="sparse", seed=0):
+    """Write DSL for the same topology to the text stream `out`."""
+    devices, link_list = build_topology(n_devices, links, seed)
+    w = out.write
+    w("network Synthetic {\n")
+    for d in devices:
+        w(f"    device {d['name']} {d['dsl_type']} {{\n")
+        w(f"        coordinates {d['x']} {d['y']}\n")
+        w("        power on\n")
+        w("        interface eth0 {\n")
+        w(f"            ip {d['ip']}\n")
+        w("            bandwidth 100\n")
+        w("        }\n")
+        w("    }\n")
+    for a, pa, b, pb in link_list:
+        w(f"    link {devices[a]['name']}.eth{pa} -> {devices[b]['name']}.eth{pb} {{\n")
+        w("        speed 100\n")
+        w("    }\n")
+    w("}\n")
+
+
+def generate_xml(n_devices, links="sparse", seed=0, filler=0):
+    buf = io.StringIO()
+    write_xml(buf, n_devices, links, seed, filler)
+    return buf.getvalue().encode("utf-8")
+
+
+def generate_dsl(n_devices, links="sparse", seed=0):
+    buf = io.StringIO()
+    write_dsl(buf, n_devices, links, seed)
+    return buf.getvalue()
+
+
+def generate_flow(n_devices, links="sparse", seed=0):
+    """React Flow graph of the topology as compiled from DSL without coordinates lines."""
+    devices, link_list = build_topology(n_devices, links, seed)
+    nodes = [{"id": str(d["index"] + 1), "type": "custom", "position": {"x": 0, "y": 0},
+              "data": {"label": d["name"], "type": d["dsl_type"]}} for d in devices]
+    edges = [{"id": f"e{k}", "source": str(a + 1), "target": str(b + 1)}
+             for k, (a, _, b, _) in enumerate(link_list)]
+    return {"nodes": nodes, "edges": edges}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate a synthetic Packet Tracer XML or DSL topology.")
+    ap.add_argument("format", choices=["xml", "dsl"])
+    ap.add_argument("devices", type=int)
+    ap.add_argument("--links", choices=sorted(LINK_DENSITY), default="sparse")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--filler", type=int, default=0,
+                    help="ENVIRONMENT_OPTION blocks to pad the XML with")
+    args = ap.parse_args()
+
+    if args.format == "xml":
+        write_xml(sys.stdout, args.devices, args.links, args.seed, args.filler)
+    else:
+        write_dsl(sys.stdout, args.devices, args.links, args.seed)
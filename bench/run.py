@@ -0,0 +1,342 @@
+"""
+Scaling benchmarks for the converters.
+
+Runs each stage over synthetic topologies of increasing size (see
+bench/generate.py) and reports wall time, throughput and peak memory, plus
+the empirical scaling exponent between sizes (1.0 = linear).
+
+Stages:
+    decode      src/decode.generate_dsl_and_react_flow (streaming)
+    decode-tree src/decode.generate_dsl_and_react_flow(streaming=False)
+    compile     src/compile.parse_dsl_to_react_flow
+    tokenize    src/lexer.tokenize
+    parser      src/parser.Network.parseString
+    graph       pka2xml/graph.load_topology + to_dot
+    layout      src/layout.place_unpositioned (no node has coordinates)
+
+    python3 bench/run.py                                  # compare against bench/baselines.json
+    python3 bench/run.py --sizes 10,100,1000,10000,100000 --links sparse,dense
+    python3 bench/run.py --update-baseline                # record new baselines
+
+Baselines are stored with the time of a fixed pure-Python calibration
+workload on the machine that recorded them. A run rescales them by the
+ratio of its own calibration time to that one, so they carry over to
+faster or slower machines. A run fails (exit 1) when a measurement is
+slower than its rescaled baseline by more than --threshold, and still is
+when re-measured with twice the repeats. Regenerate the baselines
+(--update-baseline) in the same commit as any change to a stage.
+
+TARGETS are hard limits on top of that: a run of a targeted stage also
+measures the target's size, whatever --sizes says, and fails when it is
+over the limit (rescaled by calibration like the baselines), again with
+twice the repeats.
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.generate import generate_xml, generate_dsl, generate_flow  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, "bench", "baselines.json")
+
+
+# ─── Stages ───────────────────────────────────────────────────────────────────
+# Each stage is (input kind, factory); factory() imports lazily and returns a
+# callable taking the generated input.
+
+def _decode(streaming):
+    def factory():
+        from src.decode import generate_dsl_and_react_flow
+        return lambda xml: generate_dsl_and_react_flow(io.BytesIO(xml), streaming=streaming)
+    return factory
+
+
+def _compile():
+    from src.compile import parse_dsl_to_react_flow
+    return parse_dsl_to_react_flow
+
+
+def _tokenize():
+    from src.lexer import tokenize
+    return tokenize
+
+
+def _parser():
+    from src.parser import Network
+    return lambda dsl: Network.parseString(dsl, parseAll=True)
+
+
+def _graph():
+    from pka2xml.graph import load_topology, to_dot
+    return lambda xml: to_dot(load_topology(xml))
+
+
+def _layout():
+    # Unplaced nodes are laid out afresh on every call, so one input serves all repeats.
+    from src.layout import place_unpositioned
+    return place_unpositioned
+
+
+STAGES = {
+    "decode": ("xml", _decode(True)),
+    "decode-tree": ("xml", _decode(False)),
+    "compile": ("dsl", _compile),
+    "tokenize": ("dsl", _tokenize),
+    "parser": ("dsl", _parser),
+    "graph": ("xml", _graph),
+    "layout": ("flow", _layout),
+}
+
+GENERATORS = {"xml": generate_xml, "dsl": generate_dsl, "flow": generate_flow}
+
+# Hard limits: baseline key -> seconds on the baseline machine
+TARGETS = {
+    "layout/sparse/5000": 1.0,
+    "layout/dense/5000": 1.0,
+}
+
+
+def measure(fn, data, repeat, memory):
+    """Best-of-`repeat` seconds and, optionally, peak traced allocation bytes."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+        if best > 5:    # big inputs: one run is enough
+            break
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def calibrate(repeat=5):
+    """Best-of seconds for a fixed pure-Python workload (dicts, strings, sorting)."""
+    def work():
+        table = {}
+        for i in range(200000):
+            table[f"k{i}"] = i * 7 % 1013
+        return sorted(table.items(), key=lambda kv: kv[1])[-1]
+
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        work()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(stages, sizes, densities, repeat, memory, max_seconds):
+    results = []
+    inputs = {}
+    for stage in stages:
+        kind, factory = STAGES[stage]
+        fn = factory()
+        for links in densities:
+            for n in sizes:
+                key = (kind, links, n)
+                if key not in inputs:
+                    inputs.clear()  # keep at most one generated input alive
+                    inputs[key] = GENERATORS[kind](n, links)
+                data = inputs[key]
+                size = input_bytes(data)
+
+                seconds, peak = measure(fn, data, repeat, memory)
+
+                row = {
+                    "stage": stage, "links": links, "devices": n,
+                    "input_bytes": size, "seconds": seconds, "peak_bytes": peak,
+                    "devices_per_s": n / seconds if seconds else None,
+                    "mb_per_s": size / seconds / 1e6 if seconds else None,
+                }
+                results.append(row)
+                print_row(row)
+
+                if seconds > max_seconds:
+                    print(f"  {stage}/{links}: {seconds:.1f}s > {max_seconds}s, skipping larger sizes")
+                    break
+    return results
+
+
+# ─── Reporting ────────────────────────────────────────────────────────────────
+
+def input_bytes(data):
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    return len(json.dumps(data))
+
+
+def print_row(r):
+    peak = f"{r['peak_bytes'] / 1e6:9.1f} MB" if r["peak_bytes"] is not None else "        - "
+    print(f"{r['stage']:<12} {r['links']:<7} {r['devices']:>7} dev  {r['seconds'] * 1000:10.1f} ms"
+          f"  {r['devices_per_s']:12.0f} dev/s  {r['mb_per_s']:8.2f} MB/s  peak {peak}")
+
+
+def scaling(results):
+    """Log-log slope of time vs devices between consecutive sizes, per stage/links."""
+    curves = {}
+    for r in results:
+        curves.setdefault((r["stage"], r["links"]), []).append((r["devices"], r["seconds"]))
+
+    print("\nScaling exponent (time ~ devices^k):")
+    out = {}
+    for (stage, links), points in curves.items():
+        slopes = []
+        for (n0, t0), (n1, t1) in zip(points, points[1:]):
+            if t0 > 0 and t1 > 0 and n1 > n0:
+                slopes.append(math.log(t1 / t0) / math.log(n1 / n0))
+        out[f"{stage}/{links}"] = slopes
+        if slopes:
+            print(f"  {stage:<12} {links:<7} " + "  ".join(f"{k:5.2f}" for k in slopes))
+    return out
+
+
+def baseline_key(r):
+    return f"{r['stage']}/{r['links']}/{r['devices']}"
+
+
+def compare(results, baseline, threshold, min_seconds, scale=1.0):
+    """(key, rescaled baseline, seconds) of every measurement over the threshold."""
+    regressions = []
+    for r in results:
+        base = baseline.get(baseline_key(r))
+        if base is None:
+            continue
+        base *= scale
+        if max(base, r["seconds"]) < min_seconds:
+            continue
+        if r["seconds"] > base * (1 + threshold):
+            regressions.append((baseline_key(r), base, r["seconds"]))
+    return regressions
+
+
+def remeasure(key, repeat):
+    """Seconds for one baseline key (stage/links/devices), measured again."""
+    stage, links, n = key.split("/")
+    kind, factory = STAGES[stage]
+    return measure(factory(), GENERATORS[kind](int(n), links), repeat, memory=False)[0]
+
+
+def check_targets(stages, repeat, scale):
+    """(key, rescaled limit, seconds) of every target of `stages` that is over its limit."""
+    missed = []
+    for key, limit in TARGETS.items():
+        if key.split("/")[0] not in stages:
+            continue
+        seconds = remeasure(key, repeat)
+        if seconds > limit * scale:
+            seconds = min(seconds, remeasure(key, 2 * repeat))
+        print(f"Target {key}: {seconds * 1000:.1f} ms (limit {limit * scale * 1000:.0f} ms)")
+        if seconds > limit * scale:
+            missed.append((key, limit * scale, seconds))
+    return missed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Converter scaling benchmarks.")
+    ap.add_argument("--stages", default=",".join(STAGES),
+                    help="comma-separated subset of: " + ", ".join(STAGES))
+    ap.add_argument("--sizes", default="10,100,1000,10000", help="device counts (10 to 100000)")
+    ap.add_argument("--links", default="sparse,dense", help="link densities: sparse, dense")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--max-seconds", type=float, default=30,
+                    help="stop growing a stage once one run takes longer than this")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.5,
+                    help="allowed slowdown over baseline (0.5 = 50%%)")
+    ap.add_argument("--min-seconds", type=float, default=0.02,
+                    help="ignore measurements faster than this when comparing")
+    ap.add_argument("--json", help="write full results to this file")
+    args = ap.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(unknown)}")
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    densities = [d.strip() for d in args.links.split(",") if d.strip()]
+
+    calibration = calibrate()
+    print(f"Calibration: {calibration * 1000:.1f} ms")
+    results = run(stages, sizes, densities, args.repeat, not args.no_memory, args.max_seconds)
+    curves = scaling(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "calibration_seconds": calibration,
+                "results": results,
+                "scaling": curves,
+            }, f, indent=2)
+
+    saved = {"calibration_seconds": None, "seconds": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        if "seconds" not in saved:     # older files: plain seconds, no calibration
+            saved = {"calibration_seconds": None, "seconds": saved}
+    baseline = saved["seconds"]
+
+    if args.update_baseline:
+        # Seconds from different machines do not mix: a new calibration
+        # replaces the whole file.
+        if saved["calibration_seconds"] is not None and set(stages) != set(STAGES):
+            print("Partial --update-baseline keeps the stored calibration; "
+                  "run all stages to re-record it.", file=sys.stderr)
+            scale = saved["calibration_seconds"] / calibration
+            baseline.update({baseline_key(r): round(r["seconds"] * scale, 6) for r in results})
+        else:
+            saved["calibration_seconds"] = round(calibration, 6)
+            baseline = {baseline_key(r): round(r["seconds"], 6) for r in results}
+        saved["seconds"] = baseline
+        with open(args.baseline, "w") as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    scale = calibration / saved["calibration_seconds"] if saved["calibration_seconds"] else 1.0
+    missed = check_targets(stages, args.repeat, scale)
+    regressions = compare(results, baseline, args.threshold, args.min_seconds, scale)
+    # One noisy measurement is not a regression: re-measure before reporting.
+    regressions = [(key, base, remeasure(key, 2 * args.repeat)) for key, base, _ in regressions]
+    regressions = [(key, base, now) for key, base, now in regressions if now > base * (1 + args.threshold)]
+    if missed:
+        print(f"\nTargets missed (x {scale:.2f} calibration):")
+        for key, limit, now in missed:
+            print(f"  {key}: {now * 1000:.1f} ms > {limit * 1000:.0f} ms")
+    if regressions:
+        print(f"\nRegressions (> {args.threshold:.0%} over baseline x {scale:.2f} calibration):")
+        for key, base, now in regressions:
+            print(f"  {key}: {base * 1000:.1f} ms -> {now * 1000:.1f} ms")
+    if missed or regressions:
+        return 1
+    if baseline:
+        print(f"\nNo regressions against baseline (x {scale:.2f} calibration).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
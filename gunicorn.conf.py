@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for the API:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported once in the master (preload_app), which then warms up
+the converters and forks the workers: they serve right away and share the
+loaded modules copy-on-write. With DB_INIT=deferred the schema check is
+not part of the boot at all; run `flask --app app init-db` once per deploy.
+
+Set METRICS_MULTIPROC_DIR for /metrics to cover all workers: it is emptied
+here when the server starts, and every worker writes its metrics there.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+
+def on_starting(server):
+    # Master, before the app is loaded: metrics of a previous run would be
+    # summed with this one's.
+    directory = os.environ.get('METRICS_MULTIPROC_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory and os.path.isdir(directory):
+        for entry in os.listdir(directory):
+            if entry.startswith('metrics-'):
+                os.remove(os.path.join(directory, entry))
+
+
+def when_ready(server):
+    # Master, after the app is loaded and before any worker is forked
+    from app import startup, warm_converters
+    warm_converters()
+    startup.mark('warmup')
+    server.log.info(startup.report())
+
+
+def post_fork(server, worker):
+    # Database connections opened in the master (schema check) stay with it.
+    from app import app, db, converter_pool
+    from src.workers import PoolError
+    from src.metrics import REGISTRY
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # The master's warm-up timings would otherwise count once per worker.
+    REGISTRY.reset()
+    # Fork the converter workers now, while this process has a single
+    # thread, rather than from the first request thread that needs one.
+    if app.config['CONVERTER_MODE'] == 'pool':
+        try:
+            converter_pool.start()
+        except PoolError as e:
+            server.log.warning("Converter pool not started: %s", e)
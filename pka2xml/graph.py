@@ -1,33 +1,74 @@
+"""
+Network topology of a Packet Tracer XML file, and a Graphviz renderer for it.
+
+    from pka2xml.graph import load_topology, to_dot
+    topology = load_topology(open('lab.xml', 'rb').read())
+    dot_source = to_dot(topology)
+
+Run as a script it writes network.dot and renders network.png:
+
+    python graph.py <file.xml>
+"""
 import xml.etree.ElementTree as ET
-import os
-import re
 import sys
 import string
+import subprocess
+import functools
 
 try:
     from ipaddress import ip_network as IPAddress
 except ImportError:
     def IPAddress(ip): return ip  # fallback dummy function
 
-# Require filepath as argument
-if len(sys.argv) < 2:
-    print("Usage: python graph.py <file.xml>")
-    exit(1)
+# Every byte that is not printable ASCII. Dropping these in one translate()
+# pass matches decoding with errors='ignore' and then removing every
+# non-printable character: non-ASCII bytes never survive either way.
+_UNPRINTABLE = bytes(b for b in range(256) if chr(b) not in string.printable)
 
-filepath = sys.argv[1]
 
-# Read and clean file
-with open(filepath, encoding='utf-8', errors='ignore') as f:
-    data = f.read()
+def sanitize(data):
+    """Strip non-printable and non-ASCII bytes so the XML parser accepts the file."""
+    return data.translate(None, _UNPRINTABLE)
 
-data = re.sub(f'[^{re.escape(string.printable)}]', '', data)
-root = ET.fromstring(data)
 
 # Get value by XML path
 def get_value(node, path):
     v = node.find(path)
     return v.text.strip() if v is not None and v.text else ''
 
+
+# Device type -> naming scheme for its ports
+MAIN_SWITCH = {
+    'Pc': 1, 'Pda': 1, 'Cloud': 1, 'Laptop': 1,
+    'Printer': 1, 'Server': 1,
+    'AccessPoint': 2, 'DslModem': 2, 'Router': 2,
+    'Sniffer': 2, 'Switch': 2, 'WirelessRouter': 2,
+}
+
+PORT_NAMES = {
+    1: {
+        'eCopperEthernet': 'Ethernet{}',
+        'eCopperFastEthernet': 'FastEthernet{}',
+        'eCopperGigabitEthernet': 'GigabitEthernet{}',
+        'eAccessPointWirelessN': '{}',
+        'eCopperCoaxial': '{}',
+        'eHostWirelessN': '{}',
+        'eModem': '{}',
+        'eSerial': '{}',
+    },
+    2: {
+        'eCopperEthernet': 'Ethernet{}',
+        'eCopperFastEthernet': 'FastEthernet0/{}',
+        'eCopperGigabitEthernet': 'GigabitEthernet0/{}',
+        'eAccessPointWirelessN': '{}',
+        'eCopperCoaxial': '{}',
+        'eHostWirelessN': '{}',
+        'eModem': '{}',
+        'eSerial': '{}',
+    },
+}
+
+
 class Port:
     def __init__(self, node, index, parent_type, dev_name=''):
         self.type = get_value(node, 'TYPE')
@@ -39,39 +80,9 @@ class Port:
         if self.dhcp == 'true':
             self.ip = '<DHCP>'
 
-        main_switch = {
-            'Pc': 1, 'Pda': 1, 'Cloud': 1, 'Laptop': 1,
-            'Printer': 1, 'Server': 1,
-            'AccessPoint': 2, 'DslModem': 2, 'Router': 2,
-            'Sniffer': 2, 'Switch': 2, 'WirelessRouter': 2,
-        }
-
-        switch = {
-            1: {
-                'eCopperEthernet': 'Ethernet{}',
-                'eCopperFastEthernet': 'FastEthernet{}',
-                'eCopperGigabitEthernet': 'GigabitEthernet{}',
-                'eAccessPointWirelessN': '{}',
-                'eCopperCoaxial': '{}',
-                'eHostWirelessN': '{}',
-                'eModem': '{}',
-                'eSerial': '{}',
-            },
-            2: {
-                'eCopperEthernet': 'Ethernet{}',
-                'eCopperFastEthernet': 'FastEthernet0/{}',
-                'eCopperGigabitEthernet': 'GigabitEthernet0/{}',
-                'eAccessPointWirelessN': '{}',
-                'eCopperCoaxial': '{}',
-                'eHostWirelessN': '{}',
-                'eModem': '{}',
-                'eSerial': '{}',
-            },
-        }
-
         self.name = '<Unnamed>'
-        if self.type and parent_type in main_switch:
-            fmt = switch[main_switch[parent_type]].get(self.type, '{}')
+        if self.type and parent_type in MAIN_SWITCH:
+            fmt = PORT_NAMES[MAIN_SWITCH[parent_type]].get(self.type, '{}')
             self.name = fmt.format(index)
 
         if dev_name:
@@ -80,26 +91,28 @@ class Port:
     def __repr__(self):
         return self.name
 
+
 class Ports:
     def __init__(self, node):
         self.ports = []
+        self._by_name = {}
         count = {}
 
         lines = node.findall('ENGINE/RUNNINGCONFIG/LINE')
         names = [j.text.split(' ')[1] for j in lines if j.text and 'interface' in j.text]
+        dev_type = get_value(node, 'ENGINE/TYPE')
 
         for i, p in enumerate(node.findall('ENGINE/MODULE/SLOT/MODULE/PORT')):
             v = get_value(p, 'TYPE')
             count[v] = count.get(v, -1) + 1
-            dev_type = get_value(node, 'ENGINE/TYPE')
             dev_name = names[i] if i < len(names) else ''
-            self.ports.append(Port(p, count[v], dev_type, dev_name))
+            port = Port(p, count[v], dev_type, dev_name)
+            self.ports.append(port)
+            self._by_name.setdefault(port.name, port)    # first port wins, as in a scan
 
     def by_name(self, name):
-        for port in self.ports:
-            if port.name == name:
-                return port
-        return None
+        return self._by_name.get(name)
+
 
 class Device:
     def __init__(self, node):
@@ -109,93 +122,173 @@ class Device:
         self.id = get_value(node, 'ENGINE/SAVE_REF_ID')
         self.ports = Ports(node)
 
+
 class Devices:
     def __init__(self, nodes):
         self.devices = [Device(d) for d in nodes.findall('PACKETTRACER5/NETWORK/DEVICES/DEVICE')]
         if not self.devices:
             self.devices = [Device(d) for d in nodes.findall('NETWORK/DEVICES/DEVICE')]
+        self._by_id = {}
+        for device in self.devices:
+            self._by_id.setdefault(device.id, device)
 
     def by_id(self, id):
-        for device in self.devices:
-            if device.id == id:
-                return device
-        return None
+        return self._by_id.get(id)
 
     def by_index(self, index):
         try:
             return self.devices[int(index)]
-        except (ValueError, IndexError):
+        except (ValueError, TypeError, IndexError):
             return None
 
-devices = Devices(root)
+    def resolve(self, ref):
+        """A link endpoint: older files give the device index, newer ones its SAVE_REF_ID."""
+        return self.by_index(ref) or self.by_id(ref)
 
-def traverse(nodes, fn, depth=0):
-    for node in nodes:
-        fn(node, depth)
-        children = node.findall('NODE')
-        if children:
-            traverse(children, fn, depth + 1)
 
-def printer(node, depth):
-    name = node.find('NAME')
-    if name is not None and name.attrib.get('checkType') in ('1', '2'):
-        print('  ' * depth + name.text, name.attrib.get('nodeValue'))
+class Link:
+    def __init__(self, fr, fr_port, to, to_port):
+        self.fr, self.fr_port = fr, fr_port
+        self.to, self.to_port = to, to_port
+
+
+@functools.lru_cache(maxsize=4096)    # ports repeat across links; ip_network() is slow
+def _prefix(ip, sub):
+    """Subnet mask as a prefix length where it parses as a network, else unchanged."""
+    try:
+        return IPAddress(f"{ip}/{sub}").prefixlen
+    except Exception:
+        return sub
+
 
-traverse(root.findall('COMPARISONS/NODE'), printer)
-traverse(root.findall('INITIALSETUP/NODE'), printer)
+class Topology:
+    """
+    Devices and resolved links of a parsed file. `links` is None when the
+    file has no LINKS section; links whose devices or ports cannot be found
+    are skipped with a message in `warnings`.
+    """
 
-# Try both XML structures
-links = root.find('PACKETTRACER5/NETWORK/LINKS') or root.find('NETWORK/LINKS')
-if links is None:
-    print("[ERROR] No LINKS section found in XML.")
-    exit(1)
+    def __init__(self, root):
+        self.root = root
+        self.devices = Devices(root)
+        self.warnings = []
+        self.links = None
 
-with open('network.dot', 'w') as f:
-    f.write('graph G {\n')
-    f.write('\tnode [style=rounded,shape=record];\n')
-    f.write('\tlayout=twopi;\n')
-    f.write('\tgraph [pad="1", ranksep="1.5"];\n\n')
+        links = root.find('PACKETTRACER5/NETWORK/LINKS')
+        if links is None:
+            links = root.find('NETWORK/LINKS')
+        if links is not None:
+            self.links = [link for link in map(self._resolve, links) if link is not None]
 
-    for link in links:
+    def _resolve(self, link):
         from_id = link.findtext('CABLE/FROM')
         to_id = link.findtext('CABLE/TO')
 
-        fr = devices.by_index(from_id) or devices.by_id(from_id)
-        to = devices.by_index(to_id) or devices.by_id(to_id)
+        fr = self.devices.resolve(from_id)
+        to = self.devices.resolve(to_id)
 
         if not fr or not to:
-            print(f"[WARNING] Could not find device(s) FROM='{from_id}' TO='{to_id}'")
-            continue
+            self.warnings.append(f"[WARNING] Could not find device(s) FROM='{from_id}' TO='{to_id}'")
+            return None
 
         ports = link.findall('CABLE/PORT')
         if len(ports) < 2:
-            print("[WARNING] Link missing ports.")
-            continue
+            self.warnings.append("[WARNING] Link missing ports.")
+            return None
 
         fr_port = fr.ports.by_name(ports[0].text)
         to_port = to.ports.by_name(ports[1].text)
 
         if not fr_port or not to_port:
-            print(f"[WARNING] Could not find ports: {ports[0].text}, {ports[1].text}")
-            continue
+            self.warnings.append(f"[WARNING] Could not find ports: {ports[0].text}, {ports[1].text}")
+            return None
 
-        fr_ip, fr_sub = fr_port.ip, fr_port.sub
-        to_ip, to_sub = to_port.ip, to_port.sub
+        return Link(fr, fr_port, to, to_port)
 
-        try:
-            fr_sub = IPAddress(f"{fr_ip}/{fr_sub}").prefixlen
-        except: pass
-        try:
-            to_sub = IPAddress(f"{to_ip}/{to_sub}").prefixlen
-        except: pass
 
-        f.write('\t"{}"--"{}" [taillabel="{}{}{}"; headlabel="{}{}{}"];\n'.format(
-            fr.name, to.name,
-            fr_ip, '/' if fr_sub else '', fr_sub,
-            to_ip, '/' if to_sub else '', to_sub))
+def load_topology(data):
+    """Parse Packet Tracer XML (bytes) into a Topology."""
+    return Topology(ET.fromstring(sanitize(data)))
+
+
+def _quote(value):
+    """
+    `value` as the inside of a DOT double-quoted string. Names and addresses
+    come from uploaded files: an unescaped quote would end the string and
+    let the rest add attributes (image=, shapefile= read server files).
+    """
+    text = ' '.join(str(value).splitlines())
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def to_dot(topology):
+    """Graphviz source for the topology's links, labelled with port addresses."""
+    out = [
+        'graph G {\n',
+        '\tnode [style=rounded,shape=record];\n',
+        '\tlayout=twopi;\n',
+        '\tgraph [pad="1", ranksep="1.5"];\n\n',
+    ]
+    for link in topology.links or ():
+        fr_ip, to_ip = link.fr_port.ip, link.to_port.ip
+        fr_sub = _prefix(fr_ip, link.fr_port.sub)
+        to_sub = _prefix(to_ip, link.to_port.sub)
+        out.append('\t"{}"--"{}" [taillabel="{}"; headlabel="{}"];\n'.format(
+            _quote(link.fr.name), _quote(link.to.name),
+            _quote(f"{fr_ip}/{fr_sub}" if fr_sub else fr_ip),
+            _quote(f"{to_ip}/{to_sub}" if to_sub else to_ip)))
+    out.append('}\n')
+    return ''.join(out)
+
+
+def traverse(nodes, fn, depth=0):
+    for node in nodes:
+        fn(node, depth)
+        children = node.findall('NODE')
+        if children:
+            traverse(children, fn, depth + 1)
+
+
+def printer(node, depth):
+    name = node.find('NAME')
+    if name is not None and name.attrib.get('checkType') in ('1', '2'):
+        print('  ' * depth + name.text, name.attrib.get('nodeValue'))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Require filepath as argument
+    if len(argv) < 1:
+        print("Usage: python graph.py <file.xml>")
+        return 1
+
+    with open(argv[0], 'rb') as f:
+        topology = load_topology(f.read())
+
+    traverse(topology.root.findall('COMPARISONS/NODE'), printer)
+    traverse(topology.root.findall('INITIALSETUP/NODE'), printer)
+
+    if topology.links is None:
+        print("[ERROR] No LINKS section found in XML.")
+        return 1
+    for warning in topology.warnings:
+        print(warning)
+
+    dot_source = to_dot(topology)
+    with open('network.dot', 'w') as f:
+        f.write(dot_source)
+
+    # Generate image using Graphviz
+    try:
+        result = subprocess.run(['dot', '-Tpng', '-o', 'network.png'], input=dot_source.encode('utf-8'))
+    except OSError as e:
+        print(f"[ERROR] Could not run Graphviz dot: {e}")
+        return 1
+    if result.returncode != 0:
+        return result.returncode
+    print("✅ network.png generated successfully.")
+    return 0
 
-    f.write('}\n')
 
-# Generate image using Graphviz
-os.system('dot -Tpng network.dot -o network.png')
-print("✅ network.png generated successfully.")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+IPv4 addressing checks over a React Flow graph.
+
+Every interface address and mask in the graph is turned into uint32
+arrays once, interfaces are bucketed by subnet with one np.unique, and
+each check is a few array operations over all interfaces or links at
+once, so networks with 100k interfaces take well under a second:
+
+    duplicates          static addresses used by more than one interface
+    cross_subnet_links  links whose two devices share no subnet
+    gateways            hosts whose default gateway is missing, outside
+                        their subnet, or not an address in the topology
+    invalid             addresses or masks that do not parse
+
+Decoded graphs list every addressed port under data["interfaces"] with
+its mask. Compiled graphs only carry data["interface"]["ip"] (the DSL has
+no masks), so their interfaces get `default_prefix` when it is given and
+only take part in the duplicate check otherwise; they have no gateways
+to check either. DHCP interfaces and
+0.0.0.0 are not static addresses and are left out. A link is only
+checked when both of its devices have a masked address, so links to
+switches are not.
+
+    report = check_addressing(react_flow)
+    python3 src/addressing.py lab.xml|lab.pkt|flow.json [default_prefix]
+"""
+import re
+import sys
+import json
+
+try:
+    import numpy as np
+except ImportError:     # check_addressing() needs it
+    np = None
+
+# Bump whenever the report changes; cached reports are keyed on it.
+ADDRESSING_VERSION = "1"
+
+# Device types that need a default gateway
+HOST_TYPES = frozenset(("pc", "laptop", "server"))
+# Gateway problems, by precedence
+GATEWAY_REASONS = (None, "not-found", "outside-subnet", "missing")
+
+_IPV4 = re.compile(r"[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}")
+
+
+def parse_ipv4(strings):
+    """Dotted quads to (uint32 array, valid bool array); invalid entries are 0."""
+    strings = list(strings)
+    valid = np.fromiter((_IPV4.fullmatch(s) is not None for s in strings), dtype=bool, count=len(strings))
+    if not strings:
+        return np.zeros(0, dtype=np.uint32), valid
+    octets = np.array(".".join(s if ok else "0.0.0.0" for s, ok in zip(strings, valid)).split("."),
+                      dtype=np.uint32).reshape(-1, 4)
+    valid &= (octets <= 255).all(axis=1)
+    value = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    value[~valid] = 0
+    return value, valid
+
+
+def prefix_lengths(masks):
+    """Prefix length of each uint32 mask, -1 where the bits are not contiguous."""
+    inverse = ~masks
+    contiguous = (inverse & (inverse + np.uint32(1))) == 0
+    host_bits = np.log2(inverse.astype(np.float64) + 1).round().astype(np.int64)
+    return np.where(contiguous, 32 - host_bits, -1)
+
+
+def dotted(value):
+    value = int(value)
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+
+def _interfaces(nodes):
+    """Flatten the interfaces of all nodes: (owner, ip, mask, dhcp) lists."""
+    owner, ips, masks, dhcp = [], [], [], []
+    for k, node in enumerate(nodes):
+        data = node.get("data", {})
+        interfaces = data.get("interfaces")
+        if interfaces is None:
+            interfaces = [data["interface"]] if "interface" in data else []
+        for iface in interfaces:
+            owner.append(k)
+            ips.append(str(iface.get("ip", "")).strip())
+            masks.append(str(iface.get("mask", "")).strip())
+            dhcp.append(bool(iface.get("dhcp")))
+    return owner, ips, masks, dhcp
+
+
+def check_addressing(flow, default_prefix=None):
+    """Addressing report for a React Flow graph (see the module docstring)."""
+    if np is None:
+        raise RuntimeError("Addressing checks need numpy")
+    nodes, edges = flow.get("nodes", []), flow.get("edges", [])
+    node_ids = [str(node.get("id")) for node in nodes]
+    labels = [node.get("data", {}).get("label") for node in nodes]
+
+    owner, ip_text, mask_text, dhcp = _interfaces(nodes)
+    owner = np.array(owner, dtype=np.int64)
+    dhcp = np.array(dhcp, dtype=bool)
+    ip, ip_ok = parse_ipv4(ip_text)
+    mask, mask_ok = parse_ipv4(mask_text)
+    no_mask = np.array([not m for m in mask_text], dtype=bool)
+    if default_prefix is not None:
+        mask[no_mask] = (0xFFFFFFFF << (32 - default_prefix)) & 0xFFFFFFFF
+        mask_ok |= no_mask
+
+    configured = ~dhcp & np.array([s not in ("", "0.0.0.0") for s in ip_text], dtype=bool)
+    static = configured & ip_ok
+    mask_ok &= prefix_lengths(mask) > 0
+    invalid = (configured & ~ip_ok) | (static & ~mask_ok & ~no_mask)
+    masked = static & mask_ok
+
+    def where(k):
+        return {"node": node_ids[k], "label": labels[k]}
+
+    report = {
+        "invalid": [dict(where(owner[i]), ip=ip_text[i], mask=mask_text[i])
+                    for i in np.flatnonzero(invalid).tolist()],
+    }
+
+    # ─── Subnets ───
+    net = ip & mask
+    sel = np.flatnonzero(masked)
+    subnet_key = (net[sel].astype(np.uint64) << np.uint64(32)) | mask[sel]
+    keys, sid, counts = np.unique(subnet_key, return_inverse=True, return_counts=True)
+    key_prefix = prefix_lengths((keys & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    report["subnets"] = [
+        {"subnet": f"{dotted(key >> 32)}/{length}", "interfaces": count}
+        for key, length, count in zip(keys.tolist(), key_prefix.tolist(), counts.tolist())
+    ]
+
+    # ─── Duplicate addresses ───
+    sel_static = np.flatnonzero(static)
+    values, inverse, counts = np.unique(ip[sel_static], return_inverse=True, return_counts=True)
+    dup_groups = np.flatnonzero(counts > 1)
+    in_dup = np.flatnonzero(counts[inverse] > 1)
+    order = in_dup[np.argsort(inverse[in_dup], kind="stable")]
+    bounds = np.cumsum(counts[dup_groups])[:-1]
+    report["duplicates"] = [
+        {"ip": dotted(values[g]), "nodes": [where(k) for k in dict.fromkeys(owner[sel_static[members]].tolist())]}
+        for g, members in zip(dup_groups.tolist(), np.split(order, bounds))
+    ]
+
+    # ─── Links between subnets ───
+    report["cross_subnet_links"], checked = _cross_subnet_links(
+        nodes, edges, owner[sel], sid, len(keys), where, report["subnets"])
+
+    # ─── Gateways ───
+    report["gateways"] = _gateways(nodes, owner, ip, mask, static, masked, where)
+
+    report["summary"] = {
+        "devices": len(nodes),
+        "interfaces": len(ip_text),
+        "static": int(static.sum()),
+        "dhcp": int(dhcp.sum()),
+        "subnets": len(keys),
+        "links_checked": checked,
+        "links": len(edges),
+        **{kind: len(report[kind]) for kind in ("invalid", "duplicates", "cross_subnet_links", "gateways")},
+    }
+    return report
+
+
+def _cross_subnet_links(nodes, edges, iface_owner, sid, n_subnets, where, subnets):
+    """
+    Links whose ends have masked addresses but no subnet in common. Every
+    (node, subnet) pair is one sorted int64 key; each link looks up the
+    source's subnets under the target node with one searchsorted.
+    """
+    index = {str(node.get("id")): k for k, node in enumerate(nodes)}
+    ends = np.array([(index.get(e.get("source"), -1), index.get(e.get("target"), -1)) for e in edges],
+                    dtype=np.int64).reshape(-1, 2)
+
+    stride = max(n_subnets, 1)
+    pairs = np.unique(iface_owner * stride + sid)
+    pair_node, pair_sid = pairs // stride, pairs % stride
+    first = np.searchsorted(pair_node, np.arange(len(nodes)))
+    count = np.searchsorted(pair_node, np.arange(len(nodes)), side="right") - first
+
+    a, b = ends[:, 0], ends[:, 1]
+    live = (a >= 0) & (b >= 0) & (a != b)
+    live[live] &= (count[a[live]] > 0) & (count[b[live]] > 0)
+    checked = np.flatnonzero(live)
+
+    # One row per (link, subnet of its source)
+    n = count[a[checked]]
+    row = np.repeat(np.arange(len(checked)), n)
+    at = np.repeat(first[a[checked]] - np.cumsum(n) + n, n) + np.arange(int(n.sum()))
+    probe = b[checked][row] * stride + pair_sid[at]
+    pos = np.minimum(np.searchsorted(pairs, probe), max(len(pairs) - 1, 0))
+    hit = pairs[pos] == probe if len(pairs) else np.zeros(0, dtype=bool)
+    shared = np.bincount(row, weights=hit.astype(np.float64), minlength=len(checked)) > 0
+
+    def subnets_of(k):
+        return [subnets[s]["subnet"] for s in pair_sid[first[k]:first[k] + count[k]].tolist()]
+
+    issues = []
+    for e in checked[~shared].tolist():
+        src, dst = int(a[e]), int(b[e])
+        issues.append({
+            "edge": edges[e].get("id"),
+            "source": dict(where(src), subnets=subnets_of(src)),
+            "target": dict(where(dst), subnets=subnets_of(dst)),
+        })
+    return issues, len(checked)
+
+
+def _gateways(nodes, owner, ip, mask, static, masked, where):
+    """Hosts with a static address whose gateway is missing or unusable."""
+    # Compiled graphs have no gateway field at all: nothing to check there.
+    hosts = np.array([node.get("data", {}).get("type") in HOST_TYPES and "gateway" in node.get("data", {})
+                      for node in nodes], dtype=bool)
+    gateway_text = [str(node.get("data", {}).get("gateway") or "") for node in nodes]
+    gateway, gateway_ok = parse_ipv4(gateway_text)
+    gateway_ok &= gateway != 0
+
+    addressed = np.zeros(len(nodes), dtype=bool)
+    addressed[owner[static]] = True
+    hosts &= addressed
+
+    # A gateway is usable from a host when one of its masked interfaces reaches it.
+    reach = masked & ((gateway[owner] & mask) == (ip & mask))
+    reachable = np.zeros(len(nodes), dtype=bool)
+    reachable[owner[reach]] = True
+    has_mask = np.zeros(len(nodes), dtype=bool)
+    has_mask[owner[masked]] = True
+    known = np.isin(gateway, np.unique(ip[static]))
+
+    reason = np.zeros(len(nodes), dtype=np.int8)
+    reason[hosts & gateway_ok & ~known] = 1
+    reason[hosts & gateway_ok & has_mask & ~reachable] = 2
+    reason[hosts & ~gateway_ok] = 3
+    return [dict(where(k), gateway=gateway_text[k], reason=GATEWAY_REASONS[reason[k]])
+            for k in np.flatnonzero(reason).tolist()]
+
+
+if __name__ == "__main__":
+    try:
+        from src.decode import read_network, build_react_flow, generate_from_pkt, DecodeError
+    except ImportError:
+        from decode import read_network, build_react_flow, generate_from_pkt, DecodeError
+
+    if len(sys.argv) < 2:
+        print("Usage: python addressing.py <input.xml|.pkt|.pka|flow.json> [default_prefix]", file=sys.stderr)
+        sys.exit(1)
+    path = sys.argv[1]
+    prefix = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    try:
+        if path.lower().endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                flow = json.load(f)
+            flow = flow.get("react_flow", flow)
+        elif path.lower().endswith((".pkt", ".pka")):
+            with open(path, "rb") as f:
+                _, flow = generate_from_pkt(f.read())
+        else:
+            flow = build_react_flow(*read_network(path))
+    except (DecodeError, ValueError, OSError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(check_addressing(flow, prefix), indent=2))
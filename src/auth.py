@@ -0,0 +1,94 @@
+"""
+Helpers that keep authentication off the request hot path.
+
+IdentityCache remembers who a token's subject is for a short while, so
+token-authenticated requests do not query the users table every time.
+Entries expire after `ttl` seconds. Deleting a user evicts its entry only
+in the process that deleted it: other gunicorn workers keep accepting the
+deleted user's tokens until their entry expires, so `ttl` is the longest
+a deletion can take to reach every worker. Use a short TTL (or 0) where
+that matters.
+
+PasswordHasher caps how many of werkzeug's (deliberately slow) password
+hashes run at once. The hash runs on, and blocks, the request thread that
+asked for it, and a waiting request blocks its thread too: callers should
+keep `max_workers + max_pending` below the number of request threads, so
+a burst of logins is turned away with HasherBusy rather than taking every
+thread from the other endpoints. At most `max_workers` hashes run,
+`max_pending` more requests may wait for one of those slots, and a request
+that cannot start within `queue_timeout` (or finds the queue full) gets
+HasherBusy.
+"""
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# What token-authenticated requests get as flask_jwt_extended.current_user
+Identity = namedtuple("Identity", "id email")
+
+
+class IdentityCache:
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()      # key -> (expires at, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class HasherBusy(Exception):
+    """Every hashing slot stayed taken for the whole wait."""
+
+
+class PasswordHasher:
+    def __init__(self, max_workers=1, max_pending=1, queue_timeout=0.05):
+        self.queue_timeout = queue_timeout
+        self._running = threading.BoundedSemaphore(max_workers)
+        # Running plus waiting hashes
+        self._admitted = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def _run(self, fn, *args):
+        if not self._admitted.acquire(blocking=False):
+            raise HasherBusy("Too many password hashes waiting")
+        try:
+            if not self._running.acquire(timeout=self.queue_timeout):
+                raise HasherBusy(f"No password hashing slot became free within {self.queue_timeout}s")
+            try:
+                return fn(*args)
+            finally:
+                self._running.release()
+        finally:
+            self._admitted.release()
+
+    def hash(self, raw):
+        return self._run(generate_password_hash, raw)
+
+    def check(self, hashed, raw):
+        return self._run(check_password_hash, hashed, raw)
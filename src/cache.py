@@ -0,0 +1,181 @@
+"""
+Content-addressed cache for converter results.
+
+Keys are a SHA-256 over the endpoint namespace, the converter version and
+the raw input bytes, so identical uploads map to the same entry and a
+converter upgrade invalidates everything it produced. Values are the
+serialized response bodies (bytes).
+
+The in-memory tier is an LRU bounded by total value size. The optional disk
+tier is a directory of one file per key that all gunicorn workers on the
+host can share; files are written atomically, so readers never see a
+partial entry. It is bounded by `disk_max_bytes`: disk hits refresh a
+file's mtime, and after every tenth of the budget written the process that
+wrote it scans the directory and deletes the least recently used files
+until the tier is back under 90% of the budget. Between scans, and while
+several processes write at once, it can briefly run over.
+"""
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def result_hasher(namespace, version):
+    """Hash object for result_key() when the input arrives in chunks: update() it, then hexdigest()."""
+    h = hashlib.sha256()
+    h.update(f"{namespace}\0{version}\0".encode("utf-8"))
+    return h
+
+
+def result_key(namespace, version, data):
+    h = result_hasher(namespace, version)
+    h.update(data)
+    return h.hexdigest()
+
+
+# Temp files of writers that died are removed after this many seconds.
+STALE_TMP_SECONDS = 3600
+
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        # Bytes written since the last scan; starts full so the first put scans.
+        self._disk_written = disk_max_bytes // 10
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+        }
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _remember(self, key, value):
+        """Insert into the memory tier; caller holds the lock."""
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return value
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = f.read()
+                os.utime(path)      # recently used: evicted last
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._remember(key, value)
+                    self.counters["disk_hits"] += 1
+                return value
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            self.counters["stores"] += 1
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(value)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Could not write cache entry {key}: {e}")
+                return
+            with self._lock:
+                self._disk_written += len(value)
+                due = self._disk_written >= self.disk_max_bytes // 10
+                if due:
+                    self._disk_written = 0
+            if due:
+                self.prune_disk()
+
+    def prune_disk(self):
+        """Delete least recently used files until the disk tier fits 90% of its budget."""
+        if not self.disk_dir or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.time()
+            files, total = [], 0
+            for shard in os.scandir(self.disk_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue    # removed by another process meanwhile
+                    if entry.name.startswith(".tmp-"):
+                        if now - st.st_mtime > STALE_TMP_SECONDS:
+                            self._unlink(entry.path)
+                        continue
+                    files.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+            if total <= self.disk_max_bytes:
+                return
+            target = self.disk_max_bytes * 9 // 10
+            files.sort()
+            for _, size, path in files:
+                if total <= target:
+                    break
+                if self._unlink(path):
+                    total -= size
+                    with self._lock:
+                        self.counters["disk_evictions"] += 1
+        except OSError as e:
+            print(f"Could not prune cache directory {self.disk_dir}: {e}")
+        finally:
+            self._prune_lock.release()
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._size,
+                        max_bytes=self.max_bytes, disk_dir=self.disk_dir,
+                        disk_max_bytes=self.disk_max_bytes if self.disk_dir else None)
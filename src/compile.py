@@ -2,6 +2,18 @@ import sys
 import json
 import re
 
+try:
+    from src.lalr import parse, DSLSyntaxError, Network, Device, Coordinates, Power
+    from src.layout import place_unpositioned
+    from src.metrics import stage, ELEMENTS
+except ImportError:
+    from lalr import parse, DSLSyntaxError, Network, Device, Coordinates, Power
+    from layout import place_unpositioned
+    from metrics import stage, ELEMENTS
+
+# Bump whenever the React Flow output changes; cached results are keyed on it.
+CONVERTER_VERSION = "3"
+
 # (Optional) Map DSL type to image path
 IMAGE_MAP = {
     "pc": "/images/pc.png",
@@ -12,32 +24,82 @@ IMAGE_MAP = {
     "unknown": "/images/unknown.png",
 }
 
-def parse_dsl_to_react_flow(dsl_text):
-    nodes = []
-    edges = []
-    device_map = {}
+dev_pattern = re.compile(r'device\s+(\S+)\s+(\S+)\s*{')
+coord_pattern = re.compile(r'coordinates\s+([\d.]+)\s+([\d.]+)')
+power_pattern = re.compile(r'power\s+on')
+iface_ip_pattern = re.compile(r'ip\s+([\d.]+)')
+iface_bw_pattern = re.compile(r'bandwidth\s+(\d+)')
+link_pattern = re.compile(r'link\s+(\S+)\.(\S+)\s*->\s*(\S+)\.(\S+)\s*{')
+speed_pattern = re.compile(r'speed\s+(\d+)')
+
+
+def _ast_events(result):
+    """Events (see _scan) for a parsed Network or list of statements."""
+    items = result.items if isinstance(result, Network) else result
+    events = []
+
+    for item in items:
+        if not isinstance(item, Device):
+            events.append(("link", item.device1, item.device2))
+            continue
+
+        events.append(("device", item.name))
+        data = {
+            "label": item.name,
+            "src": IMAGE_MAP.get(item.type, IMAGE_MAP["unknown"]),
+            "type": item.type
+        }
+        position = { "x": 0, "y": 0 }
+        for stmt in item.body:
+            if isinstance(stmt, Coordinates):
+                x, y = float(stmt.x), float(stmt.y)
+                position = {"x": x, "y": y}
+                data["coordinates"] = f"{x} {y}"
+            elif isinstance(stmt, Power):
+                if stmt.state == "on":
+                    data["power_on"] = True
+            else:
+                for key, value in stmt.settings:
+                    iface = data.setdefault("interface", {})
+                    iface[key] = value if key == "ip" else int(float(value))
+                # The device has always been closed by its first interface's
+                # brace; statements after it do not apply.
+                break
+        events.append(("node", {"id": None, "type": "custom", "data": data, "position": position}))
+
+    return events
 
-    dev_pattern = re.compile(r'device\s+(\S+)\s+(\S+)\s*{')
-    coord_pattern = re.compile(r'coordinates\s+([\d.]+)\s+([\d.]+)')
-    power_pattern = re.compile(r'power\s+on')
-    iface_ip_pattern = re.compile(r'ip\s+([\d.]+)')
-    iface_bw_pattern = re.compile(r'bandwidth\s+(\d+)')
-    link_pattern = re.compile(r'link\s+(\S+)\.(\S+)\s*->\s*(\S+)\.(\S+)\s*{')
-    speed_pattern = re.compile(r'speed\s+(\d+)')
 
+def _events(dsl_text):
+    """Parse with the LALR grammar, falling back to the line scanner for text it rejects."""
+    try:
+        return _ast_events(parse(dsl_text))
+    except DSLSyntaxError:
+        return _scan(dsl_text.splitlines())
+
+
+def _scan(lines):
+    """
+    Line-based scanner for DSL the grammar does not accept. Turns DSL lines
+    into position-independent events:
+      ("device", name)       a device was declared (gets the next id)
+      ("node", node)         the current device closed; node["id"] is filled in later
+      ("link", from, to)     a link between two device names
+    """
+    events = []
     current_device = None
     current_data = {}
-    device_id = 1
 
-    lines = dsl_text.splitlines()
-    for i, line in enumerate(lines):
+    # Statements outside a device (stray lines, or what follows the brace
+    # that closed it) are skipped.
+    for line in lines:
         line = line.strip()
         dev_match = dev_pattern.match(line)
         if dev_match:
             current_device = dev_match.group(1)
             dev_type = dev_match.group(2)
             current_data = {
-                "id": str(device_id),
+                "id": None,
                 "type": "custom",
                 "data": {
                     "label": current_device,
@@ -46,35 +108,38 @@ def parse_dsl_to_react_flow(dsl_text):
                 },
                 "position": { "x": 0, "y": 0 }
             }
-            device_map[current_device] = str(device_id)
-            device_id += 1
+            events.append(("device", current_device))
             continue
 
         coord_match = coord_pattern.match(line)
         if coord_match:
-            x, y = float(coord_match.group(1)), float(coord_match.group(2))
-            current_data["position"]["x"] = x
-            current_data["position"]["y"] = y
-            current_data["data"]["coordinates"] = f"{x} {y}"
+            if current_device:
+                x, y = float(coord_match.group(1)), float(coord_match.group(2))
+                current_data["position"]["x"] = x
+                current_data["position"]["y"] = y
+                current_data["data"]["coordinates"] = f"{x} {y}"
             continue
 
         if power_pattern.match(line):
-            current_data["data"]["power_on"] = True
+            if current_device:
+                current_data["data"]["power_on"] = True
             continue
 
         ip_match = iface_ip_pattern.match(line)
         if ip_match:
-            current_data.setdefault("data", {}).setdefault("interface", {})["ip"] = ip_match.group(1)
+            if current_device:
+                current_data["data"].setdefault("interface", {})["ip"] = ip_match.group(1)
             continue
 
         bw_match = iface_bw_pattern.match(line)
         if bw_match:
-            current_data["data"].setdefault("interface", {})["bandwidth"] = int(bw_match.group(1))
+            if current_device:
+                current_data["data"].setdefault("interface", {})["bandwidth"] = int(bw_match.group(1))
             continue
 
         if line == "}":
             if current_device:
-                nodes.append(current_data)
+                events.append(("node", current_data))
                 current_device = None
                 current_data = {}
             continue
@@ -82,6 +147,28 @@ def parse_dsl_to_react_flow(dsl_text):
         link_match = link_pattern.match(line)
         if link_match:
             from_dev, from_port, to_dev, to_port = link_match.groups()
+            events.append(("link", from_dev, to_dev))
+            continue
+
+    return events
+
+
+def _assemble(events):
+    """Number devices and edges in order and resolve link endpoints to node ids."""
+    nodes = []
+    edges = []
+    device_map = {}
+    device_id = 0
+
+    for event in events:
+        kind = event[0]
+        if kind == "device":
+            device_id += 1
+            device_map[event[1]] = str(device_id)
+        elif kind == "node":
+            nodes.append(dict(event[1], id=str(device_id)))
+        else:
+            _, from_dev, to_dev = event
             edge_id = f"e{len(edges)}"
             edge = {
                 "id": edge_id,
@@ -91,10 +178,107 @@ def parse_dsl_to_react_flow(dsl_text):
                 "animated": True
             }
             edges.append(edge)
-            continue
 
     return { "nodes": nodes, "edges": edges }
 
+
+def parse_dsl_to_react_flow(dsl_text):
+    with stage("parse_dsl"):
+        events = _events(dsl_text)
+    with stage("assemble"):
+        graph = _assemble(events)
+    with stage("layout"):
+        place_unpositioned(graph)
+    ELEMENTS.inc(len(graph["nodes"]), kind="nodes")
+    ELEMENTS.inc(len(graph["edges"]), kind="edges")
+    return graph
+
+
+# ─── Incremental compilation ─────────────────────────────────────────────────
+
+# Statements never nest, so every line opening a device or link starts a new
+# top-level block.
+block_start_pattern = re.compile(r'^(?=[ \t]*(?:device|link)\s)', re.MULTILINE)
+network_header_pattern = re.compile(r'\s*network\s+[^\s{]+\s*\{')
+
+
+def split_blocks(dsl_text):
+    """
+    Split DSL text into its top-level device/link blocks, each of which
+    parses on its own as a statement list. The `network ... {` header and
+    the network's closing brace are not part of any block; the brace is
+    only dropped when the braces balance, so a document still missing it
+    keeps its last device intact.
+    """
+    body = dsl_text
+    header = network_header_pattern.match(dsl_text)
+    if header:
+        body = dsl_text[header.end():]
+        if dsl_text.count("{") == dsl_text.count("}"):
+            body = body[:body.rfind("}")]
+    return [block for block in block_start_pattern.split(body) if block.strip()]
+
+
+class IncrementalCompiler:
+    """
+    Compiles successive versions of one DSL document, rescanning only the
+    blocks whose text changed since the previous version. Unchanged blocks
+    reuse their cached events, so an edit costs one block scan plus a cheap
+    renumbering pass over the whole graph.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self.last_result = None
+        self.reused = 0
+        self.compiled = 0
+
+    def compile(self, dsl_text):
+        blocks = {}
+        events = []
+        self.reused = self.compiled = 0
+
+        for block in split_blocks(dsl_text):
+            # The block text is its own fingerprint: str hashes are computed in
+            # C and cached, and a dict hit compares the full text, so there
+            # are no false reuses.
+            block_events = blocks.get(block) or self._blocks.get(block)
+            if block_events is None:
+                block_events = _events(block)
+                self.compiled += 1
+            else:
+                self.reused += 1
+            blocks[block] = block_events
+            events.extend(block_events)
+
+        # Only keep blocks of the current version so the cache tracks the document.
+        self._blocks = blocks
+        # Devices without coordinates keep their previous spot when they can.
+        self.last_result = place_unpositioned(_assemble(events), previous=self.last_result)
+        return self.last_result
+
+
+def diff_react_flow(old, new):
+    """
+    JSON-patch style diff between two React Flow graphs. Elements are
+    addressed by id rather than array index ("/nodes/<id>", "/edges/<id>"),
+    which is how React Flow applies node and edge changes.
+    """
+    ops = []
+    for section in ("nodes", "edges"):
+        before = {el["id"]: el for el in old.get(section, [])}
+        after = {el["id"]: el for el in new.get(section, [])}
+        for el_id, el in before.items():
+            if el_id not in after:
+                ops.append({"op": "remove", "path": f"/{section}/{el_id}"})
+        for el_id, el in after.items():
+            prev = before.get(el_id)
+            if prev is None:
+                ops.append({"op": "add", "path": f"/{section}/{el_id}", "value": el})
+            elif prev != el:
+                ops.append({"op": "replace", "path": f"/{section}/{el_id}", "value": el})
+    return ops
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python compile.py <input.dsl>", file=sys.stderr)
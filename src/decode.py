@@ -3,6 +3,16 @@ import xml.etree.ElementTree as ET
 import json
 from ipaddress import ip_address
 
+try:
+    from src.pkt import iter_xml as iter_pkt_xml
+    from src.metrics import stage, ELEMENTS
+except ImportError:
+    from pkt import iter_xml as iter_pkt_xml
+    from metrics import stage, ELEMENTS
+
+# Bump whenever the DSL or React Flow output changes; cached results are keyed on it.
+CONVERTER_VERSION = "2"
+
 # Map Packet Tracer model strings to DSL device keywords
 MODEL_MAP = {
     "PC-PT": "pc",
@@ -30,98 +40,242 @@ def parse_bandwidth_to_mbps(bw_str):
     except:
         return 0
 
-def generate_dsl_and_react_flow(input_xml, output_dsl):
-    # Parse the XML
-    tree = ET.parse(input_xml)
-    root = tree.getroot()
+class DecodeError(Exception):
+    """Raised when the Packet Tracer XML is missing a required section."""
+
+
+def _source_name(input_xml):
+    return input_xml if isinstance(input_xml, str) else getattr(input_xml, "name", "uploaded XML")
+
+
+def _device_from_element(dev_elem):
+    """Extract the device model from a <DEVICE> element, or None to skip it."""
+    engine_elem = dev_elem.find("ENGINE")
+    workspace_elem = dev_elem.find("WORKSPACE")
+    if engine_elem is None:
+        return None
+
+    dev_name = engine_elem.findtext("NAME", "Unknown")
+
+    if dev_name == "Power Distribution Device0":
+        return None
+
+    model_attr = engine_elem.find("TYPE").get("model", "") if engine_elem.find("TYPE") is not None else ""
+    dsl_type = MODEL_MAP.get(model_attr, "unknown")
+    x_coord = float(workspace_elem.findtext("./LOGICAL/X", "0"))
+    y_coord = float(workspace_elem.findtext("./LOGICAL/Y", "0"))
+    power_str = engine_elem.findtext("POWER", "false")
+    is_power_on = (power_str.lower() == "true")
+    save_ref_id = engine_elem.findtext("SAVE_REF_ID", "")
+
+    gateway = (engine_elem.findtext("GATEWAY") or "").strip()
+
+    ports_info = {}
+    ip_address = "0.0.0.0"
+    for i, port in enumerate(dev_elem.iter("PORT")):
+        bw_str = port.findtext("BANDWIDTH", "100000")
+        bw_mbps = parse_bandwidth_to_mbps(bw_str)
+        port_ip = port.findtext("IP")
+
+        if port_ip and port_ip.strip():
+            ip_address = port_ip
+
+        ports_info[i] = {
+            "bandwidth_mbps": bw_mbps,
+            "ip": (port_ip or "").strip(),
+            "mask": (port.findtext("SUBNET") or "").strip(),
+            "dhcp": port.findtext("PORT_DHCP_ENABLE") == "true",
+        }
+
+    return {
+        "save_ref_id": save_ref_id,
+        "name": dev_name,
+        "dsl_type": dsl_type,
+        "x_coord": x_coord,
+        "y_coord": y_coord,
+        "power_on": is_power_on,
+        "ports": ports_info,
+        "ip_address": ip_address,
+        "gateway": gateway,
+    }
+
 
-    devices = {}
-    links = []
-    device_id_counter = 1
-    device_map = {}
+def _link_from_element(link_elem):
+    """Extract the link model from a <LINK> element, or None to skip it."""
+    cable = link_elem.find("CABLE")
+    if cable is None:
+        return None
+
+    from_ref = cable.findtext("FROM", "")
+    to_ref = cable.findtext("TO", "")
+    ports = cable.findall("PORT")
+    if len(ports) < 2:
+        return None
+
+    from_port = ports[0].text or ""
+    to_port = ports[1].text or ""
+    link_speed = 1000 if "Gigabit" in from_port else 100
+
+    return {
+        "from_ref": from_ref,
+        "from_port": from_port,
+        "to_ref": to_ref,
+        "to_port": to_port,
+        "speed": link_speed
+    }
+
+
+class _NetworkCollector:
+    """Numbers devices in document order and keys them by SAVE_REF_ID."""
+
+    def __init__(self):
+        self.devices = {}
+        self.links = []
+        self._next_id = 1
+
+    def add_device(self, dev_elem):
+        dev = _device_from_element(dev_elem)
+        if dev is None:
+            return
+        dev["id"] = self._next_id
+        self.devices[dev["save_ref_id"]] = dev
+        self._next_id += 1
+
+    def add_link(self, link_elem):
+        link = _link_from_element(link_elem)
+        if link is not None:
+            self.links.append(link)
+
+
+def read_network_tree(input_xml):
+    """Build the full ElementTree and return (devices, links)."""
+    root = ET.parse(input_xml).getroot()
 
     network_tag = root.find("./NETWORK")
     if network_tag is None:
-        print(f"ERROR: No <NETWORK> tag found in {input_xml}", file=sys.stderr)
-        sys.exit(1)
+        raise DecodeError(f"No <NETWORK> tag found in {_source_name(input_xml)}")
 
     devices_tag = network_tag.find("DEVICES")
     if devices_tag is None:
-        print(f"ERROR: No <DEVICES> section found in {input_xml}", file=sys.stderr)
-        sys.exit(1)
+        raise DecodeError(f"No <DEVICES> section found in {_source_name(input_xml)}")
 
-    # Collect devices
+    collector = _NetworkCollector()
     for dev_elem in devices_tag.findall("DEVICE"):
-        engine_elem = dev_elem.find("ENGINE")
-        workspace_elem = dev_elem.find("WORKSPACE")
-        if engine_elem is None:
-            continue
-
-        dev_name = engine_elem.findtext("NAME", "Unknown")
-
-        if dev_name == "Power Distribution Device0":
-            continue
-
-        model_attr = engine_elem.find("TYPE").get("model", "") if engine_elem.find("TYPE") is not None else ""
-        dsl_type = MODEL_MAP.get(model_attr, "unknown")
-        x_coord = float(workspace_elem.findtext("./LOGICAL/X", "0"))
-        y_coord = float(workspace_elem.findtext("./LOGICAL/Y", "0"))
-        power_str = engine_elem.findtext("POWER", "false")
-        is_power_on = (power_str.lower() == "true")
-        save_ref_id = engine_elem.findtext("SAVE_REF_ID", "")
-
-        ports_info = {}
-        ip_address = "0.0.0.0"
-        for port in dev_elem.findall(".//PORT"):
-            bw_str = port.findtext("BANDWIDTH", "100000")
-            bw_mbps = parse_bandwidth_to_mbps(bw_str)
-            port_ip = port.findtext("IP")
-
-            if port_ip and port_ip.strip():
-                ip_address = port_ip
-
-            ports_info[id(port)] = {"bandwidth_mbps": bw_mbps}
-
-        devices[save_ref_id] = {
-            "id": device_id_counter,
-            "name": dev_name,
-            "dsl_type": dsl_type,
-            "x_coord": x_coord,
-            "y_coord": y_coord,
-            "power_on": is_power_on,
-            "ports": ports_info,
-            "ip_address": ip_address,
-        }
-        device_map[save_ref_id] = device_id_counter
-        device_id_counter += 1
+        collector.add_device(dev_elem)
 
-    # Collect links
     links_tag = network_tag.find("LINKS")
     if links_tag:
         for link_elem in links_tag.findall("LINK"):
-            cable = link_elem.find("CABLE")
-            if cable is None:
-                continue
-
-            from_ref = cable.findtext("FROM", "")
-            to_ref = cable.findtext("TO", "")
-            ports = cable.findall("PORT")
-            if len(ports) < 2:
-                continue
-
-            from_port = ports[0].text or ""
-            to_port = ports[1].text or ""
-            link_speed = 1000 if "Gigabit" in from_port else 100
-
-            links.append({
-                "from_ref": from_ref,
-                "from_port": from_port,
-                "to_ref": to_ref,
-                "to_port": to_port,
-                "speed": link_speed
-            })
-
-    # Build DSL output
+            collector.add_link(link_elem)
+
+    return collector.devices, collector.links
+
+
+class _NetworkTarget:
+    """
+    XMLParser target that only materializes <root>/NETWORK/DEVICES/DEVICE and
+    <root>/NETWORK/LINKS/LINK subtrees. Everything else (ENVIRONMENT_OPTION
+    blocks, PIXMAPBANK image data, ...) only moves a tag stack and is never
+    built into elements.
+    """
+
+    def __init__(self, on_device, on_link):
+        self.on_device = on_device
+        self.on_link = on_link
+        self.saw_network = False
+        self.saw_devices = False
+        self._path = []
+        self._builder = None
+        self._depth = 0
+
+    def start(self, tag, attrib):
+        if self._builder is not None:
+            self._builder.start(tag, attrib)
+            self._depth += 1
+            return
+
+        path = self._path
+        path.append(tag)
+        if len(path) < 2 or path[1] != "NETWORK":
+            return
+        if len(path) == 2:
+            self.saw_network = True
+        elif len(path) == 3:
+            if tag == "DEVICES":
+                self.saw_devices = True
+        elif len(path) == 4 and (
+            (path[2] == "DEVICES" and tag == "DEVICE") or (path[2] == "LINKS" and tag == "LINK")
+        ):
+            self._builder = ET.TreeBuilder()
+            self._builder.start(tag, attrib)
+            self._depth = 1
+
+    def end(self, tag):
+        if self._builder is None:
+            self._path.pop()
+            return
+
+        self._builder.end(tag)
+        self._depth -= 1
+        if self._depth == 0:
+            elem = self._builder.close()
+            self._builder = None
+            self._path.pop()
+            if tag == "DEVICE":
+                self.on_device(elem)
+            else:
+                self.on_link(elem)
+
+    def data(self, text):
+        if self._builder is not None:
+            self._builder.data(text)
+
+    def close(self):
+        return None
+
+
+class StreamingDecoder:
+    """
+    Incremental decoder: feed() Packet Tracer XML bytes as they arrive and
+    close() to get (devices, links). Only one DEVICE/LINK subtree is alive at
+    a time, so peak memory does not grow with the file size.
+    """
+
+    def __init__(self, source_name="uploaded XML"):
+        self.source_name = source_name
+        self._collector = _NetworkCollector()
+        self._target = _NetworkTarget(self._collector.add_device, self._collector.add_link)
+        self._parser = ET.XMLParser(target=self._target)
+
+    def feed(self, data):
+        self._parser.feed(data)
+
+    def close(self):
+        self._parser.close()
+        if not self._target.saw_network:
+            raise DecodeError(f"No <NETWORK> tag found in {self.source_name}")
+        if not self._target.saw_devices:
+            raise DecodeError(f"No <DEVICES> section found in {self.source_name}")
+        return self._collector.devices, self._collector.links
+
+
+def read_network(input_xml, chunk_size=64 * 1024):
+    """Stream a Packet Tracer XML file (path or binary file object) and return (devices, links)."""
+    decoder = StreamingDecoder(_source_name(input_xml))
+    f = open(input_xml, "rb") if isinstance(input_xml, str) else input_xml
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            decoder.feed(chunk)
+    finally:
+        if f is not input_xml:
+            f.close()
+    return decoder.close()
+
+
+def build_dsl(devices, links):
     lines = []
     lines.append("network MyNetwork {")
     for dev in devices.values():
@@ -146,15 +300,13 @@ def generate_dsl_and_react_flow(input_xml, output_dsl):
         lines.append("    }")
 
     lines.append("}")
-    dsl_output = "\n".join(lines)
+    return "\n".join(lines)
 
-    # Write DSL to file
-    with open(output_dsl, "w", encoding="utf-8") as f:
-        f.write(dsl_output + "\n")
 
-    # Build React Flow JSON
+def build_react_flow(devices, links):
     react_flow_nodes = []
     react_flow_edges = []
+    device_map = {ref: dev["id"] for ref, dev in devices.items()}
 
     for dev in devices.values():
         node = {
@@ -171,7 +323,13 @@ def generate_dsl_and_react_flow(input_xml, output_dsl):
                     "name": "FastEthernet0",
                     "ip": dev['ip_address'],
                     "bandwidth": dev["ports"][next(iter(dev["ports"]))]["bandwidth_mbps"] if dev["ports"] else 0
-                }
+                },
+                # Every addressed port, for the addressing checks (src/addressing.py)
+                "interfaces": [
+                    {"port": n, "ip": port["ip"], "mask": port["mask"], "dhcp": port["dhcp"]}
+                    for n, port in dev["ports"].items() if port["ip"]
+                ],
+                "gateway": dev["gateway"],
             },
             "position": {
                 "x": dev["x_coord"],
@@ -193,14 +351,88 @@ def generate_dsl_and_react_flow(input_xml, output_dsl):
             }
             react_flow_edges.append(edge)
 
-    # Print React Flow JSON to stdout
-    print(json.dumps({"nodes": react_flow_nodes, "edges": react_flow_edges}))
+    return {"nodes": react_flow_nodes, "edges": react_flow_edges}
+
+
+def generate_dsl_and_react_flow(input_xml, output_dsl=None, streaming=True):
+    """
+    Convert a Packet Tracer XML file (path or file object) into DSL text and
+    React Flow JSON. Returns (dsl_output, react_flow); the DSL is also written
+    to output_dsl when a path is given. streaming=False builds the whole
+    ElementTree instead of streaming the file.
+    """
+    with stage("parse_xml"):
+        if streaming:
+            devices, links = read_network(input_xml)
+        else:
+            devices, links = read_network_tree(input_xml)
+
+    dsl_output, react_flow = build_outputs(devices, links)
+
+    # Write DSL to file
+    if output_dsl:
+        with open(output_dsl, "w", encoding="utf-8") as f:
+            f.write(dsl_output + "\n")
+
+    return dsl_output, react_flow
+
+def build_outputs(devices, links):
+    """(dsl_output, react_flow) for decoded devices and links, timed per stage."""
+    ELEMENTS.inc(len(devices), kind="devices")
+    ELEMENTS.inc(len(links), kind="links")
+    with stage("emit_dsl"):
+        dsl_output = build_dsl(devices, links)
+    with stage("build_flow"):
+        react_flow = build_react_flow(devices, links)
+    return dsl_output, react_flow
+
+def decode_chunks(chunks, source_name="uploaded XML"):
+    """Decode XML that arrives as an iterable of byte chunks; returns (dsl_output, react_flow)."""
+    with stage("parse_xml"):
+        decoder = StreamingDecoder(source_name)
+        for chunk in chunks:
+            decoder.feed(chunk)
+        devices, links = decoder.close()
+    return build_outputs(devices, links)
+
+
+def generate_from_pkt(data, source_name="uploaded .pkt"):
+    """Convert an encrypted Packet Tracer .pkt/.pka file; the XML is decrypted and parsed chunk by chunk."""
+    # No EAX tag check: it would be a serial pass over the whole upload, and
+    # zlib's checksum plus the size header already reject corrupted files.
+    return decode_chunks(iter_pkt_xml(data, verify=False), source_name)
+
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python decode.py <input-xml> <output.dsl>")
+    args = [a for a in sys.argv[1:] if a != "--pkt"]
+    if not args:
+        print("Usage: python decode.py [--pkt] <input-xml|input.pkt|-> [<output.dsl>]")
+        print("  With <output.dsl>, writes the DSL there and prints the React Flow JSON;")
+        print("  without, prints {\"dsl\": ..., \"react_flow\": ...}. '-' reads stdin.")
+        sys.exit(1)
+
+    input_xml_file = sys.stdin.buffer if args[0] == "-" else args[0]
+    output_dsl_file = args[1] if len(args) > 1 else None
+    is_pkt = "--pkt" in sys.argv or args[0].lower().endswith((".pkt", ".pka"))
+    try:
+        if is_pkt:
+            if args[0] == "-":
+                raw = sys.stdin.buffer.read()
+            else:
+                with open(args[0], "rb") as f:
+                    raw = f.read()
+            dsl, react_flow = generate_from_pkt(raw)
+            if output_dsl_file:
+                with open(output_dsl_file, "w", encoding="utf-8") as f:
+                    f.write(dsl + "\n")
+        else:
+            dsl, react_flow = generate_dsl_and_react_flow(input_xml_file, output_dsl_file)
+    except (DecodeError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
         sys.exit(1)
 
-    input_xml_file = sys.argv[1]
-    output_dsl_file = sys.argv[2]
-    generate_dsl_and_react_flow(input_xml_file, output_dsl_file)
\ No newline at end of file
+    if output_dsl_file:
+        # Print React Flow JSON to stdout
+        print(json.dumps(react_flow))
+    else:
+        print(json.dumps({"dsl": dsl, "react_flow": react_flow}))
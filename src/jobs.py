@@ -0,0 +1,304 @@
+"""
+Asynchronous conversion jobs on a local SQLite queue.
+
+A submitted job is a row in a SQLite file: the request returns its id at
+once and worker threads in every server process pull queued rows, run the
+registered handler and store the result (or error) on the row, where it is
+kept for `ttl` seconds after it finishes. Because the queue is a file, all
+gunicorn workers on the host share it and jobs survive a restart: a worker
+holds a job under a lease that a heartbeat thread renews every lease/3
+seconds while the handler runs, and a job whose lease ran out (its
+process died) is picked up again by the next free worker, up to
+`max_attempts` times.
+
+Handlers take (payload bytes, progress) and return the result as JSON bytes;
+progress(fraction, message) records how far along the job is.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    owner       TEXT,
+    status      TEXT NOT NULL,
+    progress    REAL NOT NULL DEFAULT 0,
+    message     TEXT,
+    input       BLOB,
+    result      BLOB,
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    expires_at  REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_expires ON jobs (expires_at);
+"""
+
+_PUBLIC_COLUMNS = ("id", "kind", "owner", "status", "progress", "message", "result", "error",
+                   "attempts", "created_at", "updated_at", "expires_at")
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail the job with a client-facing error body."""
+    def __init__(self, error, **details):
+        super().__init__(error)
+        self.details = dict(details, error=error)
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a pool of worker threads. Like the
+    converter pool, threads start lazily (start() is cheap to call on every
+    request), so a queue created at import time belongs to the process that
+    serves requests, not to a preforking master.
+    """
+
+    def __init__(self, path, handlers, workers=2, ttl=3600, lease=120, max_attempts=3,
+                 poll_interval=1.0):
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.ttl = ttl
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Notified on every local state change: wakes idle workers on submit
+        # and event streams on progress.
+        self._changed = threading.Condition()
+        self._pid = None
+        self._stopping = threading.Event()
+        self._last_purge = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    # ─── Storage ──────────────────────────────────────────────────────────────
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _db(self):
+        # One connection per thread (and per process: never reuse across fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        self._notify()
+
+    # ─── Client side ──────────────────────────────────────────────────────────
+
+    def submit(self, kind, payload, owner=None):
+        """
+        Queue a job and return its id. The payload is bytes or an iterable
+        of byte chunks; chunks are written into the row one at a time
+        rather than joined into one more copy of the input first.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        self.start()
+        chunks = [payload] if isinstance(payload, (bytes, bytearray)) else list(payload)
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        db = self._db
+        # One transaction, so no worker claims the row before its input is written.
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cur = db.execute(
+                "INSERT INTO jobs (id, kind, owner, status, input, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, zeroblob(?), ?, ?)",
+                (job_id, kind, owner, QUEUED, sum(map(len, chunks)), now, now),
+            )
+            with db.blobopen("jobs", "input", cur.lastrowid) as blob:
+                for chunk in chunks:
+                    blob.write(chunk)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._notify()
+        return job_id
+
+    def get(self, job_id):
+        """The job as a dict (without its input), or None if unknown or expired."""
+        row = self._db.execute(
+            f"SELECT {', '.join(_PUBLIC_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+            return None
+        job = dict(row)
+        if job["error"] is not None:
+            job["error"] = json.loads(job["error"])
+        return job
+
+    def wait(self, job_id, since, timeout):
+        """
+        Block until the job's updated_at moves past `since` or `timeout`
+        elapses; returns the job (None if it is gone). Changes made by other
+        processes are noticed within poll_interval.
+        """
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["updated_at"] > since:
+                return job
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def stats(self):
+        rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict({QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}, **{s: n for s, n in rows})
+
+    # ─── Worker side ──────────────────────────────────────────────────────────
+
+    def start(self):
+        if self._pid == os.getpid() or self.workers <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            for n in range(self.workers):
+                threading.Thread(target=self._worker, name=f"job-worker-{n}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def shutdown(self):
+        self._stopping.set()
+        self._notify()
+
+    def _claim(self):
+        """
+        Take the oldest queued job, or a running one whose lease expired
+        because its process died. Returns the row or None.
+        """
+        db = self._db
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT id, kind, input, attempts FROM jobs"
+                " WHERE status = ? OR (status = ? AND lease_until < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?,"
+                    " updated_at = ? WHERE id = ?",
+                    (RUNNING, now + self.lease, now, row["id"]),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if row is not None:
+            self._notify()
+        return row
+
+    def _finish(self, job_id, status, result=None, error=None):
+        fields = {"progress": 1.0, "message": None} if status == DONE else {}
+        self._update(job_id, status=status, result=result, error=json.dumps(error) if error else None,
+                     input=None, lease_until=None, expires_at=time.time() + self.ttl, **fields)
+
+    def _purge(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self._db.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                self._purge()
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                job = None
+            if job is None:
+                with self._changed:
+                    self._changed.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _heartbeat(self, job_id):
+        """
+        Keep renewing the job's lease until the returned event is set, so a
+        handler that runs longer than `lease` is not claimed a second time.
+        Only lease_until changes: event streams see no update.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease / 3):
+                try:
+                    self._db.execute(
+                        "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                        (time.time() + self.lease, job_id, RUNNING),
+                    )
+                except sqlite3.Error as e:
+                    print(f"Job queue error: {e}")
+
+        threading.Thread(target=beat, name=f"job-heartbeat-{job_id[:8]}", daemon=True).start()
+        return stop
+
+    def _run(self, job):
+        job_id = job["id"]
+        if job["attempts"] >= self.max_attempts:
+            # Claimed again after its worker died max_attempts times; most
+            # likely the input itself takes the process down.
+            self._finish(job_id, FAILED, error={"error": "Job abandoned",
+                                                "details": f"worker died {job['attempts']} times"})
+            return
+
+        def progress(fraction, message=None):
+            self._update(job_id, progress=fraction, message=message,
+                         lease_until=time.time() + self.lease)
+
+        heartbeat = self._heartbeat(job_id)
+        try:
+            try:
+                result = self.handlers[job["kind"]](job["input"], progress)
+            finally:
+                heartbeat.set()
+        except JobFailed as e:
+            self._finish(job_id, FAILED, error=e.details)
+        except Exception as e:
+            self._finish(job_id, FAILED, error={"error": "Internal error", "details": f"{type(e).__name__}: {e}"})
+        else:
+            self._finish(job_id, DONE, result=result)
@@ -0,0 +1,384 @@
+"""
+Table-driven LALR(1) parser for the network DSL.
+
+Accepts the grammar of src/parser.py (`Network`, `Device`, `Link`, ...) and
+builds a compact AST of __slots__ classes whose as_list() matches
+`Network.parseString(text).asList()`. The parse tables live in
+src/lalrtab.py and are loaded once at import; PLY is only needed to
+regenerate them after a grammar change:
+
+    python3 src/lalr.py
+
+Compared to the pyparsing grammar, the lexer additionally accepts decimal
+numbers (`coordinates 168.5 288.0`), `_` in names and `/` in interface
+names (`FastEthernet0/1`), which is what src/decode.py emits.
+"""
+import re
+import sys
+
+try:
+    from src import lalrtab
+except ImportError:
+    try:
+        import lalrtab
+    except ImportError:     # only while the tables are being (re)generated
+        lalrtab = None
+
+
+class DSLSyntaxError(ValueError):
+    def __init__(self, message, line, column):
+        super().__init__(f"{message} at line {line}, column {column}")
+        self.line = line
+        self.column = column
+
+
+# ─── AST ──────────────────────────────────────────────────────────────────────
+
+class Network:
+    __slots__ = ("name", "items")
+
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+
+    @property
+    def devices(self):
+        return [i for i in self.items if isinstance(i, Device)]
+
+    @property
+    def links(self):
+        return [i for i in self.items if isinstance(i, Link)]
+
+    def as_list(self):
+        return ["network", self.name] + [i.as_list() for i in self.items]
+
+
+class Device:
+    __slots__ = ("name", "type", "body")
+
+    def __init__(self, name, type, body):
+        self.name = name
+        self.type = type
+        self.body = body
+
+    def as_list(self):
+        return ["device", self.name, self.type] + [s.as_list() for s in self.body]
+
+
+class Coordinates:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def as_list(self):
+        return ["coordinates", self.x, self.y]
+
+
+class Power:
+    __slots__ = ("state",)
+
+    def __init__(self, state):
+        self.state = state
+
+    def as_list(self):
+        return ["power", self.state]
+
+
+class Interface:
+    __slots__ = ("name", "settings")
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings    # [(keyword, value)] in source order
+
+    def get(self, keyword, default=None):
+        for key, value in reversed(self.settings):
+            if key == keyword:
+                return value
+        return default
+
+    def as_list(self):
+        return ["interface", self.name] + [[k, v] for k, v in self.settings]
+
+
+class Link:
+    __slots__ = ("device1", "iface1", "device2", "iface2", "properties")
+
+    def __init__(self, device1, iface1, device2, iface2, properties):
+        self.device1 = device1
+        self.iface1 = iface1
+        self.device2 = device2
+        self.iface2 = iface2
+        self.properties = properties    # [(property, value)] in source order
+
+    def as_list(self):
+        return (["link", [self.device1, ".", self.iface1, "->", self.device2, ".", self.iface2]]
+                + [[k, v] for k, v in self.properties])
+
+
+# ─── Lexer ────────────────────────────────────────────────────────────────────
+
+keywords = {
+    "network": "NETWORK", "device": "DEVICE", "link": "LINK",
+    "coordinates": "COORDINATES", "power": "POWER", "interface": "INTERFACE",
+    "bandwidth": "BANDWIDTH", "ip": "IP", "on": "ON", "off": "OFF",
+}
+
+tokens = ["WORD", "NUMBER", "DECIMAL", "IPV4", "LBRACE", "RBRACE", "DOT", "ARROW"] + list(keywords.values())
+
+# Each match consumes leading whitespace plus one token.
+_token_pattern = re.compile(r"""\s*(?:
+    (?P<IPV4>(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b)
+  | (?P<DECIMAL>[0-9]+\.[0-9]+(?![\w./-]))
+  | (?P<ARROW>->)
+  | (?P<NAME>[A-Za-z0-9_-]+(?:/[A-Za-z0-9_-]+)*)
+  | (?P<LBRACE>\{)
+  | (?P<RBRACE>\})
+  | (?P<DOT>\.)
+)""", re.VERBOSE)
+
+
+def _position(text, pos):
+    line = text.count("\n", 0, pos) + 1
+    return line, pos - (text.rfind("\n", 0, pos) + 1) + 1
+
+
+def _unexpected_character(text, pos):
+    while text[pos].isspace():
+        pos += 1
+    return DSLSyntaxError(f"Unexpected character {text[pos]!r}", *_position(text, pos))
+
+
+def _lex(text):
+    """Yield (type, value, offset) tuples, ending with ("$end", None, len(text))."""
+    pos = 0
+    for m in _token_pattern.finditer(text):
+        if m.start() != pos:
+            raise _unexpected_character(text, pos)
+        kind = m.lastgroup
+        value = m.group(kind)
+        start = m.start(kind)
+        if kind == "NAME":
+            if value in keywords:
+                kind = keywords[value]
+            elif value.isdigit() and value.isascii():
+                kind = "NUMBER"
+            else:
+                kind = "WORD"
+        yield kind, value, start
+        pos = m.end()
+
+    if text[pos:].strip():
+        raise _unexpected_character(text, pos)
+    yield "$end", None, len(text)
+
+
+# ─── Grammar ──────────────────────────────────────────────────────────────────
+# p_* docstrings are the grammar (PLY syntax); the functions are the reduce
+# actions run by parse() below.
+
+start = "start"
+
+
+def p_start(p):
+    """start : network
+             | items"""
+    p[0] = p[1]
+
+
+def p_network(p):
+    """network : NETWORK word LBRACE items RBRACE"""
+    p[0] = Network(p[2], p[4])
+
+
+def p_items(p):
+    """items : items item"""
+    p[1].append(p[2])
+    p[0] = p[1]
+
+
+def p_items_empty(p):
+    """items : """
+    p[0] = []
+
+
+def p_item(p):
+    """item : device
+            | link"""
+    p[0] = p[1]
+
+
+def p_device(p):
+    """device : DEVICE word word LBRACE device_body RBRACE"""
+    p[0] = Device(p[2], p[3], p[5])
+
+
+def p_device_body(p):
+    """device_body : device_body device_stmt
+       interface_body : interface_body interface_stmt
+       link_body : link_body property"""
+    p[1].append(p[2])
+    p[0] = p[1]
+
+
+def p_body_empty(p):
+    """device_body :
+       interface_body :
+       link_body : """
+    p[0] = []
+
+
+def p_device_stmt(p):
+    """device_stmt : coordinates
+                   | power
+                   | interface"""
+    p[0] = p[1]
+
+
+def p_coordinates(p):
+    """coordinates : COORDINATES number number"""
+    p[0] = Coordinates(p[2], p[3])
+
+
+def p_power(p):
+    """power : POWER ON
+             | POWER OFF"""
+    p[0] = Power(p[2])
+
+
+def p_interface(p):
+    """interface : INTERFACE word LBRACE interface_body RBRACE"""
+    p[0] = Interface(p[2], p[4])
+
+
+def p_interface_stmt(p):
+    """interface_stmt : BANDWIDTH number
+                      | IP IPV4
+       property : word word"""
+    p[0] = (p[1], p[2])
+
+
+def p_link(p):
+    """link : LINK endpoint ARROW endpoint LBRACE link_body RBRACE"""
+    (d1, i1), (d2, i2) = p[2], p[4]
+    p[0] = Link(d1, i1, d2, i2, p[6])
+
+
+def p_endpoint(p):
+    """endpoint : word DOT word"""
+    p[0] = (p[1], p[3])
+
+
+def p_endpoint_decimal(p):
+    """endpoint : DECIMAL"""
+    # `1.0` lexes as one number but is device "1", interface "0" here.
+    device, iface = p[1].split(".")
+    p[0] = (device, iface)
+
+
+def p_number(p):
+    """number : NUMBER
+              | DECIMAL"""
+    p[0] = p[1]
+
+
+def p_word(p):
+    """word : WORD
+            | NUMBER
+            | NETWORK
+            | DEVICE
+            | LINK
+            | COORDINATES
+            | POWER
+            | INTERFACE
+            | BANDWIDTH
+            | IP
+            | ON
+            | OFF"""
+    p[0] = p[1]
+
+
+def p_error(p):
+    pass
+
+
+# ─── Driver ───────────────────────────────────────────────────────────────────
+
+# Unit productions whose action is p[0] = p[1]; the driver skips the call.
+_PASSTHROUGH = {"p_start", "p_item", "p_device_stmt", "p_number", "p_word"}
+
+if lalrtab is not None:
+    _action = lalrtab._lr_action
+    _goto = lalrtab._lr_goto
+    # (lhs, rhs length, reduce action or None for pass-through) per production
+    _productions = [
+        (name, length, None if func in _PASSTHROUGH else globals().get(func))
+        for _, name, length, func, _, _ in lalrtab._lr_productions
+    ]
+
+
+def parse(text):
+    """
+    Parse DSL text. A full document returns a Network; text that is only a
+    sequence of device/link statements returns them as a list.
+    Raises DSLSyntaxError on invalid input.
+    """
+    action, goto, productions = _action, _goto, _productions
+    states = [0]
+    values = []
+    push_state, push_value = states.append, values.append
+    state = 0
+    toks = _lex(text)
+    kind, value, pos = next(toks)
+
+    while True:
+        act = action[state].get(kind)
+        if act is None:
+            if kind == "$end":
+                raise DSLSyntaxError("Unexpected end of input", *_position(text, pos))
+            raise DSLSyntaxError(f"Unexpected {value!r}", *_position(text, pos))
+
+        if act > 0:
+            state = act
+            push_state(state)
+            push_value(value)
+            kind, value, pos = next(toks)
+        elif act < 0:
+            name, length, func = productions[-act]
+            if func is None:
+                del states[-1]
+            else:
+                if length:
+                    p = [None] + values[-length:]
+                    del values[-length:]
+                    del states[-length:]
+                else:
+                    p = [None]
+                func(p)
+                push_value(p[0])
+            state = goto[states[-1]][name]
+            push_state(state)
+        else:
+            return values[-1]
+
+
+def parse_network(text):
+    """Parse a complete `network NAME { ... }` document."""
+    result = parse(text)
+    if not isinstance(result, Network):
+        raise DSLSyntaxError("Expected 'network'", 1, 1)
+    return result
+
+
+def _build_tables():
+    import os
+    import ply.yacc as yacc
+    yacc.yacc(module=sys.modules[__name__], tabmodule="lalrtab",
+              outputdir=os.path.dirname(os.path.abspath(__file__)),
+              debug=False, write_tables=True)
+
+
+if __name__ == "__main__":
+    _build_tables()
@@ -0,0 +1,71 @@
+
+# lalrtab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'startARROW BANDWIDTH COORDINATES DECIMAL DEVICE DOT INTERFACE IP IPV4 LBRACE LINK NETWORK NUMBER OFF ON POWER RBRACE WORDstart : network\n             | itemsnetwork : NETWORK word LBRACE items RBRACEitems : items itemitems : item : device\n            | linkdevice : DEVICE word word LBRACE device_body RBRACEdevice_body : device_body device_stmt\n       interface_body : interface_body interface_stmt\n       link_body : link_body propertydevice_body :\n       interface_body :\n       link_body : device_stmt : coordinates\n                   | power\n                   | interfacecoordinates : COORDINATES number numberpower : POWER ON\n             | POWER OFFinterface : INTERFACE word LBRACE interface_body RBRACEinterface_stmt : BANDWIDTH number\n                      | IP IPV4\n       property : word wordlink : LINK endpoint ARROW endpoint LBRACE link_body RBRACEendpoint : word DOT wordendpoint : DECIMALnumber : NUMBER\n              | DECIMALword : WORD\n            | NUMBER\n            | NETWORK\n            | DEVICE\n            | LINK\n            | COORDINATES\n            | POWER\n            | INTERFACE\n            | BANDWIDTH\n            | IP\n            | ON\n            | OFF'
+    
+_lr_action_items = {'NETWORK':([0,4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,45,46,54,55,58,],[4,10,10,10,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,10,10,10,-14,10,10,-11,10,-24,]),'DEVICE':([0,3,4,5,6,7,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,27,29,30,31,37,38,45,46,53,54,55,58,],[-5,8,14,-4,-6,-7,14,14,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,14,-5,14,14,8,-14,-8,14,14,-25,-11,14,-24,]),'LINK':([0,3,4,5,6,7,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,27,29,30,31,37,38,45,46,53,54,55,58,],[-5,9,15,-4,-6,-7,15,15,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,15,-5,15,15,9,-14,-8,15,15,-25,-11,15,-24,]),'$end':([0,1,2,3,5,6,7,35,38,53,],[-5,0,-1,-2,-4,-6,-7,-3,-8,-25,]),'WORD':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,45,46,54,55,58,],[12,12,12,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,12,12,12,-14,12,12,-11,12,-24,]),'NUMBER':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,43,45,46,47,48,49,54,55,58,62,],[13,13,13,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,13,13,13,-14,48,13,13,48,-28,-29,-11,13,-24,48,]),'COORDINATES':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,32,36,37,39,40,41,42,45,46,48,49,50,51,54,55,56,58,60,],[16,16,16,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,16,16,16,-12,43,-14,-9,-15,-16,-17,16,16,-28,-29,-19,-20,-11,16,-18,-24,-21,]),'POWER':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,32,36,37,39,40,41,42,45,46,48,49,50,51,54,55,56,58,60,],[17,17,17,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,17,17,17,-12,44,-14,-9,-15,-16,-17,17,17,-28,-29,-19,-20,-11,17,-18,-24,-21,]),'INTERFACE':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,32,36,37,39,40,41,42,45,46,48,49,50,51,54,55,56,58,60,],[18,18,18,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,18,18,18,-12,45,-14,-9,-15,-16,-17,18,18,-28,-29,-19,-20,-11,18,-18,-24,-21,]),'BANDWIDTH':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,45,46,48,49,54,55,57,58,59,61,64,65,],[19,19,19,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,19,19,19,-14,19,19,-28,-29,-11,19,-13,-24,62,-10,-22,-23,]),'IP':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,45,46,48,49,54,55,57,58,59,61,64,65,],[20,20,20,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,20,20,20,-14,20,20,-28,-29,-11,20,-13,-24,63,-10,-22,-23,]),'ON':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,44,45,46,54,55,58,],[21,21,21,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,21,21,21,-14,50,21,21,-11,21,-24,]),'OFF':([4,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,29,30,37,44,45,46,54,55,58,],[22,22,22,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,22,22,22,-14,51,22,22,-11,22,-24,]),'RBRACE':([5,6,7,10,12,13,14,15,16,17,18,19,20,21,22,27,31,32,36,37,38,39,40,41,42,46,48,49,50,51,53,54,56,57,58,59,60,61,64,65,],[-4,-6,-7,-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,-5,35,-12,38,-14,-8,-9,-15,-16,-17,53,-28,-29,-19,-20,-25,-11,-18,-13,-24,60,-21,-10,-22,-23,]),'DECIMAL':([9,29,43,47,48,49,62,],[26,26,49,49,-28,-29,49,]),'LBRACE':([10,11,12,13,14,15,16,17,18,19,20,21,22,26,28,33,34,52,],[-32,27,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,-27,32,37,-26,57,]),'DOT':([10,12,13,14,15,16,17,18,19,20,21,22,25,],[-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,30,]),'ARROW':([10,12,13,14,15,16,17,18,19,20,21,22,24,26,34,],[-32,-30,-31,-33,-34,-35,-36,-37,-38,-39,-40,-41,29,-27,-26,]),'IPV4':([63,],[65,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'start':([0,],[1,]),'network':([0,],[2,]),'items':([0,27,],[3,31,]),'item':([3,31,],[5,5,]),'device':([3,31,],[6,6,]),'link':([3,31,],[7,7,]),'word':([4,8,9,23,29,30,45,46,55,],[11,23,25,28,25,34,52,55,58,]),'endpoint':([9,29,],[24,33,]),'device_body':([32,],[36,]),'device_stmt':([36,],[39,]),'coordinates':([36,],[40,]),'power':([36,],[41,]),'interface':([36,],[42,]),'link_body':([37,],[46,]),'number':([43,47,62,],[47,56,64,]),'property':([46,],[54,]),'interface_body':([57,],[59,]),'interface_stmt':([59,],[61,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> start","S'",1,None,None,None),
+  ('start -> network','start',1,'p_start','lalr.py',188),
+  ('start -> items','start',1,'p_start','lalr.py',189),
+  ('network -> NETWORK word LBRACE items RBRACE','network',5,'p_network','lalr.py',194),
+  ('items -> items item','items',2,'p_items','lalr.py',199),
+  ('items -> <empty>','items',0,'p_items_empty','lalr.py',205),
+  ('item -> device','item',1,'p_item','lalr.py',210),
+  ('item -> link','item',1,'p_item','lalr.py',211),
+  ('device -> DEVICE word word LBRACE device_body RBRACE','device',6,'p_device','lalr.py',216),
+  ('device_body -> device_body device_stmt','device_body',2,'p_device_body','lalr.py',221),
+  ('interface_body -> interface_body interface_stmt','interface_body',2,'p_device_body','lalr.py',222),
+  ('link_body -> link_body property','link_body',2,'p_device_body','lalr.py',223),
+  ('device_body -> <empty>','device_body',0,'p_body_empty','lalr.py',229),
+  ('interface_body -> <empty>','interface_body',0,'p_body_empty','lalr.py',230),
+  ('link_body -> <empty>','link_body',0,'p_body_empty','lalr.py',231),
+  ('device_stmt -> coordinates','device_stmt',1,'p_device_stmt','lalr.py',236),
+  ('device_stmt -> power','device_stmt',1,'p_device_stmt','lalr.py',237),
+  ('device_stmt -> interface','device_stmt',1,'p_device_stmt','lalr.py',238),
+  ('coordinates -> COORDINATES number number','coordinates',3,'p_coordinates','lalr.py',243),
+  ('power -> POWER ON','power',2,'p_power','lalr.py',248),
+  ('power -> POWER OFF','power',2,'p_power','lalr.py',249),
+  ('interface -> INTERFACE word LBRACE interface_body RBRACE','interface',5,'p_interface','lalr.py',254),
+  ('interface_stmt -> BANDWIDTH number','interface_stmt',2,'p_interface_stmt','lalr.py',259),
+  ('interface_stmt -> IP IPV4','interface_stmt',2,'p_interface_stmt','lalr.py',260),
+  ('property -> word word','property',2,'p_interface_stmt','lalr.py',261),
+  ('link -> LINK endpoint ARROW endpoint LBRACE link_body RBRACE','link',7,'p_link','lalr.py',266),
+  ('endpoint -> word DOT word','endpoint',3,'p_endpoint','lalr.py',272),
+  ('endpoint -> DECIMAL','endpoint',1,'p_endpoint_decimal','lalr.py',277),
+  ('number -> NUMBER','number',1,'p_number','lalr.py',284),
+  ('number -> DECIMAL','number',1,'p_number','lalr.py',285),
+  ('word -> WORD','word',1,'p_word','lalr.py',290),
+  ('word -> NUMBER','word',1,'p_word','lalr.py',291),
+  ('word -> NETWORK','word',1,'p_word','lalr.py',292),
+  ('word -> DEVICE','word',1,'p_word','lalr.py',293),
+  ('word -> LINK','word',1,'p_word','lalr.py',294),
+  ('word -> COORDINATES','word',1,'p_word','lalr.py',295),
+  ('word -> POWER','word',1,'p_word','lalr.py',296),
+  ('word -> INTERFACE','word',1,'p_word','lalr.py',297),
+  ('word -> BANDWIDTH','word',1,'p_word','lalr.py',298),
+  ('word -> IP','word',1,'p_word','lalr.py',299),
+  ('word -> ON','word',1,'p_word','lalr.py',300),
+  ('word -> OFF','word',1,'p_word','lalr.py',301),
+]
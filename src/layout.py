@@ -0,0 +1,313 @@
+"""
+Automatic placement for React Flow nodes that have no coordinates.
+
+Devices declared without a `coordinates` line used to all land on (0, 0).
+place_unpositioned() lays those out with a force-directed simulation
+(Fruchterman-Reingold): linked nodes attract, all nodes repel, and the
+step size cools down over a fixed number of iterations. Nodes that do
+have coordinates are pinned: they push and pull the others but never
+move.
+
+Repulsion is the quadratic part, so it uses a multilevel grid in the
+manner of Barnes-Hut: the drawing is split into 2^d x 2^d cells at every
+level d, nodes in the same or adjacent smallest cells repel exactly, and
+farther away a cell acts as one body at its centroid, weighted by its
+node count, on each cell of the same size that is not its neighbour but
+whose parent neighbours its parent. That is a bounded number of cells per
+cell and level, so an iteration costs O(n log n) numpy work and
+thousands of nodes take well under a second (bench/run.py enforces it).
+Without numpy, unplaced nodes are put on a plain grid beside the placed
+ones.
+
+The simulation starts from a fixed seed, so the same graph always gets
+the same layout (and the same cache key for its result).
+"""
+import math
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:     # falls back to grid placement
+    np = None
+
+# Ideal distance between linked nodes, in React Flow pixels
+SPACING = 150.0
+ITERATIONS = 60
+# Iterations between rebuilds of the repulsion grid
+REGRID = 4
+# Nodes per leaf cell of the repulsion grid the depth aims for, and its deepest level
+LEAF_SIZE = 4
+MAX_DEPTH = 10
+
+
+def _unpositioned(node):
+    return "coordinates" not in node.get("data", {})
+
+
+def place_unpositioned(graph, previous=None, spacing=SPACING, iterations=ITERATIONS):
+    """
+    Give every node of a React Flow graph that has no coordinates a
+    position, in place. `previous` is an earlier result for the same
+    document: unplaced nodes that appear in it (by label) start from their
+    old position, so small edits do not reshuffle the layout. Returns the
+    graph.
+    """
+    nodes = graph["nodes"]
+    free = [i for i, node in enumerate(nodes) if _unpositioned(node)]
+    if not free:
+        return graph
+
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    edges = [(index[e["source"]], index[e["target"]]) for e in graph["edges"]
+             if e["source"] in index and e["target"] in index and e["source"] != e["target"]]
+
+    old = {}
+    if previous:
+        old = {n["data"].get("label"): n["position"] for n in previous.get("nodes", []) if _unpositioned(n)}
+
+    if np is None:
+        positions = _grid_layout(nodes, free, spacing)
+    else:
+        positions = _force_layout(nodes, free, edges, old, spacing, iterations)
+    for i, (x, y) in zip(free, positions):
+        nodes[i]["position"] = {"x": x, "y": y}
+    return graph
+
+
+# ─── Grid fallback ────────────────────────────────────────────────────────────
+
+def _grid_layout(nodes, free, spacing):
+    free_set = set(free)
+    placed = [node["position"] for i, node in enumerate(nodes) if i not in free_set]
+    left = max((p["x"] for p in placed), default=-spacing) + spacing
+    top = min((p["y"] for p in placed), default=0.0)
+    columns = max(1, math.ceil(math.sqrt(len(free))))
+    return [(left + (n % columns) * spacing, top + (n // columns) * spacing) for n in range(len(free))]
+
+
+# ─── Force-directed layout ────────────────────────────────────────────────────
+
+def _initial_positions(pos, moving, edges, old, labels, spacing, rng):
+    """
+    Seed unplaced nodes one link away from an already placed neighbour,
+    breadth-first from the pinned nodes (and from `old` positions), so
+    the simulation starts with short links and only has to spread nodes
+    out. Components with nothing placed start at a random spot on a disc
+    sized for their number. Returns how many nodes started from `old`.
+    """
+    n = len(pos)
+    adjacency = [[] for _ in range(n)]
+    for a, b in edges.tolist():
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+
+    placed = ~moving
+    reused = 0
+    for i in np.flatnonzero(moving):
+        p = old.get(labels[i])
+        if p is not None:
+            pos[i] = (p["x"], p["y"])
+            placed[i] = True
+            reused += 1
+
+    centre = pos[placed].mean(axis=0) if placed.any() else np.zeros(2)
+    angle = rng.uniform(0, 2 * math.pi, n)
+    offset = spacing * np.column_stack((np.cos(angle), np.sin(angle)))
+    radius = spacing * math.sqrt(int(moving.sum()))
+    queue = deque(np.flatnonzero(placed).tolist())
+    for seed in [None] + np.flatnonzero(~placed).tolist():
+        if seed is not None:
+            if placed[seed]:
+                continue
+            pos[seed] = centre + offset[seed] / spacing * radius * math.sqrt(rng.uniform())
+            placed[seed] = True
+            queue.append(seed)
+        while queue:
+            u = queue.popleft()
+            for v in adjacency[u]:
+                if not placed[v]:
+                    pos[v] = pos[u] + offset[v]
+                    placed[v] = True
+                    queue.append(v)
+    return reused
+
+
+class _Grid:
+    """
+    Multilevel bucketing of the nodes for the repulsion approximation (see
+    the module docstring). Level d splits the bounding square into 2^d x 2^d
+    cells, down to cells of about LEAF_SIZE nodes; cells of all levels share
+    one numbering. Built from the positions every few iterations; in
+    between, nodes keep their cells and only the cell centroids are
+    recomputed.
+    """
+
+    def __init__(self, pos, moving):
+        n = len(pos)
+        lo = pos.min(axis=0)
+        extent = max(float((pos.max(axis=0) - lo).max()), 1e-9)
+        unit = (pos - lo) / extent
+        # Deep enough for leaves of about LEAF_SIZE nodes where the nodes
+        # actually are: a dense cluster in a wide drawing gets more levels.
+        depth = min(MAX_DEPTH, max(2, math.ceil(math.log(max(n / LEAF_SIZE, 1.0), 4))))
+        while True:
+            side = 1 << depth
+            leaf = np.minimum((unit * side).astype(np.int64), side - 1)
+            crowding = np.bincount(leaf[:, 0] * side + leaf[:, 1])
+            if depth >= MAX_DEPTH or int(crowding @ crowding) <= 2 * LEAF_SIZE * n:
+                break
+            depth += 1
+
+        # Each node's cell at levels 2..depth (level 1 has no far cells), and
+        # every (target, source) pair of cells that interact as single bodies:
+        # the children of the target's parent's neighbours that are not
+        # neighbours of the target itself. Nearer cells are covered by the
+        # next level down, and at the leaves by exact pairs.
+        ids, targets, sources, first = [], [], [], 0
+        for level in range(2, depth + 1):
+            size = 1 << level
+            xy = leaf >> (depth - level)
+            ids.append(first + xy[:, 0] * size + xy[:, 1])
+            t, s = _interactions(xy, size)
+            targets.append(first + t)
+            sources.append(first + s)
+            first += size * size
+        self.ids = np.column_stack(ids)
+        self.cells = first
+        self.flat = self.ids.ravel()
+        mass = np.bincount(self.flat, minlength=first)
+        self.divisor = np.maximum(mass, 1)
+        self.target = np.concatenate(targets)
+        self.source = np.concatenate(sources)
+        self.source_mass = mass[self.source].astype(float)
+        self.i, self.j = _neighbour_pairs(leaf, side, moving)
+
+    def repulsion(self, pos, k2):
+        """Approximate sum of the k²/d repulsion on every node."""
+        n, levels = self.ids.shape
+        x, y = pos[:, 0], pos[:, 1]
+        soften = 1e-2 * k2
+
+        # Far field: each cell takes the force of its interaction list, and
+        # its gradient, at its centroid; every node adds that force, moved
+        # linearly to where it sits, for each cell it lies in.
+        cx = np.bincount(self.flat, weights=np.repeat(x, levels), minlength=self.cells) / self.divisor
+        cy = np.bincount(self.flat, weights=np.repeat(y, levels), minlength=self.cells) / self.divisor
+        dx = cx[self.target] - cx[self.source]
+        dy = cy[self.target] - cy[self.source]
+        r2 = dx * dx + dy * dy + soften
+        w = self.source_mass * k2 / r2
+        per_cell = [np.bincount(self.target, weights=v, minlength=self.cells)[self.ids] for v in (
+            dx * w, dy * w,                                  # force
+            w - 2 * w * dx * dx / r2, -2 * w * dx * dy / r2, w - 2 * w * dy * dy / r2,   # gradient
+        )]
+        gx, gy, gxx, gxy, gyy = per_cell
+        ox, oy = x[:, None] - cx[self.ids], y[:, None] - cy[self.ids]
+        fx = (gx + gxx * ox + gxy * oy).sum(axis=1)
+        fy = (gy + gxy * ox + gyy * oy).sum(axis=1)
+
+        # Near field: exact, each pair once, equal and opposite
+        dx = x[self.i] - x[self.j]
+        dy = y[self.i] - y[self.j]
+        w = k2 / (dx * dx + dy * dy + soften)
+        fx += np.bincount(self.i, weights=dx * w, minlength=n) - np.bincount(self.j, weights=dx * w, minlength=n)
+        fy += np.bincount(self.i, weights=dy * w, minlength=n) - np.bincount(self.j, weights=dy * w, minlength=n)
+        return np.column_stack((fx, fy))
+
+
+def _interactions(xy, size):
+    """(target, source) cell numbers at one level, for the occupied cells there."""
+    occupied = np.zeros(size * size, dtype=bool)
+    occupied[xy[:, 0] * size + xy[:, 1]] = True
+    cells = np.flatnonzero(occupied)
+    x, y = cells // size, cells % size
+    # The parent's 3x3 neighbourhood is 6x6 cells here, starting two or
+    # three cells before the target depending on which child it is.
+    span = np.arange(-2, 4)
+    sx = x[:, None, None] + (span[None, :] - (x & 1)[:, None])[:, :, None]
+    sy = y[:, None, None] + (span[None, :] - (y & 1)[:, None])[:, None, :]
+    sx, sy = np.broadcast_arrays(sx, sy)
+    keep = ((np.abs(sx - x[:, None, None]) > 1) | (np.abs(sy - y[:, None, None]) > 1)) \
+        & (sx >= 0) & (sx < size) & (sy >= 0) & (sy < size)
+    source = sx[keep] * size + sy[keep]
+    target = np.broadcast_to(cells[:, None, None], keep.shape)[keep]
+    hit = occupied[source]
+    return target[hit], source[hit]
+
+
+def _neighbour_pairs(leaf, side, moving):
+    """
+    Every unordered pair (i, j) of nodes in the same or adjacent leaf cells,
+    for the exact near field; pairs of two pinned nodes are left out, as
+    their forces would be thrown away.
+    """
+    n = len(leaf)
+    cell = leaf[:, 0] * side + leaf[:, 1]
+    order = np.argsort(cell, kind="stable")
+    count = np.bincount(cell, minlength=side * side)
+    start = np.concatenate(([0], np.cumsum(count)[:-1]))
+
+    # With nodes sorted by cell, each node pairs with the nodes after it in
+    # its own cell and with every node of four of its neighbour cells,
+    # which covers each adjacent pair once. A partner group is a run of
+    # the sorted order: (first position, length) per node and group.
+    x, y = leaf[order, 0], leaf[order, 1]
+    rank = np.arange(n)
+    firsts, lengths = [rank + 1], [count[cell[order]] - 1 - (rank - start[cell[order]])]
+    for dx, dy in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        bx, by = x + dx, y + dy
+        inside = (bx < side) & (by >= 0) & (by < side)
+        other = np.where(inside, bx * side + by, 0)
+        firsts.append(start[other])
+        lengths.append(np.where(inside, count[other], 0))
+    firsts, lengths = np.concatenate(firsts), np.concatenate(lengths)
+
+    total = int(lengths.sum())
+    i = np.repeat(np.tile(rank, 5), lengths)
+    j = np.repeat(firsts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+    i, j = order[i], order[j]
+    live = moving[i] | moving[j]
+    return i[live], j[live]
+
+
+def _force_layout(nodes, free, edges, old, spacing, iterations):
+    n = len(nodes)
+    rng = np.random.default_rng(0)
+    pos = np.array([(node["position"]["x"], node["position"]["y"]) for node in nodes], dtype=float)
+    moving = np.zeros(n, dtype=bool)
+    moving[free] = True
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    labels = [node["data"].get("label") for node in nodes]
+
+    reused = _initial_positions(pos, moving, edges, old, labels, spacing, rng)
+    k2 = spacing * spacing
+    if reused * 2 >= len(free):
+        # Mostly known positions only need to make room for the new nodes.
+        temperature, iterations = spacing / 4, max(1, iterations // 4)
+    else:
+        temperature = spacing * max(2.0, math.sqrt(len(free)) / 4)
+    cooling = (0.01 / (temperature / spacing)) ** (1 / max(iterations, 1))
+    centre = pos.mean(axis=0)
+
+    for it in range(iterations):
+        if it % REGRID == 0:
+            grid = _Grid(pos, moving)
+        force = grid.repulsion(pos, k2)
+        if len(edges):
+            a, b = edges[:, 0], edges[:, 1]
+            delta = pos[a] - pos[b]
+            pull = delta * (np.sqrt(np.einsum("ij,ij->i", delta, delta)) / spacing)[:, None]
+            for axis in (0, 1):
+                force[:, axis] -= np.bincount(a, weights=pull[:, axis], minlength=n)
+                force[:, axis] += np.bincount(b, weights=pull[:, axis], minlength=n)
+        # Weak gravity keeps unlinked nodes and components from drifting off.
+        force -= (pos - centre) * (spacing / 4 / max(spacing * math.sqrt(n), 1.0))
+
+        step = np.sqrt(np.einsum("ij,ij->i", force, force))
+        scale = np.minimum(step, temperature) / np.maximum(step, 1e-9)
+        pos[moving] += force[moving] * scale[moving, None]
+        temperature *= cooling
+
+    if len(free) == n:
+        pos -= pos.min(axis=0)      # nothing pinned: start the drawing at the origin
+    return [(round(float(x), 1), round(float(y), 1)) for x, y in pos[free]]
@@ -1,3 +1,6 @@
+import re
+from collections import namedtuple
+
 from pyparsing import (
     Word,
     alphas,
@@ -7,7 +10,6 @@ from pyparsing import (
     nums,
     Suppress,
     MatchFirst,
-    ParseException,
 )
 
 # -------------------------------------------------
@@ -66,35 +68,99 @@ token_definitions = [
     ("ID", ID),
 ]
 
+# copy() so the parse actions don't leak into NUMBER / IPV4_ADDRESS as used by
+# the grammar in parser.py (which would then yield ('NUMBER', '100') tuples).
 token_expr = MatchFirst([
-    tok.setParseAction(lambda s, l, t, name=name: (name, t[0]))
+    tok.copy().setParseAction(lambda s, l, t, name=name: (name, t[0]))
     for name, tok in token_definitions
 ])
 
-def tokenize(text):
+# -------------------------------------------------
+# SINGLE-PASS TOKENIZER
+# -------------------------------------------------
+# token_definitions compiled into one master regex. Alternatives are tried
+# in the same order as the MatchFirst above, and anything no token matches
+# is skipped, as scanString() does.
+
+Token = namedtuple("Token", ["type", "value", "line", "column"])
+
+_KEYWORD_NAMES = {name for name, _ in keywords}
+
+
+def _token_regex(tok):
+    """The regex pyparsing itself uses for a Regex or Word token."""
+    regex = tok.pattern if isinstance(tok, Regex) else tok.reString
+    if not regex:
+        raise TypeError(f"No regex for token {tok}")
+    return regex
+
+
+def _keyword_regex():
+    # Keywords never prefix one another once the trailing check applies, so
+    # one group (typed by its value) matches exactly what the individual
+    # Keyword alternatives would, without trying each in turn.
+    kw_chars = "".join(re.escape(c) for c in sorted(keywords[0][1].identChars))
+    alternation = "|".join(re.escape(kw.match) for _, kw in keywords)
+    return rf"(?<![{kw_chars}])(?:{alternation})(?![{kw_chars}])"
+
+
+def _master_pattern():
+    # scanString() matches each token against the whole text, so the "not
+    # preceded by" checks of \b and Keyword see the previous character even
+    # right after another token ("1network" is NUMBER, ID).
+    alternatives = []
+    for name, tok in token_definitions:
+        if name in _KEYWORD_NAMES:
+            if not alternatives or alternatives[-1][0] != "KEYWORD":
+                alternatives.append(("KEYWORD", _keyword_regex()))
+        else:
+            alternatives.append((name, _token_regex(tok)))
+    return re.compile("|".join(f"(?P<{name}>{regex})" for name, regex in alternatives))
+
+
+_PATTERN = _master_pattern()
+_WHITESPACE = re.compile(r"\s*")
+
+
+def iter_tokens(text):
     """
-    Converts raw DSL text into a list of (TOKEN_TYPE, VALUE) pairs,
-    using the token definitions above.
+    Lazily yield Token(type, value, line, column) for raw DSL text in one
+    left-to-right pass; line and column are 1-based.
     """
     pos = 0
-    tokens = []
     length = len(text)
+    line = 1
+    line_start = 0      # offset of the first character of `line`
+    counted = 0         # newlines before this offset are already counted
 
     while pos < length:
         # Skip whitespace
-        while pos < length and text[pos].isspace():
-            pos += 1
+        pos = _WHITESPACE.match(text, pos).end()
         if pos >= length:
             break
 
-        try:
-            match_data = list(token_expr.scanString(text[pos:], maxMatches=1))
-            if not match_data:
-                raise ParseException(f"Unknown token at position {pos}")
-            result, start, end = match_data[0]
-            tokens.append(result[0])  # (TOKEN_TYPE, VALUE)
-            pos += end
-        except ParseException as pe:
-            print(pe)
-            break
-    return tokens
+        m = _PATTERN.match(text, pos)
+        if m is None:
+            m = _PATTERN.search(text, pos + 1)
+            if m is None:
+                break
+
+        start = m.start()
+        newlines = text.count("\n", counted, start)
+        if newlines:
+            line += newlines
+            line_start = text.rindex("\n", counted, start) + 1
+        counted = start
+
+        kind = m.lastgroup
+        value = m.group()
+        yield Token(value.upper() if kind == "KEYWORD" else kind, value, line, start - line_start + 1)
+        pos = m.end()
+
+
+def tokenize(text):
+    """
+    Converts raw DSL text into a list of (TOKEN_TYPE, VALUE) pairs,
+    using the token definitions above.
+    """
+    return [(tok.type, tok.value) for tok in iter_tokens(text)]
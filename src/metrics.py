@@ -0,0 +1,345 @@
+"""
+In-process metrics: stage timers, counters and histograms, rendered in the
+Prometheus text exposition format.
+
+    with stage("parse_xml"):
+        devices, links = read_network(f)
+    ELEMENTS.inc(len(devices), kind="devices")
+
+    REGISTRY.render()       # body of GET /metrics
+
+Every stage() or record() observes the dsl_stage_seconds histogram. While a
+Collection is active in the current context, stages and counts are also
+noted on it: the API uses one per request for the Server-Timing header, and
+converter pool workers use one per job to send the job's timings back with
+its result (replay() adds them to the parent's registry).
+
+Metrics live in the process that records them. With several processes
+(gunicorn workers) each one would serve only its own share, so
+Registry.share(directory) has every process write its metrics to a file of
+its own in a shared directory, at most once per interval and at exit, and
+render() sums the files of all processes, including ones that have exited.
+The directory must be emptied when the server starts (gunicorn.conf.py
+does it), not between worker restarts.
+"""
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds in seconds, for stage and request durations
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        collection = _current.get()
+        if collection is not None:
+            collection.counts.append((self.name, labels, amount))
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def state(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, state):
+        with self._lock:
+            for key, value in state:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def state(self):
+        with self._lock:
+            return [[list(key), list(counts), total, n] for key, (counts, total, n) in self._series.items()]
+
+    def merge(self, state):
+        with self._lock:
+            for key, counts, total, n in state:
+                series = self._series.get(tuple(key))
+                if series is None:
+                    series = self._series[tuple(key)] = [[0] * len(self.buckets), 0.0, 0]
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += n
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._series.items())
+        for key, (counts, total, n) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {n}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {n}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.directory = None       # shared with other processes when set
+        self.interval = 1.0
+        self._synced = 0.0
+        self._exit_hook = None      # pid the atexit sync was registered in
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=TIME_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def reset(self):
+        """Drop all recorded values, e.g. those a forked worker inherited."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    # ─── Sharing between processes ────────────────────────────────────────
+
+    def share(self, directory, interval=1.0):
+        """Merge with the other processes writing to `directory` on render()."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def sync(self, force=False):
+        """Write this process's metrics to the shared directory, if it is due."""
+        if self.directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._synced < self.interval:
+            return
+        self._synced = now
+        pid = os.getpid()
+        if self._exit_hook != pid:
+            self._exit_hook = pid
+            atexit.register(self._sync_at_exit, pid)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        data = {
+            metric.name: {
+                "kind": metric.kind,
+                "help": metric.help,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "state": metric.state(),
+            }
+            for metric in metrics
+        }
+        path = self._path(pid)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except OSError:
+            # Metrics must not fail the request that happened to sync them
+            self._synced = 0.0
+
+    def _sync_at_exit(self, pid):
+        # A child forked after the hook was registered inherits it, and the
+        # parent's values with it: only the registering process writes.
+        if os.getpid() == pid:
+            self.sync(force=True)
+
+    def _merged(self):
+        merged = Registry()
+        for entry in sorted(os.listdir(self.directory)):
+            if not (entry.startswith("metrics-") and entry.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, entry)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue    # removed or replaced while listing
+            for name, item in data.items():
+                if item["kind"] == "histogram":
+                    metric = merged.histogram(name, item["help"], item["labelnames"], item["buckets"])
+                else:
+                    metric = merged.counter(name, item["help"], item["labelnames"])
+                metric.merge(item["state"])
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        if self.directory is not None:
+            self.sync(force=True)
+            return self._merged()._render()
+        return self._render()
+
+    def _render(self):
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        for name, metric in metrics:
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "dsl_stage_seconds", "Time spent in each processing stage", ["stage"])
+BYTES = REGISTRY.counter(
+    "dsl_bytes_total", "Bytes read or produced, by stage", ["stage"])
+ELEMENTS = REGISTRY.counter(
+    "dsl_elements_total", "Topology elements produced (devices, links, nodes, edges)", ["kind"])
+
+
+# ─── Per-request / per-job collection ─────────────────────────────────────────
+
+_current = contextvars.ContextVar("metrics_collection", default=None)
+
+
+class Collection:
+    """Stages and counts recorded in the current context while active."""
+
+    def __init__(self):
+        self.stages = []    # [(stage, seconds)]
+        self.counts = []    # [(counter name, labels, amount)]
+        self._token = None
+
+    def activate(self):
+        self._token = _current.set(self)
+        return self
+
+    def deactivate(self):
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, *exc):
+        self.deactivate()
+
+    def export(self):
+        """Picklable form for replay() in another process."""
+        return {"stages": list(self.stages), "counts": list(self.counts)}
+
+    def server_timing(self, total=None):
+        """Server-Timing header value; repeated stages are summed."""
+        durations = {}
+        for name, seconds in self.stages:
+            durations[name] = durations.get(name, 0.0) + seconds
+        if total is not None:
+            durations["total"] = total
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
+
+
+def record(name, seconds):
+    """Observe `seconds` for stage `name`."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    collection = _current.get()
+    if collection is not None:
+        collection.stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def replay(exported, registry=REGISTRY):
+    """Add a Collection.export() from another process to this one's metrics."""
+    if not exported:
+        return
+    for name, seconds in exported["stages"]:
+        record(name, seconds)
+    for name, labels, amount in exported["counts"]:
+        counter = registry.get(name)
+        if counter is not None:
+            counter.inc(amount, **labels)
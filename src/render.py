@@ -0,0 +1,68 @@
+"""
+Graphviz rendering of topology DOT sources.
+
+DOT goes to `dot` on stdin and the image comes back on stdout, so nothing
+touches the filesystem and concurrent renders cannot collide. A semaphore
+bounds how many `dot` processes run at once, and each one is killed if it
+outlives the timeout.
+"""
+import shutil
+import threading
+import subprocess
+
+# Bump when the DOT produced for a topology or the render options change,
+# so cached images are not reused.
+RENDER_VERSION = "2"
+
+FORMATS = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+}
+
+
+class RenderError(Exception):
+    """Graphviz failed or is not installed."""
+
+
+class RenderBusy(RenderError):
+    """Every render slot stayed taken for the whole wait."""
+
+
+class RenderTimeout(RenderError):
+    """`dot` ran past the timeout and was killed."""
+
+
+class Renderer:
+    def __init__(self, max_workers=2, timeout=20, queue_timeout=5, dot_binary="dot"):
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.dot_binary = dot_binary
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def available(self):
+        return shutil.which(self.dot_binary) is not None
+
+    def render(self, dot_source, fmt):
+        """Render DOT source to `fmt` ('svg' or 'png'); returns the image bytes."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format {fmt!r}")
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise RenderBusy(f"No render slot became free within {self.queue_timeout}s")
+        try:
+            result = subprocess.run(
+                [self.dot_binary, f"-T{fmt}"],
+                input=dot_source.encode("utf-8"),
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                timeout=self.timeout, check=False,
+            )
+        except subprocess.TimeoutExpired:
+            raise RenderTimeout(f"Rendering exceeded {self.timeout}s")
+        except OSError as e:
+            raise RenderError(f"Could not run {self.dot_binary!r}: {e}")
+        finally:
+            self._slots.release()
+
+        if result.returncode != 0:
+            raise RenderError(result.stderr.decode("utf-8", "replace").strip()
+                              or f"dot exited with {result.returncode}")
+        return result.stdout
@@ -0,0 +1,318 @@
+"""
+Compact binary snapshots of a decoded topology.
+
+A snapshot stores the (devices, links) model that src/decode.py builds, so
+later analysis, rendering and compile runs can skip the XML (or .pkt) and
+the DSL entirely. Every record has a fixed width and every string lives
+once in a shared string table, so a reader can mmap the file and pull
+single records or columns straight out of the mapping without parsing
+anything else. Little-endian throughout:
+
+    header    magic "PTSN", format version, section counts, CRC-32 of the body
+    devices   DEVICE records: x, y, id, save_ref_id, name, dsl_type, ip,
+              gateway, first port, port count, power
+    ports     PORT records: bandwidth in Mbps, ip, mask, DHCP flag, in
+              device order
+    links     LINK records: from_ref, from_port, to_ref, to_port, speed
+    offsets   n_strings + 1 uint32 offsets into the blob
+    blob      the UTF-8 strings, back to back
+
+String fields hold indexes into the string table. A reader refuses files
+with another magic or format version; rebuild them from the source file.
+
+    python3 src/snapshot.py build lab.xml lab.ptsnap     # also .pkt/.pka
+    python3 src/snapshot.py info lab.ptsnap
+    python3 src/snapshot.py dsl lab.ptsnap
+    python3 src/snapshot.py flow lab.ptsnap
+"""
+import os
+import sys
+import json
+import mmap
+import zlib
+import struct
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:     # only Snapshot.array() needs it
+    np = None
+
+MAGIC = b"PTSN"
+# Bump on any change to the layout below; old snapshots are then rejected.
+SNAPSHOT_VERSION = 2
+
+HEADER = struct.Struct("<4sHH5II")      # magic, version, reserved, 5 counts/sizes, crc32
+DEVICE = struct.Struct("<2d8IB3x")
+PORT = struct.Struct("<i2IB3x")
+LINK = struct.Struct("<5I")
+OFFSET = struct.Struct("<I")
+
+# numpy views of the same records (Snapshot.array)
+_DTYPES = {
+    "devices": [("x", "<f8"), ("y", "<f8"), ("id", "<u4"), ("save_ref_id", "<u4"), ("name", "<u4"),
+                ("dsl_type", "<u4"), ("ip", "<u4"), ("gateway", "<u4"), ("first_port", "<u4"),
+                ("port_count", "<u4"), ("power_on", "u1"), ("_pad", "V3")],
+    "ports": [("bandwidth_mbps", "<i4"), ("ip", "<u4"), ("mask", "<u4"), ("dhcp", "u1"), ("_pad", "V3")],
+    "links": [("from_ref", "<u4"), ("from_port", "<u4"), ("to_ref", "<u4"), ("to_port", "<u4"),
+              ("speed", "<u4")],
+}
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot, is truncated, or has another format version."""
+
+
+# ─── Writing ──────────────────────────────────────────────────────────────────
+
+class _Strings:
+    def __init__(self):
+        self.index = {}
+        self.data = []
+
+    def __call__(self, s):
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.data)
+            self.data.append(s.encode("utf-8"))
+        return i
+
+
+def dumps(devices, links):
+    """Serialize the (devices, links) model of src/decode.py to snapshot bytes."""
+    intern = _Strings()
+    dev_part, port_part, link_part = [], [], []
+    n_ports = 0
+
+    for dev in devices.values():
+        ports = dev["ports"]
+        dev_part.append(DEVICE.pack(
+            dev["x_coord"], dev["y_coord"], dev["id"],
+            intern(dev["save_ref_id"]), intern(dev["name"]), intern(dev["dsl_type"]),
+            intern(dev["ip_address"]), intern(dev["gateway"]), n_ports, len(ports), dev["power_on"]))
+        for port in ports.values():
+            port_part.append(PORT.pack(port["bandwidth_mbps"], intern(port["ip"]), intern(port["mask"]),
+                                       port["dhcp"]))
+        n_ports += len(ports)
+
+    for link in links:
+        link_part.append(LINK.pack(
+            intern(link["from_ref"]), intern(link["from_port"]),
+            intern(link["to_ref"]), intern(link["to_port"]), link["speed"]))
+
+    offsets, pos = [], 0
+    for s in intern.data:
+        offsets.append(pos)
+        pos += len(s)
+    offsets.append(pos)
+
+    body = b"".join([
+        *dev_part, *port_part, *link_part,
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        *intern.data,
+    ])
+    header = HEADER.pack(MAGIC, SNAPSHOT_VERSION, 0, len(dev_part), n_ports, len(link_part),
+                         len(intern.data), pos, zlib.crc32(body))
+    return header + body
+
+
+def write_snapshot(devices, links, path):
+    """Write a snapshot file atomically: readers never see a partial one."""
+    data = dumps(devices, links)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+# ─── Reading ──────────────────────────────────────────────────────────────────
+
+class Snapshot:
+    """
+    Read access to snapshot bytes (any buffer) or, through open(), to a
+    memory-mapped file. Records are unpacked on access and strings decoded
+    once on first use, so looking at part of a big network costs only that
+    part. verify=True also checks the body CRC, which reads every page.
+    """
+
+    def __init__(self, buffer, verify=False):
+        self._buf = memoryview(buffer)
+        self._mmap = None
+        try:
+            self._read_header(verify)
+        except BaseException:
+            self._buf.release()     # or an mmap behind it could not be closed
+            raise
+        self._strings = [None] * self.string_count
+
+    def _read_header(self, verify):
+        if len(self._buf) < HEADER.size:
+            raise SnapshotError("File too short for a snapshot header")
+        (magic, version, _, self.device_count, self.port_count, self.link_count,
+         self.string_count, blob_size, crc) = HEADER.unpack_from(self._buf)
+        if magic != MAGIC:
+            raise SnapshotError("Not a topology snapshot (bad magic)")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot format version {version}, expected {SNAPSHOT_VERSION}")
+
+        self._devices_at = HEADER.size
+        self._ports_at = self._devices_at + self.device_count * DEVICE.size
+        self._links_at = self._ports_at + self.port_count * PORT.size
+        self._offsets_at = self._links_at + self.link_count * LINK.size
+        self._blob_at = self._offsets_at + (self.string_count + 1) * OFFSET.size
+        if len(self._buf) != self._blob_at + blob_size:
+            raise SnapshotError(f"Snapshot is {len(self._buf)} bytes, header says {self._blob_at + blob_size}")
+        if verify and zlib.crc32(self._buf[HEADER.size:]) != crc:
+            raise SnapshotError("Snapshot checksum mismatch")
+
+    @classmethod
+    def open(cls, path, verify=False):
+        with open(path, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:      # empty file: mmap refuses zero length
+                raise SnapshotError("File too short for a snapshot header")
+        try:
+            snap = cls(mapped, verify=verify)
+        except BaseException:
+            mapped.close()
+            raise
+        snap._mmap = mapped
+        return snap
+
+    def close(self):
+        self._buf.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, i):
+        s = self._strings[i]
+        if s is None:
+            start, end = struct.unpack_from("<2I", self._buf, self._offsets_at + i * OFFSET.size)
+            s = self._strings[i] = str(self._buf[self._blob_at + start:self._blob_at + end], "utf-8")
+        return s
+
+    def device(self, i):
+        """Device record i in the decode.py dict form."""
+        x, y, dev_id, ref, name, dsl_type, ip, gateway, first, count, power = DEVICE.unpack_from(
+            self._buf, self._devices_at + i * DEVICE.size)
+        ports_at = self._ports_at + first * PORT.size
+        ports = {n: {"bandwidth_mbps": bw, "ip": self.string(port_ip), "mask": self.string(mask), "dhcp": bool(dhcp)}
+                 for n, (bw, port_ip, mask, dhcp)
+                 in enumerate(PORT.iter_unpack(self._buf[ports_at:ports_at + count * PORT.size]))}
+        return {
+            "save_ref_id": self.string(ref),
+            "name": self.string(name),
+            "dsl_type": self.string(dsl_type),
+            "x_coord": x,
+            "y_coord": y,
+            "power_on": bool(power),
+            "ports": ports,
+            "ip_address": self.string(ip),
+            "gateway": self.string(gateway),
+            "id": dev_id,
+        }
+
+    def link(self, i):
+        from_ref, from_port, to_ref, to_port, speed = LINK.unpack_from(
+            self._buf, self._links_at + i * LINK.size)
+        return {
+            "from_ref": self.string(from_ref),
+            "from_port": self.string(from_port),
+            "to_ref": self.string(to_ref),
+            "to_port": self.string(to_port),
+            "speed": speed,
+        }
+
+    def network(self):
+        """The whole model as (devices, links), ready for build_dsl/build_react_flow."""
+        devices = {}
+        for i in range(self.device_count):
+            dev = self.device(i)
+            devices[dev["save_ref_id"]] = dev
+        return devices, [self.link(i) for i in range(self.link_count)]
+
+    def array(self, section):
+        """
+        Zero-copy numpy structured array over 'devices', 'ports' or 'links'
+        (string fields are table indexes; see string()). Needs numpy, and the
+        arrays must be dropped before close().
+        """
+        if np is None:
+            raise RuntimeError("Snapshot.array() needs numpy")
+        start, count = {
+            "devices": (self._devices_at, self.device_count),
+            "ports": (self._ports_at, self.port_count),
+            "links": (self._links_at, self.link_count),
+        }[section]
+        return np.frombuffer(self._buf, dtype=np.dtype(_DTYPES[section]), count=count, offset=start)
+
+
+def load_snapshot(path, verify=False):
+    """Read a snapshot file into (devices, links)."""
+    with Snapshot.open(path, verify=verify) as snap:
+        return snap.network()
+
+
+if __name__ == "__main__":
+    try:
+        from src.decode import StreamingDecoder, read_network, build_dsl, build_react_flow, DecodeError
+        from src.pkt import iter_xml
+    except ImportError:
+        from decode import StreamingDecoder, read_network, build_dsl, build_react_flow, DecodeError
+        from pkt import iter_xml
+
+    usage = ("Usage: python snapshot.py build <input.xml|.pkt|.pka> <output.ptsnap>\n"
+             "       python snapshot.py info|dsl|flow <snapshot>")
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "info", "dsl", "flow"):
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+    command, path = sys.argv[1], sys.argv[2]
+
+    try:
+        if command == "build":
+            if len(sys.argv) < 4:
+                print(usage, file=sys.stderr)
+                sys.exit(1)
+            if path.lower().endswith((".pkt", ".pka")):
+                decoder = StreamingDecoder(path)
+                with open(path, "rb") as f:
+                    for chunk in iter_xml(f.read()):
+                        decoder.feed(chunk)
+                devices, links = decoder.close()
+            else:
+                devices, links = read_network(path)
+            write_snapshot(devices, links, sys.argv[3])
+            print(f"{sys.argv[3]}: {len(devices)} devices, {len(links)} links, "
+                  f"{os.path.getsize(sys.argv[3])} bytes")
+        elif command == "info":
+            with Snapshot.open(path, verify=True) as snap:
+                print(json.dumps({
+                    "version": SNAPSHOT_VERSION,
+                    "devices": snap.device_count,
+                    "ports": snap.port_count,
+                    "links": snap.link_count,
+                    "strings": snap.string_count,
+                    "bytes": os.path.getsize(path),
+                }))
+        else:
+            devices, links = load_snapshot(path)
+            if command == "dsl":
+                print(build_dsl(devices, links))
+            else:
+                print(json.dumps(build_react_flow(devices, links)))
+    except (DecodeError, ValueError, OSError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
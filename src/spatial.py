@@ -0,0 +1,172 @@
+"""
+Viewport queries over a React Flow graph.
+
+A ViewportIndex buckets the nodes of one graph into a uniform grid over
+their `position`, so a bounding-box query only looks at the cells it
+overlaps instead of every node. Zoomed in, a query returns the nodes in
+the box and the edges incident to them. Zoomed out, nodes are merged
+per grid cell into cluster nodes (cells double in size for every halving
+of the zoom), and edges are merged into one edge per pair of clusters
+with a count, so the browser draws a few hundred elements instead of
+tens of thousands.
+
+    index = ViewportIndex(react_flow)
+    view = index.query(0, 0, 4000, 3000, zoom=0.2)
+"""
+import math
+from collections import Counter
+
+# Grid cell size in flow coordinates at full detail
+CELL = 256.0
+# Below this zoom level nodes are clustered
+CLUSTER_ZOOM = 0.5
+
+
+def cluster_level(zoom):
+    """0 for full detail, else n where cells are CELL * 2**n wide."""
+    if zoom >= CLUSTER_ZOOM:
+        return 0
+    return max(1, math.ceil(math.log2(CLUSTER_ZOOM / max(zoom, 1e-6))))
+
+
+class ViewportIndex:
+    def __init__(self, flow, cell=CELL):
+        self.cell = cell
+        self.nodes = flow.get("nodes", [])
+        self.edges = flow.get("edges", [])
+        self.xy = [(float(n.get("position", {}).get("x", 0)), float(n.get("position", {}).get("y", 0)))
+                   for n in self.nodes]
+
+        index = {node["id"]: i for i, node in enumerate(self.nodes)}
+        self.ends = []
+        self.incident = [[] for _ in self.nodes]
+        for e, edge in enumerate(self.edges):
+            a, b = index.get(edge.get("source")), index.get(edge.get("target"))
+            self.ends.append((a, b))
+            for end in {a, b}:
+                if end is not None:
+                    self.incident[end].append(e)
+        # level -> (cell size, {(cx, cy): [node indexes]}, [cell of each node])
+        self._levels = {}
+
+    def _grid(self, level):
+        grid = self._levels.get(level)
+        if grid is None:
+            size = self.cell * 2 ** level
+            cells, cell_of = {}, []
+            for i, (x, y) in enumerate(self.xy):
+                key = (math.floor(x / size), math.floor(y / size))
+                cells.setdefault(key, []).append(i)
+                cell_of.append(key)
+            # Built whole before it is published, so concurrent queries
+            # at worst build the same level twice.
+            grid = self._levels[level] = (size, cells, cell_of)
+        return grid
+
+    def _cells_in(self, cells, size, x0, y0, x1, y1):
+        cx0, cy0 = math.floor(x0 / size), math.floor(y0 / size)
+        cx1, cy1 = math.floor(x1 / size), math.floor(y1 / size)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            # The box covers more cells than are occupied: filter those instead.
+            return [k for k in cells if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1]
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1) if (cx, cy) in cells]
+
+    def query(self, x0, y0, x1, y1, zoom=1.0, limit=None):
+        """
+        Elements for the box (x0, y0)-(x1, y1) at `zoom`: {"nodes", "edges",
+        "endpoints", "level", "total"}. `endpoints` are the elements outside
+        the box at the far end of a returned edge, so every edge can be drawn.
+        With `limit`, views of more elements than that are clustered one
+        level further until they fit.
+        """
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        level = cluster_level(zoom)
+        while True:
+            size, cells, cell_of = self._grid(level)
+            keys = self._cells_in(cells, size, x0, y0, x1, y1)
+            if level == 0:
+                view = self._detail(cells, keys, x0, y0, x1, y1)
+            else:
+                view = self._clustered(level, cells, cell_of, keys)
+            count = len(view["nodes"]) + len(view["edges"]) + len(view["endpoints"])
+            if limit is None or count <= limit or len(keys) <= 1:
+                break
+            level += 1
+        view["level"] = level
+        view["total"] = {"nodes": len(self.nodes), "edges": len(self.edges)}
+        return view
+
+    def _detail(self, cells, keys, x0, y0, x1, y1):
+        inside = []
+        for key in keys:
+            for i in cells[key]:
+                x, y = self.xy[i]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    inside.append(i)
+        inside.sort()
+        visible = set(inside)
+
+        edge_ids = sorted({e for i in inside for e in self.incident[i]})
+        outside = sorted({end for e in edge_ids for end in self.ends[e]
+                          if end is not None and end not in visible})
+        return {
+            "nodes": [self.nodes[i] for i in inside],
+            "edges": [self.edges[e] for e in edge_ids],
+            "endpoints": [self.nodes[i] for i in outside],
+        }
+
+    def _group(self, level, cells, key):
+        """A cell as one element: its node when alone, else a cluster node."""
+        members = cells[key]
+        if len(members) == 1:
+            return self.nodes[members[0]]
+        types = Counter(self.nodes[i].get("data", {}).get("type", "unknown") for i in members)
+        return {
+            "id": _cluster_id(level, key),
+            "type": "cluster",
+            "data": {"label": f"{len(members)} devices", "count": len(members), "types": dict(types)},
+            "position": {
+                "x": round(sum(self.xy[i][0] for i in members) / len(members), 1),
+                "y": round(sum(self.xy[i][1] for i in members) / len(members), 1),
+            },
+        }
+
+    def _clustered(self, level, cells, cell_of, keys):
+        def element_id(i):
+            key = cell_of[i]
+            return self.nodes[i]["id"] if len(cells[key]) == 1 else _cluster_id(level, key)
+
+        visible = set(keys)
+        links, far = Counter(), set()
+        for key in keys:
+            for i in cells[key]:
+                for e in self.incident[i]:
+                    a, b = self.ends[e]
+                    if a is None or b is None or cell_of[a] == cell_of[b]:
+                        continue
+                    # Each edge once: from its first end that is visible
+                    if i != a and cell_of[a] in visible:
+                        continue
+                    other = cell_of[b if i == a else a]
+                    if other not in visible:
+                        far.add(other)
+                    ends = sorted((element_id(a), element_id(b)))
+                    links[tuple(ends)] += 1
+
+        edges = [{
+            "id": f"ce-{source}-{target}",
+            "source": source,
+            "target": target,
+            "type": "straight",
+            "data": {"count": count},
+        } for (source, target), count in sorted(links.items())]
+        return {
+            "nodes": [self._group(level, cells, key) for key in sorted(keys)],
+            "edges": edges,
+            "endpoints": [self._group(level, cells, key) for key in sorted(far)],
+        }
+
+
+def _cluster_id(level, key):
+    return f"cluster-{level}-{key[0]}-{key[1]}"
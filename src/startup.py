@@ -0,0 +1,29 @@
+"""
+Per-phase timing of application startup.
+
+    startup = StartupTimer()
+    ...imports...
+    startup.mark("imports")
+    ...
+    print(startup.report())     # Startup: imports 412 ms, schema 30 ms, total 442 ms
+"""
+import time
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.phases = []        # [(name, seconds)] in order
+
+    def mark(self, phase):
+        """Record the time since the previous mark (or creation) as `phase`."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self):
+        parts = [f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases]
+        return f"Startup: {', '.join(parts)}, total {self.total() * 1000:.0f} ms"
@@ -0,0 +1,352 @@
+"""
+Pre-warmed pool of converter worker processes.
+
+Each worker imports the decode/compile converters once when it starts and
+then serves jobs over a pipe, so a request no longer pays for a fresh
+interpreter, temp files and a stdout JSON round-trip. Workers that crash,
+hang past the job timeout or exceed their memory limit are killed and
+replaced.
+"""
+import io
+import os
+import time
+import queue
+import atexit
+import threading
+import multiprocessing
+
+from src.metrics import Collection, replay
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class PoolError(Exception):
+    """The pool could not run the job (worker crashed, pool unavailable)."""
+
+
+class WorkerCrashed(PoolError):
+    """The worker died before returning a result."""
+
+
+class JobTimeout(PoolError):
+    """The job did not finish (or start) within the timeout."""
+
+
+class WorkerError(Exception):
+    """The converter itself raised an error while running the job."""
+
+
+# Jobs whose input is streamed over the pipe (see ConverterPool.run_stream)
+STREAMED_JOBS = ("decode_stream",)
+
+
+# ─── Worker side ──────────────────────────────────────────────────────────────
+
+def _load_jobs():
+    """Import the converters once so every job runs against warm modules."""
+    from src.decode import generate_dsl_and_react_flow, generate_from_pkt, decode_chunks
+    from src.compile import parse_dsl_to_react_flow
+    from pka2xml.graph import load_topology, to_dot
+
+    def decode(xml_bytes):
+        dsl, react_flow = generate_dsl_and_react_flow(io.BytesIO(xml_bytes))
+        return {"dsl": dsl, "react_flow": react_flow}
+
+    def decode_stream(chunks):
+        # Fed to the parser as the chunks arrive, so the document is never held in memory.
+        dsl, react_flow = decode_chunks(chunks)
+        return {"dsl": dsl, "react_flow": react_flow}
+
+    def decode_pkt(pkt_bytes):
+        dsl, react_flow = generate_from_pkt(pkt_bytes)
+        return {"dsl": dsl, "react_flow": react_flow}
+
+    def compile_dsl(dsl_text):
+        return parse_dsl_to_react_flow(dsl_text)
+
+    def dot(xml_bytes):
+        return to_dot(load_topology(xml_bytes))
+
+    return {"decode": decode, "decode_stream": decode_stream, "decode_pkt": decode_pkt,
+            "compile": compile_dsl, "dot": dot}
+
+
+class _Cancelled(Exception):
+    """The parent dropped a streamed job before its input ended."""
+
+
+def _recv_chunks(conn):
+    """A streamed job's input: chunks up to the b"" that ends it; None cancels the job."""
+    while True:
+        chunk = conn.recv()
+        if chunk is None:
+            raise _Cancelled()
+        if not chunk:
+            return
+        yield chunk
+
+
+def _worker_main(conn, memory_limit):
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    jobs = _load_jobs()
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if msg is None:
+            break
+
+        kind, args = msg
+        chunks = _recv_chunks(conn) if kind in STREAMED_JOBS else None
+        if chunks is not None:
+            args = (chunks,) + tuple(args)
+        # The job's stage timings go back with its result, for the parent's /metrics.
+        with Collection() as collected:
+            try:
+                reply = ("ok", jobs[kind](*args))
+            except _Cancelled:
+                reply = ("cancelled", None)
+            except MemoryError:
+                reply = ("error", "MemoryError: converter exceeded the worker memory limit")
+            except Exception as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+        if chunks is not None:
+            # A job that failed part-way still reads the rest of its input,
+            # so the next message on the pipe is the next job.
+            try:
+                for _ in chunks:
+                    pass
+            except _Cancelled:
+                reply = ("cancelled", None)
+        conn.send(reply + (collected.export(),))
+
+
+# ─── Pool side ────────────────────────────────────────────────────────────────
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def kill(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+
+
+class ConverterPool:
+    """
+    Fixed-size pool of converter processes shared by the request threads of
+    one server process. Call start() in each server process before it runs
+    request threads (gunicorn.conf.py does so in post_fork): forking while
+    other threads hold locks (logging, the SQLAlchemy pool) can leave the
+    child deadlocked. run() still starts the pool on first use, so a pool
+    created at import time in a preforking server belongs to the worker
+    that uses it, not to the master.
+    """
+
+    def __init__(self, size=None, timeout=30, memory_limit_mb=None):
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        self._lock = threading.Lock()
+        self._idle = None
+        self._pid = None
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.memory_limit), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def start(self):
+        with self._lock:
+            # A pool inherited across fork() has no usable workers; start afresh.
+            if self._idle is not None and self._pid == os.getpid():
+                return
+            try:
+                workers = [self._spawn() for _ in range(self.size)]
+            except OSError as e:
+                raise PoolError(f"Could not start converter workers: {e}") from e
+            self._idle = queue.Queue()
+            for w in workers:
+                self._idle.put(w)
+            self._pid = os.getpid()
+
+    def shutdown(self):
+        with self._lock:
+            if self._idle is None or self._pid != os.getpid():
+                return
+            while True:
+                try:
+                    w = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    w.conn.send(None)
+                except OSError:
+                    pass
+                w.kill()
+            self._idle = None
+
+    def _checkout(self, timeout):
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise JobTimeout(f"No converter worker became free within {timeout}s")
+        if not worker.process.is_alive():
+            worker.kill()
+            try:
+                worker = self._spawn()
+            except OSError as e:
+                # Keep the slot: the next checkout tries to replace it again.
+                self._idle.put(worker)
+                raise PoolError(f"Could not restart a converter worker: {e}") from e
+        return worker
+
+    def run(self, kind, *args, timeout=None):
+        """
+        Run job `kind` ('decode', 'decode_pkt', 'compile' or 'dot') with args in a worker and
+        return its result. Raises WorkerError for converter failures,
+        JobTimeout and WorkerCrashed for pool failures.
+        """
+        self.start()
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._checkout(timeout)
+
+        healthy = False
+        try:
+            worker.conn.send((kind, args))
+            if not worker.conn.poll(timeout):
+                raise JobTimeout(f"Conversion exceeded {timeout}s")
+            status, value, collected = worker.conn.recv()
+            healthy = True
+        except (EOFError, OSError) as e:
+            raise WorkerCrashed(f"Converter worker exited unexpectedly: {e!r}") from e
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                # Hung or dead: kill it and put a fresh worker in its place.
+                # If that fails, the dead one goes back and _checkout replaces
+                # it later, so neither the slot nor the job's error is lost.
+                worker.kill()
+                try:
+                    worker = self._spawn()
+                except OSError:
+                    pass
+                self._idle.put(worker)
+
+        replay(collected)
+        if status == "error":
+            raise WorkerError(value)
+        return value
+
+    def run_stream(self, kind, chunks, finish=None, timeout=None):
+        """
+        Run streamed job `kind` ('decode_stream') on an iterable of byte
+        chunks, each sent to the worker over its pipe as soon as it is
+        produced, so neither side holds the whole input. Once every chunk is
+        sent, finish() (if given) decides whether the worker completes the
+        job; if it returns False the job is dropped and None returned.
+
+        The timeout covers the whole job, reading `chunks` included: a slow
+        source cannot hold a worker longer than a slow conversion could.
+        Errors raised by `chunks` or finish() cancel the job and propagate.
+        """
+        self.start()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        worker = self._checkout(timeout)
+
+        # Sends block while the worker is busy, and reading `chunks` may
+        # block too: past the deadline, killing the worker unblocks both.
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            worker.process.kill()
+
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()), expire)
+        timer.daemon = True
+        timer.start()
+
+        healthy, failure, proceed = False, None, False
+        try:
+            worker.conn.send((kind, ()))
+            chunks = iter(chunks)
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    failure = e
+                    break
+                if chunk:
+                    worker.conn.send(chunk)
+            if failure is None:
+                try:
+                    proceed = finish is None or finish()
+                except Exception as e:
+                    failure = e
+            worker.conn.send(b"" if proceed else None)
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                raise JobTimeout(f"Conversion exceeded {timeout}s")
+            status, value, collected = worker.conn.recv()
+            healthy = True
+        except (EOFError, OSError) as e:
+            if expired.is_set():
+                raise JobTimeout(f"Conversion exceeded {timeout}s") from e
+            raise WorkerCrashed(f"Converter worker exited unexpectedly: {e!r}") from e
+        finally:
+            timer.cancel()
+            if healthy and not expired.is_set():
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                try:
+                    worker = self._spawn()
+                except OSError:
+                    pass
+                self._idle.put(worker)
+
+        replay(collected)
+        if failure is not None:
+            raise failure
+        if not proceed:
+            return None
+        if status == "error":
+            raise WorkerError(value)
+        return value
+
+
+def _shutdown_pools():
+    for pool in list(_pools):
+        pool.shutdown()
+
+
+_pools = []
+atexit.register(_shutdown_pools)
+
+
+def create_pool(**kwargs):
+    """Create a ConverterPool that is shut down at interpreter exit."""
+    pool = ConverterPool(**kwargs)
+    _pools.append(pool)
+    return pool
@@ -0,0 +1,495 @@
+"""
+Write an edited DSL back into the Packet Tracer XML it was decoded from.
+
+Regenerating PT XML from the DSL loses everything the DSL does not model
+(modules, configs, MAC addresses, scenario data, ...). Instead, the
+original file is indexed once: a streaming expat pass records the byte
+range of every NETWORK/DEVICES/DEVICE and NETWORK/LINKS/LINK element
+together with the model src/decode.py extracts from it. Writing back then
+compares that model with the edited DSL and only re-serializes the regions
+that differ; every other byte range is copied from the original verbatim.
+
+    index = build_index(xml_bytes)          # reusable for later edits
+    for chunk in iter_write_back(xml_bytes, index, dsl_text):
+        out.write(chunk)
+
+Supported edits: coordinates, power, the interface ip and bandwidth of an
+existing device, removing devices (with their links), and adding or
+removing links between existing devices (a new LINK is a copy of an
+existing one with its ends replaced). Everything the XML cannot express
+from the DSL alone (new devices, type changes) is left unchanged and
+reported in the result's warnings.
+
+    python3 src/writeback.py original.xml edited.dsl [output.xml]
+"""
+import sys
+import xml.parsers.expat
+import xml.etree.ElementTree as ET
+from collections import Counter
+from xml.sax.saxutils import escape
+
+try:
+    from src.decode import _NetworkTarget, _device_from_element, _link_from_element, build_dsl, DecodeError
+    from src.lalr import parse, DSLSyntaxError, Device, Link, Coordinates, Power, Interface
+    from src.compile import split_blocks
+except ImportError:
+    from decode import _NetworkTarget, _device_from_element, _link_from_element, build_dsl, DecodeError
+    from lalr import parse, DSLSyntaxError, Device, Link, Coordinates, Power, Interface
+    from compile import split_blocks
+
+# Bump whenever the index layout or the way edits are applied changes.
+WRITEBACK_VERSION = "1"
+
+CHUNK = 1024 * 1024
+
+
+class WritebackError(ValueError):
+    """The original file cannot be indexed or the DSL cannot be applied to it."""
+
+
+# ─── Index ────────────────────────────────────────────────────────────────────
+
+class Region:
+    """Byte range [start, end) of one DEVICE or LINK element and its decoded model (or None)."""
+    __slots__ = ("start", "end", "model")
+
+    def __init__(self, start, end, model):
+        self.start = start
+        self.end = end
+        self.model = model
+
+
+class WritebackIndex:
+    """
+    Where the DEVICE and LINK elements of one file are, in document order.
+    `devices_close` and `links_close` are the offsets of the </DEVICES> and
+    </LINKS> tags (None when the section is missing or an empty element).
+    `blocks` maps the DSL block decode.py writes for each element to what
+    it describes: [("device", name) or ("link", (from, port, to, port))].
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.devices = []
+        self.links = []
+        self.devices_close = None
+        self.links_close = None
+        self.blocks = {}
+
+
+def _element_end(data, start, end_event):
+    """End offset of an element from the byte index expat reported for its end."""
+    if data[end_event:end_event + 2] == b"</":
+        return data.index(b">", end_event) + 1
+    return data.index(b"/>", start) + 2     # <TAG/>: expat reports the end after it
+
+
+class _IndexTarget(_NetworkTarget):
+    """_NetworkTarget that also notes where each subtree starts and ends."""
+
+    def __init__(self, parser, data, index):
+        super().__init__(self._device, self._link)
+        self._parser = parser
+        self._data = data
+        self._index = index
+        self._start = None
+        self._end_event = None
+
+    def start(self, tag, attrib):
+        building = self._builder is not None
+        super().start(tag, attrib)
+        if not building and self._builder is not None:
+            self._start = self._parser.CurrentByteIndex
+
+    def end(self, tag):
+        if self._builder is None:
+            path = self._path
+            if len(path) == 3 and path[1] == "NETWORK" and tag in ("DEVICES", "LINKS"):
+                pos = self._parser.CurrentByteIndex
+                if self._data[pos:pos + 2] == b"</":
+                    setattr(self._index, f"{tag.lower()}_close", pos)
+        elif self._depth == 1:
+            self._end_event = self._parser.CurrentByteIndex
+        super().end(tag)
+
+    def _region(self, model):
+        return Region(self._start, _element_end(self._data, self._start, self._end_event), model)
+
+    def _device(self, elem):
+        self._index.devices.append(self._region(_device_from_element(elem)))
+
+    def _link(self, elem):
+        self._index.links.append(self._region(_link_from_element(elem)))
+
+
+def build_index(data):
+    """
+    Index PT XML held in a bytes-like object supporting find() (bytes,
+    mmap). One streaming pass; no tree of the whole document is built.
+    """
+    index = WritebackIndex(len(data))
+    parser = xml.parsers.expat.ParserCreate()
+    target = _IndexTarget(parser, data, index)
+    parser.buffer_text = True
+    parser.StartElementHandler = target.start
+    parser.EndElementHandler = target.end
+    parser.CharacterDataHandler = target.data
+
+    view = memoryview(data)
+    try:
+        for pos in range(0, len(view), CHUNK):
+            parser.Parse(view[pos:pos + CHUNK], False)
+        parser.Parse(b"", True)
+    except xml.parsers.expat.ExpatError as e:
+        raise WritebackError(f"Invalid XML: {e}")
+    finally:
+        view.release()
+
+    if not target.saw_network:
+        raise DecodeError("No <NETWORK> tag found in the original XML")
+    if not target.saw_devices:
+        raise DecodeError("No <DEVICES> section found in the original XML")
+
+    # Same model and DSL as decode.py, so untouched blocks are recognized by text.
+    devices = {}
+    for region in index.devices:
+        if region.model is not None:
+            devices[region.model["save_ref_id"]] = region.model
+    links = [region.model for region in index.links if region.model is not None]
+    items = [("device", dev["name"]) for dev in devices.values()]
+    for link in links:
+        items.append(("link", (devices.get(link["from_ref"], {}).get("name", "UNKNOWN"), link["from_port"],
+                               devices.get(link["to_ref"], {}).get("name", "UNKNOWN"), link["to_port"])))
+    for block, item in zip(_dsl_blocks(build_dsl(devices, links)), items):
+        index.blocks.setdefault(block, []).append(item)
+    return index
+
+
+# ─── Edits ────────────────────────────────────────────────────────────────────
+
+def _dsl_devices(statements):
+    """name -> the DSL device's settings, in the shape of a decode.py device model."""
+    out = {}
+    for dev in statements:
+        if not isinstance(dev, Device):
+            continue
+        settings = {"dsl_type": dev.type, "power_on": False}
+        for stmt in dev.body:
+            if isinstance(stmt, Coordinates):
+                settings["x_coord"], settings["y_coord"] = float(stmt.x), float(stmt.y)
+            elif isinstance(stmt, Power):
+                settings["power_on"] = stmt.state == "on"
+            elif isinstance(stmt, Interface):
+                # As in compile.py, only a device's first interface applies.
+                ip, bw = stmt.get("ip"), stmt.get("bandwidth")
+                if ip is not None:
+                    settings["ip_address"] = ip
+                if bw is not None:
+                    settings["bandwidth_mbps"] = int(float(bw))
+                break
+        out.setdefault(dev.name, settings)
+    return out
+
+
+def _first_bandwidth(model):
+    ports = model["ports"]
+    return ports[next(iter(ports))]["bandwidth_mbps"] if ports else None
+
+
+def _changes(model, settings):
+    """The settings of a DSL device that differ from the original model."""
+    changed = {}
+    for key in ("x_coord", "y_coord", "power_on", "ip_address"):
+        if key in settings and settings[key] != model[key]:
+            changed[key] = settings[key]
+    if "bandwidth_mbps" in settings and settings["bandwidth_mbps"] != _first_bandwidth(model):
+        changed["bandwidth_mbps"] = settings["bandwidth_mbps"]
+    return changed
+
+
+def _number(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Fragment:
+    """
+    One DEVICE/LINK region, patched in place: the region is parsed once
+    into elements (to decide what to change) and once with expat (to find
+    each element's bytes), and only the text of changed elements is
+    replaced, so the rest of the region keeps its exact formatting.
+    """
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.root = ET.fromstring(self.data)
+        self._edits = []
+        spans = []
+        stack = []
+        parser = xml.parsers.expat.ParserCreate()
+
+        def start(tag, attrib):
+            stack.append(len(spans))
+            spans.append([parser.CurrentByteIndex, None, None])
+
+        def end(tag):
+            span = spans[stack.pop()]
+            pos = parser.CurrentByteIndex
+            if self.data[pos:pos + 2] == b"</":
+                span[1] = pos                                   # content ends here
+                span[2] = self.data.index(b">", pos) + 1
+            else:
+                span[2] = self.data.index(b"/>", span[0]) + 2  # <TAG/>
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.Parse(self.data, True)
+        # ElementTree iterates in document order, as expat reports start tags.
+        self._spans = {id(elem): span for elem, span in zip(self.root.iter(), spans)}
+
+    def set_text(self, path, text, parent=None):
+        """Replace the text of the element at `path`; False if there is none."""
+        elem = (self.root if parent is None else parent).find(path)
+        if elem is None:
+            return False
+        start, content_end, end = self._spans[id(elem)]
+        value = escape(text).encode("utf-8")
+        if content_end is None:
+            tag = self.data[start:end][:-2].rstrip()
+            self._edits.append((start, end, tag + b">" + value + b"</" + elem.tag.encode() + b">"))
+        else:
+            self._edits.append((self.data.index(b">", start) + 1, content_end, value))
+        return True
+
+    def remove(self, path):
+        for elem in self.root.findall(path):
+            start, _, end = self._spans[id(elem)]
+            self._edits.append((_line_start(self.data, start), end, b""))
+
+    def patched(self):
+        out, pos = [], 0
+        for start, end, value in sorted(self._edits):
+            out += [self.data[pos:start], value]
+            pos = end
+        out.append(self.data[pos:])
+        return b"".join(out)
+
+
+def _rewrite_device(data, region, changed, warnings, name):
+    device = _Fragment(data[region.start:region.end])
+    missing = []
+    if "x_coord" in changed and not device.set_text("WORKSPACE/LOGICAL/X", _number(changed["x_coord"])):
+        missing.append("coordinates")
+    if "y_coord" in changed and not device.set_text("WORKSPACE/LOGICAL/Y", _number(changed["y_coord"])):
+        missing.append("coordinates")
+    if "power_on" in changed and not device.set_text("ENGINE/POWER", "true" if changed["power_on"] else "false"):
+        missing.append("power")
+
+    ports = list(device.root.iter("PORT"))
+    if "ip_address" in changed:
+        # decode.py reports the last port that has an address; change that one.
+        with_ip = [p for p in ports if (p.findtext("IP") or "").strip()]
+        port = with_ip[-1] if with_ip else (ports[0] if ports else None)
+        if port is None or not device.set_text("IP", changed["ip_address"], parent=port):
+            missing.append("ip")
+    if "bandwidth_mbps" in changed:
+        if not ports or not device.set_text("BANDWIDTH", str(changed["bandwidth_mbps"] * 1000), parent=ports[0]):
+            missing.append("bandwidth")
+
+    for what in dict.fromkeys(missing):
+        warnings.append(f"{name}: no {what} element in the original device, change not applied")
+    return device.patched()
+
+
+def _new_link(data, template, from_ref, from_port, to_ref, to_port):
+    link = _Fragment(data[template.start:template.end])
+    ports = link.root.findall("CABLE/PORT")
+    link.set_text("CABLE/FROM", from_ref)
+    link.set_text("CABLE/TO", to_ref)
+    link.set_text(".", from_port, parent=ports[0])
+    link.set_text(".", to_port, parent=ports[1])
+    # Memory addresses belong to the link that was copied; PT recomputes them.
+    for stale in ("FROM_DEVICE_MEM_ADDR", "TO_DEVICE_MEM_ADDR", "FROM_PORT_MEM_ADDR", "TO_PORT_MEM_ADDR"):
+        link.remove(f"CABLE/{stale}")
+    return link.patched()
+
+
+def _line_start(data, pos):
+    """Extend a removed region back over its indentation and line break."""
+    while pos > 0 and data[pos - 1:pos] in (b" ", b"\t"):
+        pos -= 1
+    if data[pos - 1:pos] == b"\n":
+        pos -= 1
+        if data[pos - 1:pos] == b"\r":
+            pos -= 1
+    return pos
+
+
+def _dsl_blocks(dsl_text):
+    """The device/link blocks of DSL text, stripped."""
+    return [block.strip() for block in split_blocks(dsl_text)]
+
+
+def _parse_changed(dsl_text, blocks):
+    """Parse only the given blocks; a syntax error is reported against the whole text."""
+    try:
+        return parse("\n".join(blocks))
+    except DSLSyntaxError:
+        parse(dsl_text)     # raises with the line and column in the user's text
+        raise
+
+
+def plan_edits(data, index, dsl_text):
+    """
+    Compare the edited DSL with the indexed file. Returns (edits, warnings)
+    where edits are sorted, non-overlapping (start, end, replacement bytes).
+    Blocks that are character-for-character what decode.py produced for
+    the original are matched without parsing; only the rest are parsed
+    and compared field by field. Raises DSLSyntaxError when the DSL does
+    not parse.
+    """
+    kept_devices, kept_links = set(), Counter()
+    changed_blocks, used = [], Counter()
+    for block in _dsl_blocks(dsl_text):
+        items = index.blocks.get(block, ())
+        if used[block] < len(items):
+            kind, key = items[used[block]]
+            used[block] += 1
+            if kind == "device":
+                kept_devices.add(key)
+            else:
+                kept_links[key] += 1
+        else:
+            changed_blocks.append(block)
+
+    statements = _parse_changed(dsl_text, changed_blocks) if changed_blocks else []
+    wanted = _dsl_devices(statements)
+    edits, warnings = [], []
+
+    by_name, ref_names, removed_refs, removed_names = {}, {}, set(), set()
+    for region in index.devices:
+        model = region.model
+        if model is None:
+            continue
+        ref_names.setdefault(model["save_ref_id"], model["name"])
+        if model["name"] in by_name:
+            continue    # later duplicates of a name cannot be told apart in the DSL
+        by_name[model["name"]] = model["save_ref_id"]
+        if model["name"] in kept_devices:
+            continue
+
+        settings = wanted.get(model["name"])
+        if settings is None:
+            removed_refs.add(model["save_ref_id"])
+            removed_names.add(model["name"])
+            edits.append((_line_start(data, region.start), region.end, b""))
+            continue
+        if settings["dsl_type"] != model["dsl_type"]:
+            warnings.append(f"{model['name']}: device type cannot be changed by write-back")
+        changed = _changes(model, settings)
+        if changed:
+            edits.append((region.start, region.end,
+                          _rewrite_device(data, region, changed, warnings, model["name"])))
+
+    for name in wanted:
+        if name not in by_name:
+            warnings.append(f"{name}: new devices cannot be written back; add them in Packet Tracer")
+
+    # Links are matched as multisets of (from, port, to, port) by device name.
+    wanted_links = kept_links + Counter(
+        (s.device1, s.iface1, s.device2, s.iface2) for s in statements if isinstance(s, Link))
+    for region in index.links:
+        link = region.model
+        if link is None:
+            continue
+        key = (ref_names.get(link["from_ref"], "UNKNOWN"), link["from_port"],
+               ref_names.get(link["to_ref"], "UNKNOWN"), link["to_port"])
+        dangling = link["from_ref"] in removed_refs or link["to_ref"] in removed_refs
+        if wanted_links[key] > 0 and not dangling:
+            wanted_links[key] -= 1
+        else:
+            edits.append((_line_start(data, region.start), region.end, b""))
+
+    added = []
+    for (from_dev, from_port, to_dev, to_port), count in wanted_links.items():
+        if count <= 0:
+            continue
+        if from_dev in removed_names or to_dev in removed_names:
+            continue    # the device's links go with it, even if left in the DSL
+        if from_dev not in by_name or to_dev not in by_name:
+            warnings.append(f"link {from_dev}.{from_port} -> {to_dev}.{to_port}: unknown device, not written back")
+            continue
+        added.extend([(by_name[from_dev], from_port, by_name[to_dev], to_port)] * count)
+    if added:
+        template = next((r for r in index.links if r.model is not None), None)
+        if template is None or index.links_close is None:
+            warnings.append("new links need at least one existing link in the original file; not written back")
+        else:
+            indent = data[_line_start(data, template.start):template.start]
+            body = b"".join(indent + _new_link(data, template, *link) for link in added)
+            edits.append((_line_start(data, index.links_close), _line_start(data, index.links_close), body))
+
+    edits.sort(key=lambda e: (e[0], e[1]))
+    return edits, warnings
+
+
+def iter_splice(data, edits):
+    """
+    Yield `data` with `edits` applied, as byte chunks: untouched ranges in
+    slices of at most CHUNK bytes, replacements in between.
+    """
+    view = memoryview(data)
+    try:
+        pos = 0
+        for start, end, replacement in edits + [(len(data), len(data), b"")]:
+            for at in range(pos, start, CHUNK):
+                yield bytes(view[at:min(at + CHUNK, start)])
+            if replacement:
+                yield replacement
+            pos = end
+    finally:
+        view.release()
+
+
+def iter_write_back(data, index, dsl_text, warnings=None):
+    """
+    Yield the updated XML as byte chunks (see iter_splice). Warnings about
+    edits that could not be applied are appended to `warnings`.
+    """
+    if len(data) != index.size:
+        raise WritebackError("The index was built for a different file")
+    edits, notes = plan_edits(data, index, dsl_text)
+    if warnings is not None:
+        warnings.extend(notes)
+    yield from iter_splice(data, edits)
+
+
+def write_back(data, dsl_text, index=None):
+    """Apply the DSL to the original XML in one go; returns (xml bytes, warnings)."""
+    warnings = []
+    out = b"".join(iter_write_back(data, index or build_index(data), dsl_text, warnings))
+    return out, warnings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python writeback.py <original.xml> <edited.dsl> [<output.xml>]", file=sys.stderr)
+        sys.exit(1)
+
+    with open(sys.argv[1], "rb") as f:
+        original = f.read()
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        dsl = f.read()
+
+    warnings = []
+    out = open(sys.argv[3], "wb") if len(sys.argv) > 3 else sys.stdout.buffer
+    try:
+        for chunk in iter_write_back(original, build_index(original), dsl, warnings):
+            out.write(chunk)
+    except (DecodeError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    for warning in warnings:
+        print(f"[WARNING] {warning}", file=sys.stderr)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# src/ is imported as a namespace package from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """The Flask app on a scratch database, with a signed-in user's headers."""
+    tmp = tmp_path_factory.mktemp("app")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp / 'app.db'}")
+    os.environ.setdefault("JOB_DB", str(tmp / "jobs.sqlite3"))
+    os.environ.setdefault("FLASK_SECRET", "test-secret-" + "x" * 32)
+    os.environ.setdefault("JWT_SECRET", "test-jwt-" + "y" * 32)
+    import app as app_module
+
+    client = app_module.app.test_client()
+    client.post("/api/auth/register", json={"email": "user@example.com", "password": "pw"})
+    resp = client.post("/api/auth/login", json={"email": "user@example.com", "password": "pw"})
+    headers = {"Authorization": "Bearer " + resp.get_json()["access_token"]}
+    return app_module, headers
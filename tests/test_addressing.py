@@ -0,0 +1,99 @@
+import pytest
+
+from src.addressing import check_addressing, parse_ipv4, prefix_lengths, dotted
+
+MASK24 = "255.255.255.0"
+
+
+def node(node_id, kind, *interfaces, gateway=None):
+    data = {"label": node_id, "type": kind,
+            "interfaces": [dict(zip(("ip", "mask", "dhcp"), iface)) for iface in interfaces]}
+    if gateway is not None:
+        data["gateway"] = gateway
+    return {"id": node_id, "data": data}
+
+
+def edge(source, target):
+    return {"id": f"{source}-{target}", "source": source, "target": target}
+
+
+@pytest.fixture
+def lab():
+    """Two LANs behind R1, with one mistake of each kind."""
+    return {
+        "nodes": [
+            node("R1", "router", ("10.0.1.1", MASK24), ("10.0.2.1", MASK24)),
+            node("PC1", "pc", ("10.0.1.10", MASK24), gateway="10.0.1.1"),
+            node("PC2", "pc", ("10.0.1.10", MASK24), gateway="10.0.1.1"),      # duplicate of PC1
+            node("PC3", "pc", ("10.0.3.10", MASK24), gateway="10.0.1.1"),      # wrong subnet
+            node("PC4", "pc", ("10.0.2.20", MASK24), gateway="10.0.2.99"),     # gateway nobody has
+            node("PC5", "pc", ("10.0.2.21", MASK24), gateway=""),              # no gateway
+            node("PC6", "pc", ("10.0.2.300", MASK24)),                         # invalid address
+            node("PC7", "pc", ("10.0.2.22", "255.0.255.0")),                   # invalid mask
+            node("PC8", "pc", ("", "", True), gateway=""),                     # DHCP: not checked
+            node("SW1", "switch"),
+        ],
+        "edges": [edge("R1", "PC1"), edge("R1", "PC3"), edge("R1", "SW1"), edge("R1", "PC4")],
+    }
+
+
+def labels(items, key="label"):
+    return sorted(item[key] for item in items)
+
+
+def test_duplicates(lab):
+    report = check_addressing(lab)
+    assert report["duplicates"] == [{"ip": "10.0.1.10", "nodes": [
+        {"node": "PC1", "label": "PC1"}, {"node": "PC2", "label": "PC2"}]}]
+
+
+def test_cross_subnet_links(lab):
+    report = check_addressing(lab)
+    [issue] = report["cross_subnet_links"]
+    assert issue["edge"] == "R1-PC3"
+    assert issue["source"]["subnets"] == ["10.0.1.0/24", "10.0.2.0/24"]
+    assert issue["target"]["subnets"] == ["10.0.3.0/24"]
+    # The switch has no address, so only three links were checked.
+    assert report["summary"]["links_checked"] == 3
+
+
+def test_gateways(lab):
+    report = check_addressing(lab)
+    assert {g["label"]: g["reason"] for g in report["gateways"]} == {
+        "PC3": "outside-subnet", "PC4": "not-found", "PC5": "missing",
+    }
+
+
+def test_invalid_and_summary(lab):
+    report = check_addressing(lab)
+    assert labels(report["invalid"]) == ["PC6", "PC7"]
+    assert report["summary"] == {
+        "devices": 10, "interfaces": 10, "static": 8, "dhcp": 1, "subnets": 3,
+        "links_checked": 3, "links": 4,
+        "invalid": 2, "duplicates": 1, "cross_subnet_links": 1, "gateways": 3,
+    }
+
+
+def test_compiled_graph_uses_default_prefix():
+    flow = {
+        "nodes": [{"id": "1", "data": {"label": "A", "type": "pc", "interface": {"ip": "192.168.0.1"}}},
+                  {"id": "2", "data": {"label": "B", "type": "pc", "interface": {"ip": "192.168.1.1"}}},
+                  {"id": "3", "data": {"label": "C", "type": "pc", "interface": {"ip": "192.168.1.1"}}}],
+        "edges": [edge("1", "2")],
+    }
+    without = check_addressing(flow)
+    assert without["summary"]["links_checked"] == 0
+    assert len(without["duplicates"]) == 1
+
+    with_prefix = check_addressing(flow, default_prefix=24)
+    assert [issue["edge"] for issue in with_prefix["cross_subnet_links"]] == ["1-2"]
+    assert check_addressing(flow, default_prefix=16)["cross_subnet_links"] == []
+    assert with_prefix["gateways"] == []
+
+
+def test_helpers():
+    values, valid = parse_ipv4(["10.0.0.1", "256.0.0.1", "x", "255.255.255.252"])
+    assert valid.tolist() == [True, False, False, True]
+    assert [dotted(v) for v in values] == ["10.0.0.1", "0.0.0.0", "0.0.0.0", "255.255.255.252"]
+    masks, _ = parse_ipv4(["255.255.255.0", "255.0.255.0", "0.0.0.0", "255.255.255.255"])
+    assert prefix_lengths(masks).tolist() == [24, -1, 0, 32]
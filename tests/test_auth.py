@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from src.auth import HasherBusy, PasswordHasher
+
+DSL = "network N { device A pc { coordinates 1 2 } }"
+
+
+def test_hasher_turns_away_requests_beyond_its_slots():
+    release = threading.Event()
+    hasher = PasswordHasher(max_workers=1, max_pending=1, queue_timeout=0.05)
+    with mock.patch("src.auth.check_password_hash", side_effect=lambda *a: release.wait()):
+        with ThreadPoolExecutor(2) as pool:
+            running = pool.submit(hasher.check, "hash", "pw")
+            time.sleep(0.05)
+            waiting = pool.submit(hasher.check, "hash", "pw")
+            time.sleep(0.01)
+            started = time.monotonic()
+            try:
+                hasher.check("hash", "pw")
+                raise AssertionError("third hash was admitted")
+            except HasherBusy:
+                pass
+            assert time.monotonic() - started < 0.05
+            assert isinstance(waiting.exception(timeout=1), HasherBusy)
+            release.set()
+            assert running.result(timeout=1)
+
+
+def test_compile_is_served_while_the_hasher_is_saturated(api):
+    app_module, headers = api
+    threads = app_module.app.config["REQUEST_THREADS"]
+    client = app_module.app.test_client()
+    release = threading.Event()
+
+    def slow_check(*args):
+        release.wait(5)
+        return False
+
+    def login():
+        return client.post("/api/auth/login",
+                           json={"email": "user@example.com", "password": "pw"}).status_code
+
+    # A worker's request threads: a burst of logins arrives first, then a compile.
+    with mock.patch("src.auth.check_password_hash", side_effect=slow_check), \
+            ThreadPoolExecutor(threads) as request_threads:
+        logins = [request_threads.submit(login) for _ in range(threads * 4)]
+        started = time.monotonic()
+        compiled = request_threads.submit(
+            lambda: client.post("/api/compile", json={"dsl": DSL}, headers=headers))
+        resp = compiled.result(timeout=4)
+        elapsed = time.monotonic() - started
+        release.set()
+        statuses = [f.result(timeout=5) for f in logins]
+
+    assert resp.status_code == 200
+    assert resp.get_json()["react_flow"]["nodes"]
+    assert elapsed < 4
+    # Every hash still in flight when the compile finished was held by slow_check.
+    assert statuses.count(503) >= len(statuses) - threads // 2
+    assert set(statuses) <= {401, 503}
@@ -0,0 +1,89 @@
+import os
+import time
+
+from src.cache import ResultCache, STALE_TMP_SECONDS, result_hasher, result_key
+
+
+def key(n):
+    return result_key("test", "1", str(n).encode())
+
+
+def disk_files(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+def test_key_covers_namespace_version_and_chunks():
+    assert result_key("decode", "1", b"abc") != result_key("decode", "2", b"abc")
+    assert result_key("decode", "1", b"abc") != result_key("compile", "1", b"abc")
+    h = result_hasher("decode", "1")
+    h.update(b"a")
+    h.update(b"bc")
+    assert h.hexdigest() == result_key("decode", "1", b"abc")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_bytes=30)
+    for n in range(3):
+        cache.put(key(n), bytes(10))
+    assert cache.get(key(0)) is not None     # now the most recent
+    cache.put(key(3), bytes(10))
+    assert cache.get(key(1)) is None
+    assert all(cache.get(key(n)) is not None for n in (0, 2, 3))
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 30, 1)
+
+
+def test_memory_tier_skips_values_over_budget():
+    cache = ResultCache(max_bytes=10)
+    cache.put(key(0), bytes(5))
+    cache.put(key(1), bytes(11))
+    assert cache.get(key(1)) is None
+    assert cache.get(key(0)) is not None
+    assert cache.stats()["evictions"] == 0
+
+
+def test_replacing_an_entry_keeps_the_size_right():
+    cache = ResultCache(max_bytes=100)
+    cache.put(key(0), bytes(40))
+    cache.put(key(0), bytes(10))
+    assert cache.stats()["bytes"] == 10
+
+
+def test_disk_tier_is_shared_and_refills_memory(tmp_path):
+    writer = ResultCache(max_bytes=1000, disk_dir=str(tmp_path))
+    writer.put(key(0), b"body")
+    reader = ResultCache(max_bytes=1000, disk_dir=str(tmp_path))
+    assert reader.get(key(0)) == b"body"
+    assert reader.get(key(0)) == b"body"
+    stats = reader.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_disk_tier_prunes_least_recently_used(tmp_path):
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=100)
+    # Written 10 s apart, oldest first; key 0 is then read, which makes it recent.
+    now = time.time()
+    for n in range(5):
+        cache.put(key(n), bytes(20))
+        path = cache._disk_path(key(n))
+        os.utime(path, (now - 100 + 10 * n, now - 100 + 10 * n))
+    assert cache.get(key(0)) is not None
+
+    cache.put(key(5), bytes(20))    # 120 bytes: pruned to at most 90
+    assert cache.get(key(1)) is None and cache.get(key(2)) is None
+    assert all(cache.get(key(n)) is not None for n in (0, 3, 4, 5))
+    assert cache.stats()["disk_evictions"] == 2
+    assert len(disk_files(tmp_path)) == 4
+
+
+def test_prune_removes_stale_temp_files_only(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put(key(0), b"x")
+    shard = os.path.dirname(cache._disk_path(key(0)))
+    stale, fresh = os.path.join(shard, ".tmp-stale"), os.path.join(shard, ".tmp-fresh")
+    for path in (stale, fresh):
+        open(path, "wb").close()
+    old = time.time() - STALE_TMP_SECONDS - 1
+    os.utime(stale, (old, old))
+    cache.prune_disk()
+    assert disk_files(tmp_path) == sorted([".tmp-fresh", key(0)])
@@ -0,0 +1,109 @@
+import pytest
+
+from src.compile import IncrementalCompiler, parse_dsl_to_react_flow, split_blocks, _scan
+
+DOCUMENTS = {
+    "one line": (
+        "network N { device A pc { coordinates 1 2 interface Fa0 { ip 10.0.0.1 } "
+        "interface Fa1 { bandwidth 100 } } }"
+    ),
+    "single-line devices": (
+        "network N {\n"
+        "  device A pc { coordinates 1 2 }\n"
+        "  device B pc { coordinates 3 4 }\n"
+        "}\n"
+    ),
+    "multi-line": (
+        "network Lab {\n"
+        "  device R1 router {\n"
+        "    coordinates 100.5 200\n"
+        "    power on\n"
+        "    interface Fa0/0 {\n"
+        "      ip 10.0.0.1\n"
+        "      bandwidth 100\n"
+        "    }\n"
+        "  }\n"
+        "  device PC1 pc {\n"
+        "    coordinates 300 200\n"
+        "  }\n"
+        "  device PC2 pc {\n"
+        "  }\n"
+        "  link R1.Fa0/0 -> PC1.Fa0 {\n"
+        "    speed 100\n"
+        "  }\n"
+        "  link PC1.Fa0 -> PC2.Fa0 {\n"
+        "  }\n"
+        "}\n"
+    ),
+    "statements only": (
+        "device A pc {\n  coordinates 1 2\n}\n"
+        "device B switch {\n}\n"
+        "link A.Fa0 -> B.Fa0 {\n}\n"
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(DOCUMENTS))
+def test_incremental_matches_full_compile(name):
+    text = DOCUMENTS[name]
+    assert IncrementalCompiler().compile(text) == parse_dsl_to_react_flow(text)
+
+
+def test_incremental_edits_match_full_compile():
+    # Every device positioned: unpositioned ones keep their previous spot
+    # across incremental compiles by design.
+    text = DOCUMENTS["multi-line"].replace("device PC2 pc {\n", "device PC2 pc {\n    coordinates 500 200\n")
+    compiler = IncrementalCompiler()
+    compiler.compile(text)
+    edited = text.replace("coordinates 300 200", "coordinates 310 220")
+    assert compiler.compile(edited) == parse_dsl_to_react_flow(edited)
+    assert compiler.compiled == 1
+
+
+def test_split_blocks_drops_network_header_and_brace():
+    blocks = split_blocks(DOCUMENTS["single-line devices"])
+    assert [block.strip() for block in blocks] == [
+        "device A pc { coordinates 1 2 }",
+        "device B pc { coordinates 3 4 }",
+    ]
+
+
+def test_scan_skips_statements_outside_a_device():
+    lines = ["coordinates 1 2", "power on", "ip 10.0.0.1", "bandwidth 100", "device A pc {", "}"]
+    assert [event[0] for event in _scan(lines)] == ["device", "node"]
+
+
+def test_incremental_route_reuses_session_blocks(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    text = DOCUMENTS["multi-line"]
+    body = {"dsl": text, "incremental": True, "session": "reuse"}
+    first = client.post("/api/compile", json=body, headers=headers).get_json()
+    assert first["incremental"] is True
+
+    edited = dict(body, dsl=text.replace("power on", "power off"), patch=True, base=first["revision"])
+    second = client.post("/api/compile", json=edited, headers=headers).get_json()
+    assert second["compiled_blocks"] == 1
+    assert "react_flow_patch" in second
+
+
+def test_incremental_route_sends_large_documents_to_the_pool(api, monkeypatch):
+    app_module, headers = api
+    monkeypatch.setitem(app_module.app.config, "INCREMENTAL_MAX_BYTES", 64)
+    calls = []
+    run_converter = app_module.run_converter
+    monkeypatch.setattr(app_module, "run_converter", lambda kind, *a, **kw: calls.append(kind) or run_converter(kind, *a, **kw))
+    client = app_module.app.test_client()
+    text = DOCUMENTS["multi-line"]
+    body = {"dsl": text, "incremental": True, "session": "large"}
+
+    first = client.post("/api/compile", json=body, headers=headers).get_json()
+    assert calls == ["compile"]
+    assert first["incremental"] is False
+    assert first["react_flow"] == parse_dsl_to_react_flow(text)
+
+    # The session was reset: a patch against that revision gets the full graph.
+    monkeypatch.setitem(app_module.app.config, "INCREMENTAL_MAX_BYTES", 1 << 20)
+    again = client.post("/api/compile", json=dict(body, patch=True, base=first["revision"]), headers=headers).get_json()
+    assert again["incremental"] is True
+    assert "react_flow" in again and "react_flow_patch" not in again
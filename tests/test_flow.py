@@ -0,0 +1,73 @@
+import pytest
+
+DSL = (
+    "network N {\n"
+    "  device A pc { coordinates 10 20 interface Fa0 { ip 10.0.0.1 } }\n"
+    "  device B pc { coordinates 300 20 interface Fa0 { ip 10.0.0.1 } }\n"
+    "}\n"
+)
+VIEWPORT = {"bbox": "0,0,1000,1000", "zoom": 1}
+
+
+@pytest.fixture(scope="module")
+def other_headers(api):
+    app_module, _ = api
+    client = app_module.app.test_client()
+    client.post("/api/auth/register", json={"email": "other@example.com", "password": "pw"})
+    resp = client.post("/api/auth/login", json={"email": "other@example.com", "password": "pw"})
+    return {"Authorization": "Bearer " + resp.get_json()["access_token"]}
+
+
+def compile_flow(client, headers):
+    resp = client.post("/api/compile", json={"dsl": DSL}, headers=headers)
+    assert resp.status_code == 200
+    return resp
+
+
+def test_flow_key_grants_viewport_and_addressing(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    handle = compile_flow(client, headers).headers["X-Flow-Key"]
+
+    view = client.get(f"/api/flow/{handle}/viewport", headers=headers, query_string=VIEWPORT)
+    assert view.status_code == 200
+    assert len(view.get_json()["nodes"]) == 2
+    report = client.get(f"/api/flow/{handle}/addressing", headers=headers)
+    assert report.status_code == 200
+    assert report.get_json()["summary"]["duplicates"] == 1
+
+
+def test_flow_key_is_issued_on_not_modified(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    first = compile_flow(client, headers)
+    again = client.post("/api/compile", json={"dsl": DSL},
+                        headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["X-Flow-Key"] == first.headers["X-Flow-Key"]
+
+
+def test_etags_and_other_users_flow_keys_are_refused(api, other_headers):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    resp = compile_flow(client, headers)
+    handle, etag = resp.headers["X-Flow-Key"], resp.headers["ETag"].strip('"')
+    key, _, signature = handle.rpartition(".")
+    forged = f"{key}.{signature[::-1]}"
+
+    for h, who in ((handle, other_headers), (etag, headers), (forged, headers)):
+        assert client.get(f"/api/flow/{h}/viewport", headers=who, query_string=VIEWPORT).status_code == 404
+        assert client.get(f"/api/flow/{h}/addressing", headers=who).status_code == 404
+
+
+def test_flow_keys_are_not_kept_in_the_result_cache(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    handle = compile_flow(client, headers).headers["X-Flow-Key"]
+    cache = app_module.result_cache
+    before = cache.stats()
+
+    client.get(f"/api/flow/{handle}x/viewport", headers=headers, query_string=VIEWPORT)
+    after = cache.stats()
+    assert (after["memory_hits"], after["misses"], after["entries"]) == \
+        (before["memory_hits"], before["misses"], before["entries"])
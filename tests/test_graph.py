@@ -0,0 +1,29 @@
+import re
+
+from bench.generate import generate_xml
+from pka2xml.graph import load_topology, to_dot
+
+EVIL = 'a"];b[image="x'
+
+# One edge statement: two quoted ids and two quoted labels, nothing else.
+EDGE = re.compile(r'\t"((?:[^"\\]|\\.)*)"--"((?:[^"\\]|\\.)*)" '
+                  r'\[taillabel="(?:[^"\\]|\\.)*"; headlabel="(?:[^"\\]|\\.)*"\];')
+
+
+def test_device_names_cannot_inject_dot_attributes():
+    xml = generate_xml(2, "sparse").replace(b">Router0<", b'>a&quot;];b[image=&quot;x<')
+    dot = to_dot(load_topology(xml))
+    edges = [line for line in dot.splitlines() if "--" in line]
+    assert len(edges) == 1
+    match = EDGE.fullmatch(edges[0])
+    assert match is not None, edges[0]
+    assert match.group(1) == EVIL.replace('"', '\\"')
+    assert "image=" not in dot.replace(match.group(1), "")
+
+
+def test_newlines_and_backslashes_are_escaped():
+    xml = generate_xml(2, "sparse").replace(b">Router0<", b">R\\1&#10;x<")
+    edge = [line for line in to_dot(load_topology(xml)).splitlines() if "--" in line][0]
+    match = EDGE.fullmatch(edge)
+    assert match is not None, edge
+    assert match.group(1) == "R\\\\1 x"
@@ -0,0 +1,127 @@
+import time
+import threading
+
+import pytest
+
+from src.jobs import JobQueue, JobFailed, QUEUED, RUNNING, DONE, FAILED
+
+
+def echo(payload, progress):
+    progress(0.5, "halfway")
+    return b'"' + payload + b'"'
+
+
+def fail(payload, progress):
+    raise JobFailed("Conversion failed", stderr="bad input")
+
+
+def crash(payload, progress):
+    raise KeyError("boom")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def queue(path, workers=0, **kwargs):
+    """No worker threads by default: the tests claim and run jobs themselves."""
+    return JobQueue(path, {"echo": echo, "fail": fail, "crash": crash}, workers=workers, **kwargs)
+
+
+def test_job_runs_to_completion(path):
+    jobs = queue(path, workers=1, poll_interval=0.05)
+    job_id = jobs.submit("echo", [b"ab", b"cd"], owner="1")
+    job = jobs.get(job_id)
+    deadline = time.time() + 5
+    while job["status"] not in (DONE, FAILED) and time.time() < deadline:
+        job = jobs.wait(job_id, job["updated_at"], 1)
+    jobs.shutdown()
+    assert job["status"] == DONE
+    assert job["result"] == b'"abcd"'
+    assert (job["owner"], job["attempts"], job["progress"]) == ("1", 1, 1.0)
+
+
+@pytest.mark.parametrize("kind, error", [
+    ("fail", {"error": "Conversion failed", "stderr": "bad input"}),
+    ("crash", {"error": "Internal error", "details": "KeyError: 'boom'"}),
+])
+def test_handler_errors_fail_the_job(path, kind, error):
+    jobs = queue(path)
+    job_id = jobs.submit(kind, b"x")
+    jobs._run(jobs._claim())
+    job = jobs.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == error
+
+
+def test_unknown_kind_is_rejected(path):
+    with pytest.raises(ValueError):
+        queue(path).submit("nope", b"")
+
+
+def test_expired_lease_is_claimed_again(path):
+    jobs = queue(path, lease=0.2)
+    job_id = jobs.submit("echo", b"x")
+    assert jobs._claim()["id"] == job_id    # its worker then "dies"
+    # Another process sees the job held while the lease lasts...
+    other = queue(path, lease=0.2)
+    assert other._claim() is None
+    assert other.get(job_id)["status"] == RUNNING
+    time.sleep(0.25)
+    # ...and takes it over once it ran out.
+    row = other._claim()
+    assert row["id"] == job_id and row["attempts"] == 1
+    other._run(row)
+    job = other.get(job_id)
+    assert (job["status"], job["attempts"], job["result"]) == (DONE, 2, b'"x"')
+
+
+def test_job_is_abandoned_after_max_attempts(path):
+    jobs = queue(path, lease=0.01, max_attempts=3)
+    job_id = jobs.submit("echo", b"x")
+    for _ in range(3):
+        assert jobs._claim()["id"] == job_id
+        time.sleep(0.02)
+    jobs._run(jobs._claim())
+    job = jobs.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == {"error": "Job abandoned", "details": "worker died 3 times"}
+    assert jobs._claim() is None
+
+
+def test_heartbeat_keeps_a_long_job_leased(path):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(payload, progress):
+        started.set()
+        release.wait(5)
+        return b"1"
+
+    jobs = JobQueue(path, {"slow": slow}, workers=0, lease=0.3)
+    job_id = jobs.submit("slow", b"")
+    runner = threading.Thread(target=jobs._run, args=(jobs._claim(),))
+    runner.start()
+    started.wait(5)
+    other = JobQueue(path, {"slow": slow}, workers=0, lease=0.3)
+    try:
+        # Well past the first lease: renewed every lease/3, so still held.
+        for _ in range(8):
+            time.sleep(0.1)
+            assert other._claim() is None
+    finally:
+        release.set()
+        runner.join(5)
+    job = other.get(job_id)
+    assert (job["status"], job["attempts"]) == (DONE, 1)
+
+
+def test_finished_jobs_expire(path):
+    jobs = queue(path, ttl=0.05)
+    job_id = jobs.submit("echo", b"x")
+    jobs._run(jobs._claim())
+    assert jobs.get(job_id)["status"] == DONE
+    time.sleep(0.1)
+    assert jobs.get(job_id) is None
+    jobs._purge()
+    assert jobs.stats() == {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from bench.generate import generate_flow
+from src.layout import _Grid, place_unpositioned
+
+
+def exact_repulsion(pos, k2):
+    delta = pos[:, None, :] - pos[None, :, :]
+    weight = k2 / ((delta ** 2).sum(axis=-1) + 1e-2 * k2)
+    np.fill_diagonal(weight, 0.0)
+    return (delta * weight[:, :, None]).sum(axis=1)
+
+
+@pytest.mark.parametrize("n", [50, 400, 2000])
+def test_grid_repulsion_approximates_the_exact_sum(n):
+    rng = np.random.default_rng(n)
+    # A dense cluster inside a wide spread, as in a half-finished layout
+    pos = np.concatenate((rng.uniform(0, 20000, (n // 2, 2)), rng.normal(5000, 300, (n - n // 2, 2))))
+    k2 = 150.0 ** 2
+    approx = _Grid(pos, np.ones(n, dtype=bool)).repulsion(pos, k2)
+    exact = exact_repulsion(pos, k2)
+    error = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    assert np.median(error) < 0.02
+    assert np.percentile(error, 95) < 0.1
+
+
+def test_every_pair_is_counted_exactly_once():
+    rng = np.random.default_rng(7)
+    pos = np.concatenate((rng.uniform(0, 5000, (150, 2)), rng.normal(1000, 50, (150, 2))))
+    n = len(pos)
+    grid = _Grid(pos, np.ones(n, dtype=bool))
+
+    covered = np.zeros((n, n), dtype=int)
+    interacts = set(zip(grid.target.tolist(), grid.source.tolist()))
+    for level in range(grid.ids.shape[1]):
+        cells = grid.ids[:, level]
+        pairs = np.array([[(a, b) in interacts for b in cells.tolist()] for a in cells.tolist()])
+        covered += pairs
+    covered[grid.i, grid.j] += 1
+    covered[grid.j, grid.i] += 1
+    np.fill_diagonal(covered, 1)
+    assert (covered == 1).all()
+
+
+def test_pinned_nodes_stay_and_unplaced_nodes_spread_out():
+    graph = generate_flow(300)
+    for node in graph["nodes"][:30]:
+        node["data"]["coordinates"] = "1 2"
+        node["position"] = {"x": 1.0, "y": 2.0}
+    place_unpositioned(graph)
+
+    assert all(node["position"] == {"x": 1.0, "y": 2.0} for node in graph["nodes"][:30])
+    free = {(node["position"]["x"], node["position"]["y"]) for node in graph["nodes"][30:]}
+    assert len(free) == 270
+
+
+def test_layout_is_deterministic():
+    first, second = generate_flow(500, "dense"), generate_flow(500, "dense")
+    place_unpositioned(first)
+    place_unpositioned(second)
+    assert [n["position"] for n in first["nodes"]] == [n["position"] for n in second["nodes"]]
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from bench.generate import generate_dsl
+from src.lexer import Token, iter_tokens, keyword_list, token_expr, tokenize
+
+
+def scan_string(text):
+    """The pyparsing scanner the single-pass tokenizer must agree with."""
+    return [tok[0] for tok, _, _ in token_expr.scanString(text)]
+
+
+@pytest.mark.parametrize("text", [
+    'device R1 router { ip 10.0.0.1 mac 00aA.0123.ffff desc "a b" bandwidth 100 }',
+    "networkx xnetwork $network 1network network- 1.2.3.4.5 a1.2.3.4 999.1.1.1",
+    *keyword_list,
+])
+def test_matches_pyparsing(text):
+    assert tokenize(text) == scan_string(text)
+
+
+def test_matches_pyparsing_on_random_input():
+    rng = random.Random(0)
+    pieces = ["1", "a", "_", "-", "$", ".", '"', " ", "\n", "{", "network", "device", "1.2.3.4", "0123.abcd.ffff"]
+    for _ in range(3000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        assert tokenize(text) == scan_string(text), text
+
+
+def test_generated_document_and_positions():
+    text = generate_dsl(20)
+    assert tokenize(text) == scan_string(text)
+    assert list(iter_tokens("network N {\n  device A pc")) == [
+        Token("NETWORK", "network", 1, 1), Token("ID", "N", 1, 9),
+        Token("DEVICE", "device", 2, 3), Token("ID", "A", 2, 10), Token("ID", "pc", 2, 12),
+    ]
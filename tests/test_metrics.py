@@ -0,0 +1,74 @@
+import multiprocessing
+
+import pytest
+
+from src.metrics import Registry
+
+
+def make_registry(directory):
+    registry = Registry()
+    registry.share(str(directory), interval=0)
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    seconds = registry.histogram("stage_seconds", "Stage time", ["stage"], buckets=(0.1, 1))
+    return registry, requests, seconds
+
+
+def record_in_child(directory):
+    registry, requests, seconds = make_registry(directory)
+    requests.inc(2, route="/a")
+    seconds.observe(0.5, stage="parse")
+    registry.sync(force=True)
+
+
+def test_shared_directory_sums_all_processes(tmp_path):
+    child = multiprocessing.get_context("fork").Process(target=record_in_child, args=(tmp_path,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+
+    registry, requests, seconds = make_registry(tmp_path)
+    requests.inc(1, route="/a")
+    requests.inc(1, route="/b")
+    seconds.observe(0.05, stage="parse")
+    text = registry.render()
+
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'requests_total{route="/b"} 1' in text
+    assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="parse",le="1"} 2' in text
+    assert 'stage_seconds_count{stage="parse"} 2' in text
+    assert text.count("# TYPE requests_total counter") == 1
+
+
+def test_unshared_registry_renders_its_own(tmp_path):
+    registry = Registry()
+    registry.counter("requests_total", "Requests").inc(4)
+    assert "requests_total 4" in registry.render()
+    assert not list(tmp_path.iterdir())
+
+
+def test_reset_drops_inherited_values(tmp_path):
+    registry, requests, _ = make_registry(tmp_path)
+    requests.inc(5, route="/a")
+    registry.reset()
+    requests.inc(1, route="/a")
+    assert 'requests_total{route="/a"} 1' in registry.render()
+
+
+@pytest.mark.parametrize("remote, status", [("127.0.0.1", 200), ("::1", 200), ("10.1.2.3", 403)])
+def test_metrics_without_token_only_serve_localhost(api, remote, status):
+    app_module, _ = api
+    client = app_module.app.test_client()
+    resp = client.get("/metrics", environ_base={"REMOTE_ADDR": remote})
+    assert resp.status_code == status
+
+
+def test_metrics_token_is_required_when_set(api, monkeypatch):
+    app_module, _ = api
+    monkeypatch.setitem(app_module.app.config, "METRICS_TOKEN", "s3cret")
+    client = app_module.app.test_client()
+    remote = {"REMOTE_ADDR": "10.1.2.3"}
+    assert client.get("/metrics", environ_base=remote).status_code == 401
+    resp = client.get("/metrics", environ_base=remote, headers={"Authorization": "Bearer s3cret"})
+    assert resp.status_code == 200
+    assert "http_request_seconds" in resp.get_data(as_text=True)
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import src.pkt as pkt
+from src.pkt import PktError, Twofish, iter_xml, pkt_to_xml
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "xml", "input")
+
+# Twofish 128-bit known answers (ecb_tbl.txt, I=1..3): each key and
+# plaintext is the previous plaintext and ciphertext.
+TWOFISH_VECTORS = [
+    ("00000000000000000000000000000000", "00000000000000000000000000000000", "9f589f5cf6122c32b6bfec2f2ae8c35a"),
+    ("00000000000000000000000000000000", "9f589f5cf6122c32b6bfec2f2ae8c35a", "d491db16e7b1c39e86cb086b789f5419"),
+    ("9f589f5cf6122c32b6bfec2f2ae8c35a", "d491db16e7b1c39e86cb086b789f5419", "019f9809de1711858faac3a3ba20fbc3"),
+]
+
+
+def sample(name):
+    with open(os.path.join(SAMPLES, name), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("key, plaintext, ciphertext", TWOFISH_VECTORS)
+def test_twofish_known_answers(key, plaintext, ciphertext):
+    cipher = Twofish(bytes.fromhex(key))
+    assert cipher.encrypt_block(bytes.fromhex(plaintext)).hex() == ciphertext
+    assert cipher.encrypt_blocks(bytes.fromhex(plaintext) * 3).hex() == ciphertext * 3
+
+
+def test_twofish_without_numpy(monkeypatch):
+    monkeypatch.setattr(pkt, "np", None)
+    key, plaintext, ciphertext = TWOFISH_VECTORS[2]
+    assert Twofish(bytes.fromhex(key)).encrypt_blocks(bytes.fromhex(plaintext) * 2).hex() == ciphertext * 2
+
+
+def test_sample_decrypts_to_its_xml():
+    data = sample("test-file-1.pkt")
+    expected = sample("test-file-1.xml")
+    assert pkt_to_xml(data) == expected
+    assert b"".join(iter_xml(data, verify=False, chunk_size=4096)) == expected
+
+
+def test_eax_tag_is_checked_by_default():
+    data = bytearray(sample("test-file-1.pkt"))
+    # Stage 1 reverses the file: its first bytes are the end of the tag.
+    data[0] ^= 1
+    with pytest.raises(PktError, match="EAX authentication failed"):
+        pkt_to_xml(bytes(data))
+    assert pkt_to_xml(bytes(data), verify=False) == sample("test-file-1.xml")
+
+
+def test_corrupted_ciphertext_is_rejected_without_the_tag():
+    data = bytearray(sample("test-file-1.pkt"))
+    data[len(data) // 2] ^= 0xFF
+    with pytest.raises(PktError):
+        pkt_to_xml(bytes(data))
+    with pytest.raises(PktError):
+        pkt_to_xml(bytes(data), verify=False)
+
+
+def test_short_input_is_rejected():
+    with pytest.raises(PktError, match="too short"):
+        pkt_to_xml(b"x" * 20)
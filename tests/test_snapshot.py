@@ -0,0 +1,77 @@
+import os
+import struct
+
+import pytest
+
+from bench.generate import generate_xml
+from src.decode import read_network, build_dsl
+from src.snapshot import (
+    HEADER, SNAPSHOT_VERSION, Snapshot, SnapshotError, dumps, load_snapshot, write_snapshot,
+)
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "xml", "input", "test-file-1.xml")
+
+
+@pytest.fixture(scope="module")
+def network():
+    return read_network(SAMPLE)
+
+
+def test_round_trip_keeps_the_model(network):
+    devices, links = network
+    with Snapshot(dumps(devices, links), verify=True) as snap:
+        assert snap.network() == (devices, links)
+        assert build_dsl(*snap.network()) == build_dsl(devices, links)
+
+
+def test_round_trip_of_a_generated_network(tmp_path):
+    path = tmp_path / "lab.xml"
+    path.write_bytes(generate_xml(40, links="dense"))
+    devices, links = read_network(str(path))
+    write_snapshot(devices, links, str(tmp_path / "lab.ptsnap"))
+    assert load_snapshot(str(tmp_path / "lab.ptsnap"), verify=True) == (devices, links)
+
+
+def test_single_records_and_arrays(network):
+    devices, links = network
+    with Snapshot(dumps(devices, links)) as snap:
+        first = next(iter(devices.values()))
+        assert snap.device(0) == first
+        assert snap.link(len(links) - 1) == links[-1]
+        xs = snap.array("devices")["x"]
+        assert list(xs) == [dev["x_coord"] for dev in devices.values()]
+        del xs
+
+
+def test_checksum_mismatch_is_rejected(network):
+    data = bytearray(dumps(*network))
+    data[-1] ^= 0xFF    # last byte of the string blob
+    Snapshot(bytes(data))   # not checked unless asked
+    with pytest.raises(SnapshotError, match="checksum"):
+        Snapshot(bytes(data), verify=True)
+
+
+def test_other_format_version_is_rejected(network, tmp_path):
+    data = bytearray(dumps(*network))
+    struct.pack_into("<H", data, 4, SNAPSHOT_VERSION + 1)
+    path = tmp_path / "old.ptsnap"
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match=f"version {SNAPSHOT_VERSION + 1}"):
+        load_snapshot(str(path))
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "too short"),
+    (b"XXXX" + bytes(HEADER.size - 4), "bad magic"),
+])
+def test_not_a_snapshot(tmp_path, data, message):
+    path = tmp_path / "bad.ptsnap"
+    path.write_bytes(data)
+    with pytest.raises(SnapshotError, match=message):
+        load_snapshot(str(path))
+
+
+def test_truncated_snapshot_is_rejected(network):
+    data = dumps(*network)
+    with pytest.raises(SnapshotError, match="header says"):
+        Snapshot(data[:-1])
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+TEXT = "network Shared { device A pc { coordinates 1 2 } }"
+
+
+def save(client, headers, content, title="t"):
+    resp = client.post("/api/snippets", json={"title": title, "content": content}, headers=headers)
+    assert resp.status_code == 201
+    return resp.get_json()["id"]
+
+
+def content_rows(app_module, text):
+    with app_module.app.app_context():
+        key = app_module.SnippetContent.digest(text)
+        return app_module.db.session.get(app_module.SnippetContent, key)
+
+
+def test_shared_content_outlives_one_of_its_snippets(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    first, second = save(client, headers, TEXT + " "), save(client, headers, TEXT + " ")
+
+    assert client.delete(f"/api/snippets/{first}", headers=headers).status_code == 200
+    assert content_rows(app_module, TEXT + " ") is not None
+    assert client.get(f"/api/snippets/{second}", headers=headers).get_json()["content"] == TEXT + " "
+
+    assert client.delete(f"/api/snippets/{second}", headers=headers).status_code == 200
+    assert content_rows(app_module, TEXT + " ") is None
+
+
+def test_prune_does_not_delete_content_a_pending_save_refers_to(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    text = TEXT + "  "
+    old = save(client, headers, text)
+    interned, pruned = threading.Event(), threading.Event()
+    errors = []
+
+    def saving():
+        # A second snippet with the same content, committed only after the
+        # other request has tried to prune that content.
+        try:
+            with app_module.app.app_context():
+                db = app_module.db
+                user = db.session.get(app_module.User, 1)
+                s = app_module.Snippet(title="new", user_id=user.id)
+                s.content = text
+                interned.set()
+                pruned.wait(0.5)
+                db.session.add(s)
+                db.session.commit()
+        except Exception as e:
+            errors.append(e)
+
+    def deleting():
+        try:
+            with app_module.app.app_context():
+                interned.wait(5)
+                db = app_module.db
+                s = db.session.get(app_module.Snippet, old)
+                h = s.content_hash
+                db.session.delete(s)
+                db.session.flush()
+                app_module.prune_snippet_contents([h])
+                db.session.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pruned.set()
+
+    threads = [threading.Thread(target=saving), threading.Thread(target=deleting)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert not errors
+    assert content_rows(app_module, text) is not None
+
+
+def test_missing_content_is_reported_clearly(api):
+    app_module, headers = api
+    client = app_module.app.test_client()
+    text = TEXT + "   "
+    sid = save(client, headers, text)
+    with app_module.app.app_context():
+        db = app_module.db
+        db.session.execute(db.delete(app_module.SnippetContent).where(
+            app_module.SnippetContent.hash == app_module.SnippetContent.digest(text)))
+        db.session.commit()
+        with pytest.raises(app_module.MissingSnippetContent, match="no longer exists"):
+            db.session.get(app_module.Snippet, sid).content
+
+    resp = client.get(f"/api/snippets/{sid}", headers=headers)
+    assert resp.status_code == 500
+    assert "no longer exists" in resp.get_json()["details"]
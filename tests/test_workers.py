@@ -0,0 +1,44 @@
+import pytest
+
+from bench.generate import generate_xml
+from src.workers import ConverterPool, WorkerError
+
+XML = generate_xml(3)
+
+
+@pytest.fixture
+def pool():
+    pool = ConverterPool(size=1, timeout=10)
+    yield pool
+    pool.shutdown()
+
+
+def chunked(data, size=97):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def test_stream_decodes_chunks_as_they_arrive(pool):
+    result = pool.run_stream("decode_stream", chunked(XML))
+    assert "Router0" in result["dsl"]
+    assert result == pool.run("decode", XML)
+
+
+def test_cancelled_stream_leaves_the_worker_usable(pool):
+    assert pool.run_stream("decode_stream", chunked(XML), finish=lambda: False) is None
+    assert "Router0" in pool.run_stream("decode_stream", chunked(XML))["dsl"]
+
+
+def test_source_errors_cancel_the_job(pool):
+    def failing():
+        yield XML[:20]
+        raise OSError("client went away")
+
+    with pytest.raises(OSError, match="client went away"):
+        pool.run_stream("decode_stream", failing())
+    assert "Router0" in pool.run_stream("decode_stream", chunked(XML))["dsl"]
+
+
+def test_malformed_stream_fails_and_the_next_job_still_runs(pool):
+    with pytest.raises(WorkerError):
+        pool.run_stream("decode_stream", chunked(XML.replace(b"</DEVICES>", b"</DEVICE>")))
+    assert "Router0" in pool.run_stream("decode_stream", chunked(XML))["dsl"]
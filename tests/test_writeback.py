@@ -0,0 +1,96 @@
+import io
+import os
+import json
+
+import pytest
+
+from src.decode import decode_chunks
+from src.lalr import DSLSyntaxError
+from src.writeback import WritebackError, build_index, iter_write_back, write_back
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "xml", "input", "test-file-1.xml")
+
+
+@pytest.fixture(scope="module")
+def original():
+    with open(SAMPLE, "rb") as f:
+        xml = f.read()
+    dsl, _ = decode_chunks([xml])
+    return xml, dsl
+
+
+def decoded(xml):
+    return decode_chunks([xml])[0]
+
+
+def test_unchanged_dsl_gives_the_original_bytes(original):
+    xml, dsl = original
+    assert write_back(xml, dsl) == (xml, [])
+
+
+def test_edits_survive_a_decode_round_trip(original):
+    xml, dsl = original
+    # A device without a power line is off: build_dsl only writes "power on".
+    laptop = "    device Laptop0 laptop {\n        coordinates 426.5 445.0\n"
+    edited = (dsl
+              .replace("coordinates 329.5 300.0", "coordinates 100.0 50.5")
+              .replace(laptop + "        power on\n", laptop))
+    out, warnings = write_back(xml, edited)
+    assert warnings == []
+    assert decoded(out) == edited
+    # Only the two DEVICE elements changed: new numbers, and true -> false
+    assert len(out) - len(xml) == len("100.0") + len("50.5") - len("329.5") - len("300.0") + 1
+
+
+def test_removing_a_device_drops_its_links(original):
+    xml, dsl = original
+    start = dsl.index("    device PC1 pc {")
+    end = dsl.index("    device Switch0")
+    link = "    link PC1.FastEthernet0 -> Switch0.FastEthernet0/2 {\n        speed 100\n    }\n"
+    expected = (dsl[:start] + dsl[end:]).replace(link, "")
+    # Whether or not the edit also deleted the device's links
+    for edited in (expected, dsl[:start] + dsl[end:]):
+        out, warnings = write_back(xml, edited)
+        assert warnings == []
+        assert decoded(out) == expected
+
+
+def test_added_link_is_written_back(original):
+    xml, dsl = original
+    link = "    link PC0.FastEthernet0 -> PC1.FastEthernet0 {\n        speed 100\n    }\n"
+    edited = dsl[:dsl.rindex("}")] + link + "}"
+    out, warnings = write_back(xml, edited)
+    assert warnings == []
+    assert decoded(out) == edited
+
+
+def test_unsupported_edits_are_reported(original):
+    xml, dsl = original
+    edited = dsl.replace("device PC0 pc {", "device PC0 laptop {")
+    edited = edited[:edited.rindex("}")] + "    device PC9 pc {\n    }\n}"
+    out, warnings = write_back(xml, edited)
+    assert out == xml
+    assert warnings == [
+        "PC0: device type cannot be changed by write-back",
+        "PC9: new devices cannot be written back; add them in Packet Tracer",
+    ]
+
+
+def test_syntax_error_and_foreign_index(original):
+    xml, dsl = original
+    with pytest.raises(DSLSyntaxError):
+        write_back(xml, dsl.replace("coordinates 329.5 300.0", "coordinates {"))
+    with pytest.raises(WritebackError):
+        list(iter_write_back(xml + b"\n", build_index(xml), dsl))
+
+
+def test_writeback_route_streams_the_updated_file(api, original):
+    app_module, headers = api
+    xml, dsl = original
+    edited = dsl.replace("device PC0 pc {", "device PC0 laptop {").replace("coordinates 329.5 300.0", "coordinates 1.0 2.0")
+    resp = app_module.app.test_client().post("/api/writeback", headers=headers, data={
+        "file": (io.BytesIO(xml), "lab.xml"), "dsl": edited,
+    })
+    assert resp.status_code == 200
+    assert json.loads(resp.headers["X-Writeback-Warnings"]) == ["PC0: device type cannot be changed by write-back"]
+    assert "coordinates 1.0 2.0" in decoded(resp.get_data())